@@ -42,6 +42,31 @@ class Settings(BaseSettings):
     max_file_size: int = 5242880
     allowed_extensions: str = "jpg,jpeg,png,gif,webp,pdf,doc,docx"
 
+    # 圖片處理設定
+    image_widths: str = "320,640,960,1280,1920"  # 響應式版本的寬度（不會放大原圖）
+    image_workers: int = 2                       # 圖片處理執行緒數
+    image_webp_quality: int = 80
+    image_jpeg_quality: int = 82
+    # /img 縮圖端點允許的尺寸（{寬}x{高}，高為 0 時依比例計算）
+    image_transform_sizes: str = "160x160,320x320,640x640,960x960,320x0,640x0,1280x0,750x300,1920x400"
+    image_cache_dir: str = "cache/images"
+    image_cache_max_bytes: int = 536870912       # 縮圖磁碟快取上限（512MB）
+
+    # Sitemap 與文章訂閱（RSS / Atom）的磁碟快取目錄
+    feed_cache_dir: str = "cache/feeds"
+
+    # 未知網址每個 IP 每分鐘允許的 404 次數，超過時回應 429（預設 0 不限制）
+    # 以 request.client.host 計算，位於反向代理之後時需以 uvicorn --proxy-headers
+    # --forwarded-allow-ips 信任代理位址，否則所有訪客會共用代理的 IP
+    probe_limit_per_minute: int = 0
+
+    # 相關商品推薦定時全量重建的間隔（小時，0 表示只在啟動時資料表為空才建立）
+    recommendation_rebuild_hours: int = 24
+
+    # 商品批次匯入 / 匯出
+    product_import_batch_size: int = 500         # 每個交易寫入的列數
+    product_import_max_size: int = 104857600     # 匯入檔案大小上限（100MB）
+
     # 分頁設定
     posts_per_page: int = 10
     products_per_page: int = 20
@@ -76,6 +101,10 @@ class Settings(BaseSettings):
     cache_default_timeout: int = 300
     redis_url: str = "redis://localhost:6379/0"
 
+    # 壓縮設定
+    compression_minimum_size: int = 1024  # 小於此大小（bytes）的回應不壓縮
+    precompress_static: bool = True       # 啟動時為靜態檔案產生 .gz / .br
+    
     # 備份設定
     backup_enabled: bool = False
     backup_schedule: str = "0 2 * * *"
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
@@ -29,4 +29,30 @@ def get_db():
 
 # 初始化資料庫
 def init_db():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+
+def _add_missing_columns():
+    """
+    為既有資料表補上模型新增的可為空欄位
+
+    create_all 只建立不存在的資料表，不會修改既有資料表；
+    例如 posts 新增的 content_html / toc / content_hash，在舊資料庫上需以 ALTER TABLE 補上。
+    已存在的欄位會略過，可重複執行。
+    """
+    from app.utils.logger import app_logger
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                app_logger.info(f"資料表 {table.name} 已新增欄位 {column.name}")
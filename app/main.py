@@ -1,6 +1,6 @@
+import asyncio
 import os
-from fastapi import FastAPI, Request, HTTPException, APIRouter, Depends
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, HTTPException, APIRouter, Depends, BackgroundTasks
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
@@ -13,18 +13,29 @@ from app.middleware import get_feature_settings, get_public_settings
 from pathlib import Path
 from fastapi.responses import FileResponse
 from app.utils.logger import app_logger, log_api_error, log_validation_error, LoggingMiddleware
+from app.utils.conditional import ConditionalGetMiddleware
+from app.utils.compression import CompressionMiddleware, precompress_static
+from app.utils.assets import FingerprintedStaticFiles, asset_manifest, asset_url
+from app.utils.not_found import NotFoundResponder
 from datetime import datetime
 from typing import Optional
 from app.services.markdown_service import markdown_service
 from starlette.responses import RedirectResponse
 from app.auth import get_current_user_optional
-from app.schemas.product import ProductResponse
+from app.database import get_db
+from app.services.product_cache import product_cache
+from app.services.image_cache import image_cache
+from app.services.image_service import image_service
+from app.services.view_tracking_service import ViewTrackingService
+from app.services.trending_service import trending_engine
+from app.services.recommendation_service import recommendation_service
+from sqlalchemy.orm import Session
 
 # 引入所有路由模組
 from app.routes import (
     auth, posts, products, orders, cart, newsletter, 
     admin, settings as settings_router, banners, discount_codes, 
-    favorites, payment, shipping_tiers, view_tracking, errors
+    favorites, payment, shipping_tiers, view_tracking, errors, search, images, feeds
 )
 
 # 建立 FastAPI 應用程式
@@ -40,6 +51,8 @@ app = FastAPI(
 
 # --- 中介軟體設定 ---
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
 app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
 app.add_middleware(
     CORSMiddleware,
@@ -50,8 +63,17 @@ app.add_middleware(
 )
 
 # --- 靜態檔案與模板 ---
-app.mount("/static", StaticFiles(directory="app/static", html=True), name="static")
+# 靜態目錄（啟動時預先壓縮）
+static_directories = ["app/static"]
+app.mount("/static", FingerprintedStaticFiles(directory="app/static", html=True, manifest=asset_manifest), name="static")
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["asset_url"] = asset_url
+not_found = NotFoundResponder(
+    templates.env,
+    "errors/404.html",
+    {"site_name": settings.site_name},
+    probe_limit=settings.probe_limit_per_minute,
+)
 
 def render_template(template_name: str, request: Request, **kwargs):
     dynamic_settings = get_public_settings()
@@ -73,11 +95,16 @@ api_router.include_router(favorites.router)
 api_router.include_router(payment.router)
 api_router.include_router(shipping_tiers.router)
 api_router.include_router(view_tracking.router)
+api_router.include_router(search.router)
 api_router.include_router(errors.router)
 api_router.include_router(settings_router.router)
 api_router.include_router(settings_router.admin_router)
 api_router.include_router(settings_router.public_router)
 app.include_router(api_router, prefix="/api")
+# 縮圖端點不在 /api 之下（/img/{w}x{h}/{fit}/{path}）
+app.include_router(images.router)
+# sitemap.xml、RSS / Atom 與 robots.txt
+app.include_router(feeds.router)
 
 # --- 生產模式下掛載 Admin 後台 (SPA 處理) ---
 if os.getenv("APP_ENV") == "production":
@@ -87,7 +114,9 @@ if os.getenv("APP_ENV") == "production":
         # 1. 將 assets 目錄掛載到 /admin/assets
         assets_path = admin_dist_path / "assets"
         if assets_path.is_dir():
-            app.mount("/admin/assets", StaticFiles(directory=assets_path), name="admin-assets")
+            # Vite 建置的檔名已含雜湊，可長效快取
+            app.mount("/admin/assets", FingerprintedStaticFiles(directory=assets_path, immutable=True), name="admin-assets")
+            static_directories.append(str(assets_path))
 
         # 2. 建立一個 catch-all 路由來服務 index.html
         @app.get("/admin/{path:path}", include_in_schema=False)
@@ -132,28 +161,26 @@ async def products_page(request: Request):
     return render_template("shop/products.html", request)
 
 @app.get("/product/{slug}", include_in_schema=False)
-async def product_detail_page(request: Request, slug: str, current_user=Depends(get_current_user_optional)):
-    from app.database import get_db
-    from app.routes.products import get_product_by_slug as get_product_data
-    from app.services.markdown_service import markdown_service
-
-    db = next(get_db())
-    try:
-        # 獲取原始商品數據
-        product = get_product_data(slug=slug, request=request, db=db, current_user=current_user)
-        # 用 Pydantic schema 轉換，確保 datetime 可序列化
-        product_schema = ProductResponse.model_validate(product)
-        product_dict = product_schema.model_dump(mode="json")
-        product_dict['description_html'] = markdown_service.render(product.description)
-    except HTTPException as e:
-        if e.status_code == 404:
-            product_dict = None
-        else:
-            raise e
-    finally:
-        db.close()
-    
-    return render_template("shop/product_detail.html", request, product=product_dict, slug=slug)
+def product_detail_page(
+    request: Request,
+    slug: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user_optional)
+):
+    # 序列化商品與描述 HTML 由商品快取提供，不需重新查詢與渲染 Markdown
+    product = product_cache.page_data(db, slug)
+    if product is not None:
+        # 瀏覽記錄在回應送出後才寫入
+        background_tasks.add_task(
+            ViewTrackingService.record_view_detached,
+            content_type="product",
+            content_id=product["id"],
+            user_id=current_user.id if current_user else None,
+            ip_address=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent", "")
+        )
+    return render_template("shop/product_detail.html", request, product=product, slug=slug)
 
 @app.get("/cart", include_in_schema=False)
 async def cart_page(request: Request):
@@ -234,13 +261,48 @@ async def terms_page(request: Request):
     return render_template("pages/terms.html", request)
 
 # --- 應用程式事件 ---
+# 定時背景工作（保留參照，關閉時取消）
+background_jobs = []
+
+async def run_periodically(interval_seconds: float, func, *args):
+    """每隔 interval_seconds 在執行緒池中執行同步工作，不佔用請求"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await loop.run_in_executor(None, func, *args)
+
 @app.on_event("startup")
 async def startup_event():
     app_logger.info("應用程式正在啟動...")
     init_db()
     app_logger.info("資料庫初始化完成")
+    app_logger.info(f"靜態資源指紋計算完成：{asset_manifest.build()} 個檔案")
+    if settings.precompress_static:
+        # 於背景產生靜態檔案的壓縮版本，不延遲啟動
+        asyncio.get_running_loop().run_in_executor(
+            None, precompress_static, static_directories, settings.compression_minimum_size
+        )
+    # 於圖片執行緒池中預先建立縮圖快取索引，第一個縮圖請求不必等待掃描磁碟
+    asyncio.get_running_loop().run_in_executor(image_service.executor, image_cache.ensure_loaded)
+    # 趨勢分數快照定時保存，不在瀏覽請求中寫入
+    background_jobs.append(asyncio.create_task(
+        run_periodically(trending_engine.persist_interval.total_seconds(), trending_engine.persist_detached)
+    ))
+    # 相關商品推薦：部署後第一次啟動時在背景建立，之後定時全量重建
+    asyncio.get_running_loop().run_in_executor(None, recommendation_service.rebuild_detached, True)
+    if settings.recommendation_rebuild_hours > 0:
+        background_jobs.append(asyncio.create_task(
+            run_periodically(settings.recommendation_rebuild_hours * 3600, recommendation_service.rebuild_detached)
+        ))
     app_logger.info(f"應用程式已啟動，運行在 {os.getenv('APP_ENV', 'undefined')} 模式")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    for job in background_jobs:
+        job.cancel()
+    # 關閉前保存最新的趨勢分數
+    await asyncio.get_running_loop().run_in_executor(None, trending_engine.persist_detached)
+
 # --- 全局異常處理器 ---
 @app.exception_handler(HTTPException)
 async def custom_http_exception_handler(request: Request, exc: HTTPException):
@@ -260,9 +322,10 @@ async def general_exception_handler(request: Request, exc: Exception):
 # --- Catch-all 路由必須在最後 ---
 @app.get("/{path:path}", include_in_schema=False)
 async def catch_all_public(request: Request, path: str):
-    # 這個 catch-all 不應該捕捉到 /admin 或 /api 的路徑，因為它們已經被前面的路由處理了
-    # 如果有需要，可以返回一個自訂的 404 頁面
-    return render_template("index.html", request)
+    # 只有已知的前端路徑才渲染頁面；掃描器與爬蟲的探測直接回應快取的 404
+    if not_found.is_known(path):
+        return render_template("index.html", request)
+    return not_found.response(path, request.client.host if request.client else None)
 
 if __name__ == "__main__":
     import uvicorn
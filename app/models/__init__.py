@@ -8,6 +8,10 @@ from .settings import SystemSettings
 from .newsletter import NewsletterSubscriber, NewsletterCampaign
 from .favorite import Favorite
 from .view_log import ViewLog
+from .attribution import AttributionDailyStats
+from .trending import TrendingScore
+from .recently_viewed import RecentlyViewed
+from .recommendation import ProductRecommendation
 from .banner import Banner, BannerPosition
 from .shipping_tier import ShippingTier
 from .discount_code import PromoCode, PromoType, DiscountCode, DiscountType
@@ -23,6 +27,10 @@ __all__ = [
     "NewsletterSubscriber", "NewsletterCampaign",
     "Favorite",
     "ViewLog",
+    "AttributionDailyStats",
+    "TrendingScore",
+    "RecentlyViewed",
+    "ProductRecommendation",
     "Banner", "BannerPosition",
     "ShippingTier",
     "PromoCode", "PromoType", "PromoUsage",
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Integer, Numeric, Date, UniqueConstraint, Index
+from app.models.base import BaseModel
+
+
+class AttributionDailyStats(BaseModel):
+    """
+    來源歸因每日彙總模型
+
+    以「日期 + 來源 + 媒介 + 活動」為維度，彙總 view_logs 的瀏覽量與
+    獨立會話數，並將訂單數與營收歸因到最後一次有來源資訊的瀏覽。
+    行銷報表直接讀取此表，不需再掃描原始瀏覽記錄。
+    """
+    __tablename__ = "attribution_daily_stats"
+
+    # 彙總維度
+    stat_date = Column(Date, nullable=False, comment="統計日期 (UTC)")
+    source = Column(String(100), nullable=False, comment="來源 (utm_source 或來源網域)")
+    medium = Column(String(100), nullable=False, comment="媒介 (utm_medium / referral / (none))")
+    campaign = Column(String(100), nullable=False, comment="活動 (utm_campaign)")
+
+    # 瀏覽指標
+    views = Column(Integer, nullable=False, default=0, comment="瀏覽次數")
+    unique_sessions = Column(Integer, nullable=False, default=0, comment="獨立會話數")
+
+    # 轉換指標
+    orders = Column(Integer, nullable=False, default=0, comment="歸因訂單數")
+    revenue = Column(Numeric(12, 2), nullable=False, default=0, comment="歸因營收")
+
+    __table_args__ = (
+        UniqueConstraint('stat_date', 'source', 'medium', 'campaign', name='uq_attribution_daily_dims'),
+        Index('ix_attribution_daily_source', 'source', 'stat_date'),
+    )
+
+    def __repr__(self):
+        return f"<AttributionDailyStats {self.stat_date} {self.source}/{self.medium}/{self.campaign}>"
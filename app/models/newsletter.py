@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -29,6 +29,7 @@ class NewsletterSubscriber(Base):
     # 確保每個 email 只能有一個有效訂閱
     __table_args__ = (
         UniqueConstraint('email', name='unique_email'),
+        Index('ix_newsletter_subscribers_created_at_id', 'created_at', 'id'),
     )
     
     def __repr__(self):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Numeric, Integer, Enum, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, String, Text, Numeric, Integer, Enum, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 import enum
 from app.models.base import BaseModel
@@ -68,6 +68,11 @@ class Order(BaseModel):
     promo_usage = relationship("PromoUsage", back_populates="order", uselist=False)
     # 向後相容的別名
     discount_usage = relationship("PromoUsage", back_populates="order", uselist=False, viewonly=True)
+
+    # 游標分頁排序鍵
+    __table_args__ = (
+        Index('ix_orders_created_at_id', 'created_at', 'id'),
+    )
     
     def __repr__(self):
         return f"<Order {self.order_number}>"
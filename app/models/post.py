@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Boolean, Integer
+from sqlalchemy import Column, String, Text, Boolean, Integer, Index
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel, SlugMixin
 
@@ -20,7 +20,17 @@ class Post(BaseModel, SlugMixin):
     # 瀏覽統計
     view_count = Column(Integer, default=0, nullable=False)
     
+    # 預先渲染的 Markdown 結果（content_hash 含渲染器版本，不一致時重新渲染）
+    content_html = Column(Text, nullable=True)
+    toc = Column(Text, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    
     # 關聯已移除
+
+    # 游標分頁排序鍵
+    __table_args__ = (
+        Index('ix_posts_created_at_id', 'created_at', 'id'),
+    )
     
     def __repr__(self):
         return f"<Post {self.title}>" 
\ No newline at end of file
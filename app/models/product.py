@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Boolean, Numeric, Integer
+from sqlalchemy import Column, String, Text, Boolean, Numeric, Integer, Index
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel, SlugMixin
 
@@ -33,6 +33,11 @@ class Product(BaseModel, SlugMixin):
     # 關聯
     order_items = relationship("OrderItem", back_populates="product")
     favorited_by = relationship("Favorite", back_populates="product", cascade="all, delete-orphan")
+
+    # 游標分頁排序鍵
+    __table_args__ = (
+        Index('ix_products_created_at_id', 'created_at', 'id'),
+    )
     
     @property
     def current_price(self):
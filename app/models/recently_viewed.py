@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, UniqueConstraint, Index
+from app.models.base import BaseModel
+from datetime import datetime
+
+
+class RecentlyViewed(BaseModel):
+    """
+    會員最近瀏覽模型
+
+    每位會員每個內容只保留一筆（重複瀏覽只更新時間），並限制每位會員的
+    筆數上限，作為記憶體 / Redis 最近瀏覽清單的持久化備援。
+    """
+    __tablename__ = "recently_viewed"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    content_type = Column(String(50), nullable=False)  # 'post' 或 'product'
+    content_id = Column(Integer, nullable=False)
+    viewed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'content_type', 'content_id', name='uq_recently_viewed_item'),
+        Index('ix_recently_viewed_user_time', 'user_id', 'viewed_at'),
+    )
+
+    def __repr__(self):
+        return f"<RecentlyViewed user:{self.user_id} {self.content_type}:{self.content_id}>"
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
+from app.models.base import BaseModel
+
+
+class ProductRecommendation(BaseModel):
+    """
+    商品推薦（相關商品）預先計算結果
+
+    由共同瀏覽與共同購買的相似度離線計算，每個商品保留前 N 名相關商品，
+    相關商品 API 只需依 (product_id, rank) 索引查詢。
+    """
+    __tablename__ = "product_recommendations"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, comment="商品 ID")
+    related_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, comment="相關商品 ID")
+    score = Column(Float, nullable=False, comment="相似度分數")
+    rank = Column(Integer, nullable=False, comment="排序 (從 1 開始)")
+    source = Column(String(20), nullable=False, default="hybrid", comment="來源 (coview/copurchase/hybrid)")
+
+    __table_args__ = (
+        Index('ix_product_recommendations_lookup', 'product_id', 'rank'),
+    )
+
+    def __repr__(self):
+        return f"<ProductRecommendation {self.product_id} -> {self.related_product_id} #{self.rank}>"
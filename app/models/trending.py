@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime, UniqueConstraint
+from app.models.base import BaseModel
+
+
+class TrendingScore(BaseModel):
+    """
+    趨勢分數快照模型
+
+    定期保存記憶體中的時間衰減趨勢分數，供程序重啟或新 worker 啟動時
+    直接載入，不需重新掃描 view_logs。
+    """
+    __tablename__ = "trending_scores"
+
+    content_type = Column(String(50), nullable=False, comment="內容類型 (post/product)")
+    content_id = Column(Integer, nullable=False, comment="內容 ID")
+
+    score = Column(Float, nullable=False, default=0, comment="短期衰減分數")
+    slow_score = Column(Float, nullable=False, default=0, comment="長期衰減分數")
+    scored_at = Column(DateTime, nullable=False, comment="分數計算時間 (UTC)")
+
+    __table_args__ = (
+        UniqueConstraint('content_type', 'content_id', name='uq_trending_content'),
+    )
+
+    def __repr__(self):
+        return f"<TrendingScore {self.content_type}:{self.content_id} {self.score:.2f}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Enum
+from sqlalchemy import Column, String, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 import bcrypt
 import enum
@@ -31,6 +31,11 @@ class User(BaseModel):
     promo_usages = relationship("PromoUsage", back_populates="user")
     # 向後相容的別名
     discount_usages = relationship("PromoUsage", back_populates="user", viewonly=True)
+
+    # 游標分頁排序鍵
+    __table_args__ = (
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
     
     def set_password(self, password: str):
         """設定密碼（使用 bcrypt）"""
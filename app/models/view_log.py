@@ -24,7 +24,7 @@ class ViewLog(BaseModel):
     utm_campaign = Column(String(100), nullable=True)  # UTM 活動
     
     # 瀏覽時間
-    viewed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    viewed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     duration = Column(Integer, nullable=True)  # 停留時間（秒）
     
     # 關聯
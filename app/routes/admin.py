@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, func, desc, asc
 from typing import List, Optional
@@ -13,7 +15,13 @@ from app.models.discount_usage import PromoUsage
 from app.models.newsletter import NewsletterSubscriber
 from app.schemas.user import UserResponse, UserUpdate, UserListResponse, UserCreate
 from app.schemas.post import PostResponse, PostCreate, PostUpdate
-from app.schemas.product import ProductResponse, ProductCreate, ProductUpdate
+from app.schemas.product import (
+    ProductResponse,
+    ProductCreate,
+    ProductUpdate,
+    ProductBulkUpdate,
+    ProductBulkUpdateResponse,
+)
 from app.schemas.order import OrderResponse, OrderUpdate, OrderListResponse
 from app.schemas.newsletter import (
     NewsletterSubscriberResponse,
@@ -22,10 +30,18 @@ from app.schemas.newsletter import (
 )
 from app.schemas.admin import AdminStatsResponse
 from app.config import settings
-import os
-import uuid
-from PIL import Image
+from app.utils.pagination import keyset_paginate
+from app.services.image_service import image_service, ImageProcessingError
+from app.services.product_bulk_service import ProductBulkService, product_filters
+from app.services.product_import_service import (
+    product_import_service,
+    detect_format,
+    FORMAT_PATTERN,
+    MEDIA_TYPES,
+)
+from app.utils.uploads import receive_upload, UPLOAD_REQUEST_BODY
 from datetime import datetime, timedelta
+import tempfile
 
 router = APIRouter(prefix="/admin", tags=["管理員"])
 
@@ -95,10 +111,11 @@ def get_all_users(
     search: Optional[str] = Query(None, description="搜尋使用者名稱或電子郵件"),
     role: Optional[str] = Query(None, description="依角色篩選 (admin/user)"),
     is_active: Optional[bool] = Query(None, description="依啟用狀態篩選"),
+    cursor: Optional[str] = Query(None, description="游標分頁：第一頁傳空字串，之後傳入回應的 next_cursor"),
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """取得所有使用者列表，支援分頁、搜尋和篩選。"""
+    """取得所有使用者列表，支援分頁、搜尋和篩選；帶入 cursor 時改用游標分頁。"""
     query = db.query(User)
     
     if search:
@@ -116,6 +133,10 @@ def get_all_users(
     if is_active is not None:
         query = query.filter(User.is_active == is_active)
     
+    if cursor is not None:
+        users, next_cursor = keyset_paginate(query, User, cursor, limit)
+        return UserListResponse(items=users, next_cursor=next_cursor)
+
     total = query.count()
     users = query.order_by(User.created_at.desc()).offset(skip).limit(limit).all()
     return UserListResponse(items=users, total=total)
@@ -259,12 +280,8 @@ def get_all_posts(
     query = db.query(Post)
     
     if search:
-        query = query.filter(
-            or_(
-                Post.title.contains(search),
-                Post.content.contains(search)
-            )
-        )
+        from app.services.search_service import post_search
+        query = query.filter(post_search.match_condition(db, search, Post.id))
     
     if published is not None:
         query = query.filter(Post.is_published == published)
@@ -307,6 +324,18 @@ def admin_delete_post(
     return delete_post(post_id, db)
 
 
+@router.post("/posts/rerender", summary="重新渲染文章 (管理員)")
+def rerender_posts(
+    force: bool = Query(False, description="忽略內容雜湊，強制重新渲染全部文章"),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """重新產生文章的 HTML、目錄與摘要（渲染器更新後使用）"""
+    from app.services.post_render_service import PostRenderService
+    count = PostRenderService.rerender_all(db, force=force)
+    return {"message": "文章渲染結果已更新", "rendered": count}
+
+
 # ==============================================
 # 商品管理
 # ==============================================
@@ -322,23 +351,7 @@ def get_all_products(
     db: Session = Depends(get_db)
 ):
     """取得所有商品列表（管理員）"""
-    query = db.query(Product)
-    
-    if search:
-        query = query.filter(
-            or_(
-                Product.name.contains(search),
-                Product.description.contains(search),
-                Product.sku.contains(search)
-            )
-        )
-    
-    if status == "active":
-        query = query.filter(Product.is_active == True)
-    elif status == "inactive":
-        query = query.filter(Product.is_active == False)
-    elif status == "featured":
-        query = query.filter(Product.is_featured == True)
+    query = db.query(Product).filter(*product_filters(search, status))
     
     if sort == "created_at_desc":
         query = query.order_by(desc(Product.id))
@@ -380,6 +393,97 @@ def admin_create_product(
     return create_product(product, db)
 
 
+@router.post(
+    "/products/bulk",
+    response_model=ProductBulkUpdateResponse,
+    summary="批次更新商品 (管理員)",
+    description="""
+    ## 🎯 功能描述
+    一次調整多個商品的價格、特價、上下架、推薦與庫存，例如全館特價。
+
+    ## 📋 功能特點
+    - ⚡ 以單一 UPDATE 陳述式在一個交易內完成，不逐筆讀取與儲存
+    - 🎯 以 `product_ids`、篩選條件（`search` / `status`）或 `all_products` 三擇一選取商品
+    - 🧮 百分比調整以更新前的原價計算，結果四捨五入到小數兩位
+    - 📦 庫存增減的結果最少為 0
+
+    ## 🔍 範例
+    - 全館 8 折：`{"all_products": true, "sale_percent": 20}`
+    - 下架指定商品：`{"product_ids": [1, 2, 3], "is_active": false}`
+    - 推薦商品漲價 5%：`{"status": "featured", "price_percent": 5}`
+    """
+)
+def bulk_update_products(
+    operation: ProductBulkUpdate,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """批次更新商品（管理員）"""
+    try:
+        product_ids = ProductBulkService.apply(db, operation)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "商品批次更新完成", "affected": len(product_ids), "product_ids": product_ids}
+
+
+@router.post(
+    "/products/import",
+    summary="批次匯入商品 (管理員)",
+    openapi_extra=UPLOAD_REQUEST_BODY,
+    description="""
+    ## 🎯 功能描述
+    上傳 CSV 或 JSON Lines 檔案批次新增 / 更新商品。
+
+    ## 📋 功能特點
+    - 📥 檔案以串流方式接收並逐列讀取，不會整份載入記憶體
+    - 🔑 依既有商品的 `id`、再依商品編號（sku）判斷更新，都找不到時新增；匯出檔可直接再匯入
+    - 🧩 每批次驗證後在一個交易內寫入，單一列的錯誤不影響其他列
+    - 🔗 slug 重複時自動附加 -2、-3…；更新時只在檔案指定 slug 才變更
+
+    ## 🔍 參數說明
+    - **format**: `csv` 或 `jsonl`，未指定時依副檔名判斷
+    - 欄位與匯出格式相同，`view_count` 與時間欄位會被略過
+    """
+)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN, description="檔案格式：csv 或 jsonl"),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """批次匯入商品（管理員）"""
+    upload = await receive_upload(
+        request,
+        tempfile.gettempdir(),
+        max_size=settings.product_import_max_size,
+    )
+    try:
+        fmt = format or detect_format(upload.filename)
+        if fmt is None:
+            raise HTTPException(status_code=400, detail="無法判斷檔案格式，請指定 format=csv 或 format=jsonl")
+        summary = await run_in_threadpool(product_import_service.import_file, db, upload.path, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        upload.discard()
+
+    return {"message": "商品匯入完成", **summary}
+
+
+@router.get("/products/export", summary="匯出商品 (管理員)")
+def export_products(
+    format: str = Query("csv", pattern=FORMAT_PATTERN, description="檔案格式：csv 或 jsonl"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """以串流方式匯出所有商品（可直接再匯入）"""
+    filename = f"products-{datetime.now().strftime('%Y%m%d%H%M%S')}.{format}"
+    return StreamingResponse(
+        product_import_service.export_lines(format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/products/{product_id}", response_model=ProductResponse)
 def admin_get_product(
     product_id: int,
@@ -416,6 +520,18 @@ def admin_delete_product(
     return delete_product(product_id, db)
 
 
+@router.post("/recommendations/rebuild", summary="重新計算商品推薦 (管理員)")
+def rebuild_recommendations(
+    product_ids: Optional[List[int]] = Query(None, description="只重算指定商品，未指定時全量重建"),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """依共同瀏覽與共同購買重新計算相關商品推薦"""
+    from app.services.recommendation_service import recommendation_service
+    count = recommendation_service.rebuild(db, product_ids)
+    return {"message": "商品推薦已更新", "recommendations": count}
+
+
 # ==============================================
 # 訂單管理
 # ==============================================
@@ -608,56 +724,41 @@ def delete_newsletter_subscriber_admin(
 # 檔案上傳
 # ==============================================
 
-@router.post("/upload/image")
+@router.post("/upload/image", openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_image(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_admin_user)
 ):
-    """上傳圖片"""
+    """上傳圖片（串流寫入暫存檔，接收時即限制大小）"""
+    upload = await receive_upload(
+        request,
+        settings.upload_folder,
+        allowed_types=["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"],
+    )
     try:
-        allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"]
-        if file.content_type not in allowed_types:
-            raise HTTPException(status_code=400, detail="不支援的檔案格式")
-        
-        if file.size > 5 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="檔案大小不能超過5MB")
-        
-        file_extension = file.filename.split('.')[-1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        
-        upload_dir = "app/static/uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, unique_filename)
-        content = await file.read()
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        try:
-            if file.content_type.startswith("image/"):
-                with Image.open(file_path) as img:
-                    thumbnail_dir = os.path.join(upload_dir, "thumbnails")
-                    os.makedirs(thumbnail_dir, exist_ok=True)
-                    
-                    img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-                    thumbnail_path = os.path.join(thumbnail_dir, unique_filename)
-                    img.save(thumbnail_path, optimize=True, quality=85)
-        except Exception as e:
-            print(f"縮圖生成失敗: {e}")
-        
-        return {
-            "success": True,
-            "filename": unique_filename,
-            "url": f"/static/uploads/{unique_filename}",
-            "thumbnail_url": f"/static/uploads/thumbnails/{unique_filename}",
-            "message": "檔案上傳成功"
-        }
-        
-    except HTTPException:
-        raise
+        image = await image_service.process_upload(upload, settings.upload_folder, "/static/uploads")
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"檔案上傳失敗: {str(e)}")
+    finally:
+        upload.discard()
+
+    # thumbnail_url 沿用舊欄位，指向最小的響應式版本
+    thumbnail_url = image["variants"][0]["fallback"] if image["variants"] else image["url"]
+    return {
+        "success": True,
+        "filename": image["filename"],
+        "url": image["url"],
+        "thumbnail_url": thumbnail_url,
+        "width": image["width"],
+        "height": image["height"],
+        "variants": image["variants"],
+        "srcset": image["srcset"],
+        "fallback_srcset": image["fallback_srcset"],
+        "duplicate": image["duplicate"],
+        "message": "檔案上傳成功"
+    }
 
 
 # ==============================================
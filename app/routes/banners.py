@@ -1,12 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, File, UploadFile, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
+from sqlalchemy import and_, case, desc, func, or_
 from typing import List, Optional
-import os
-import uuid
-from PIL import Image
-import shutil
+from datetime import datetime, timezone
 
 from app.database import get_db
 from app.models.banner import Banner, BannerPosition
@@ -15,8 +12,11 @@ from app.schemas.banner import (
     BannerStatusToggle, BannerStats
 )
 from app.services.banner_service import BannerService
+from app.services.image_service import image_service, ImageProcessingError
+from app.utils.uploads import receive_upload, UPLOAD_REQUEST_BODY
 from app.auth import get_current_admin_user, get_current_user_optional
 from app.models.user import User
+from app.utils.conditional import not_modified, query_etag, validator_headers
 
 
 router = APIRouter(prefix="/banners", tags=["廣告橫幅"])
@@ -26,6 +26,7 @@ router = APIRouter(prefix="/banners", tags=["廣告橫幅"])
 @router.get("", response_model=BannerListResponse, summary="📋 取得廣告列表")
 async def get_banners(
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0, description="跳過的項目數"),
     limit: int = Query(10, ge=1, le=100, description="每頁項目數限制"),
@@ -60,6 +61,16 @@ async def get_banners(
             )
         )
 
+    # 以聚合查詢計算 ETag，相符時不載入也不序列化廣告；
+    # is_valid_period 隨時間變動，一併納入目前有效的廣告
+    now = datetime.now(timezone.utc)
+    valid_now = and_(Banner.start_date <= now, Banner.end_date >= now)
+    etag = query_etag(query, Banner, func.sum(case((valid_now, Banner.id), else_=0)), extra=str(request.url.query))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(validator_headers(etag))
+
     total = query.count()
     
     banners = query.order_by(desc(Banner.sort_order), desc(Banner.created_at)).offset(skip).limit(limit).all()
@@ -124,6 +135,8 @@ async def get_banners(
 )
 async def get_active_banners_by_position(
     position: BannerPosition,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
@@ -132,6 +145,12 @@ async def get_active_banners_by_position(
     返回指定版位中所有啟用且在有效期間內的廣告。
     """
     banner_service = BannerService(db)
+    etag = query_etag(banner_service.active_banners_query(position), Banner)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(validator_headers(etag))
+
     banners = banner_service.get_active_banners_by_position(position)
     
     return [BannerResponse.model_validate(banner) for banner in banners]
@@ -504,6 +523,7 @@ async def get_banner_stats(
 
 @router.post(
     "/upload",
+    openapi_extra=UPLOAD_REQUEST_BODY,
     summary="📸 上傳廣告圖片",
     description="""
     ## 🎯 功能描述
@@ -512,8 +532,9 @@ async def get_banner_stats(
     ## 📋 功能特點
     - 🔐 需要管理員權限
     - 📸 支援多種圖片格式
-    - 🎨 自動壓縮優化
-    - 📱 響應式適配
+    - 🎨 自動壓縮優化（去除 EXIF 等中繼資料）
+    - 📱 響應式適配（產生多種寬度的 WebP / JPEG 版本並回傳 srcset）
+    - ♻️ 相同內容重複上傳時沿用既有檔案
     
     ## 🔍 檔案限制
     - 檔案大小：最大 5MB
@@ -527,12 +548,13 @@ async def get_banner_stats(
     """,
     responses={
         200: {"description": "成功上傳圖片"},
-        400: {"description": "圖片格式不支援或檔案過大"},
-        401: {"description": "需要管理員權限"}
+        400: {"description": "圖片格式不支援"},
+        401: {"description": "需要管理員權限"},
+        413: {"description": "檔案過大"}
     }
 )
 async def upload_banner_image(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_admin_user)
 ):
     """
@@ -540,49 +562,41 @@ async def upload_banner_image(
     
     上傳廣告圖片，需要管理員權限。
     """
-    # 檢查檔案類型
-    if file.content_type not in ["image/jpeg", "image/png", "image/gif"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="不支援的圖片格式，僅支援 JPG、PNG、GIF"
-        )
-    
-    # 檢查檔案大小 (5MB)
-    if file.size and file.size > 5 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="圖片檔案過大，最大允許 5MB"
-        )
+    # 串流寫入暫存檔，接收時即檢查檔案類型與大小
+    upload_dir = "app/static/images/banner"
+    upload = await receive_upload(
+        request, upload_dir, allowed_types=["image/jpeg", "image/png", "image/gif"]
+    )
     
     try:
-        # 建立上傳目錄
-        upload_dir = "app/static/images/banner"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # 生成唯一檔名
-        if not file.filename:
+        # 在圖片執行緒池中去除中繼資料並產生響應式版本（相同內容不重複處理）
+        try:
+            image = await image_service.process_upload(upload, upload_dir, "/static/images/banner")
+        except ImageProcessingError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="檔案名稱不能為空"
+                detail=str(e)
             )
         
-        file_extension = file.filename.split(".")[-1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # 儲存檔案
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
         # 返回檔案路徑
         return {
             "message": "圖片上傳成功",
-            "file_path": f"/static/images/banner/{unique_filename}",
-            "filename": unique_filename
+            "file_path": image["url"],
+            "filename": image["filename"],
+            "width": image["width"],
+            "height": image["height"],
+            "variants": image["variants"],
+            "srcset": image["srcset"],
+            "fallback_srcset": image["fallback_srcset"],
+            "duplicate": image["duplicate"]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"圖片上傳失敗: {str(e)}"
-        ) 
+        )
+    finally:
+        upload.discard() 
@@ -0,0 +1,81 @@
+from typing import Optional, Tuple
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.services.sitemap_service import sitemap_service
+from app.utils.conditional import not_modified
+
+router = APIRouter(tags=["Sitemap 與訂閱"])
+
+# 內容最多延遲一小時更新，重新驗證時以 ETag 回應 304
+CACHE_CONTROL = "public, max-age=3600"
+
+
+def _xml_response(request: Request, result: Optional[Tuple[Path, str]], media_type: str):
+    if result is None:
+        raise HTTPException(status_code=404, detail="Sitemap 不存在")
+    path, etag = result
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    cached = not_modified(request, etag)
+    if cached is not None:
+        cached.headers.update(headers)
+        return cached
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get(
+    "/sitemap.xml",
+    summary="🗺️ Sitemap 索引",
+    description="""
+    ## 🎯 功能描述
+    列出靜態頁面、商品與文章的 sitemap 分片，引導搜尋引擎直接索引公開內容。
+
+    ## 📋 功能特點
+    - 🧩 商品與文章依 ID 每 50,000 筆一個分片
+    - 💾 產生結果快取在磁碟，只有內容異動的分片才重新產生
+    - 🔄 支援 ETag 條件式請求
+    """
+)
+def sitemap_index(request: Request, db: Session = Depends(get_db)):
+    """取得 sitemap 索引"""
+    return _xml_response(request, sitemap_service.sitemap_index(db), "application/xml")
+
+
+@router.get("/sitemap-pages.xml", summary="🗺️ 靜態頁面 Sitemap")
+def sitemap_pages(request: Request):
+    """取得靜態頁面的 sitemap"""
+    return _xml_response(request, sitemap_service.pages_sitemap(), "application/xml")
+
+
+@router.get("/sitemap-{section}-{shard:int}.xml", summary="🗺️ 商品 / 文章 Sitemap 分片")
+def sitemap_shard(request: Request, section: str, shard: int, db: Session = Depends(get_db)):
+    """取得商品（products）或文章（posts）的 sitemap 分片"""
+    return _xml_response(request, sitemap_service.section_sitemap(db, section, shard), "application/xml")
+
+
+@router.get("/feed.xml", summary="📰 文章 RSS 訂閱")
+def rss_feed(request: Request, db: Session = Depends(get_db)):
+    """取得最新文章的 RSS 2.0 訂閱"""
+    return _xml_response(request, sitemap_service.feed(db, "rss"), "application/rss+xml")
+
+
+@router.get("/atom.xml", summary="📰 文章 Atom 訂閱")
+def atom_feed(request: Request, db: Session = Depends(get_db)):
+    """取得最新文章的 Atom 訂閱"""
+    return _xml_response(request, sitemap_service.feed(db, "atom"), "application/atom+xml")
+
+
+@router.get("/robots.txt", summary="🤖 robots.txt", response_class=PlainTextResponse)
+def robots_txt():
+    """引導爬蟲使用 sitemap，並排除後台與 API"""
+    return PlainTextResponse(
+        "User-agent: *\n"
+        "Disallow: /admin\n"
+        "Disallow: /api/\n"
+        f"Sitemap: {sitemap_service.base_url}/sitemap.xml\n",
+        headers={"Cache-Control": CACHE_CONTROL},
+    )
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.services.image_cache import image_cache, FITS
+from app.services.image_service import ImageProcessingError
+from app.utils.conditional import not_modified
+
+router = APIRouter(prefix="/img", tags=["圖片"])
+
+# 轉換結果由原圖內容決定（快取鍵包含原圖修改時間），瀏覽器可快取較長時間
+CACHE_CONTROL = "public, max-age=2592000"
+
+
+@router.get(
+    "/{size}/{fit}/{path:path}",
+    summary="🖼️ 取得縮放後的圖片",
+    description="""
+    ## 🎯 功能描述
+    依顯示尺寸縮放上傳圖片與廣告圖片，避免前台載入原始解析度的大圖。
+
+    ## 📋 功能特點
+    - 🧵 第一次請求時在圖片執行緒池中產生，之後直接由磁碟快取回應
+    - 🗂️ 快取目錄以總大小限制，超過時淘汰最久未使用的檔案
+    - 🛡️ 只允許白名單內的尺寸（`image_transform_sizes` 設定），避免任意尺寸耗盡資源
+    - 🌐 瀏覽器支援時輸出 WebP，否則輸出 JPEG（含透明度時為 PNG）
+
+    ## 🔍 參數說明
+    - **size**: `{寬}x{高}`，高為 0 時依比例計算，例如 `640x640`、`1280x0`
+    - **fit**: `cover`（裁切填滿）或 `contain`（完整縮放在範圍內）
+    - **path**: 靜態目錄下的原圖路徑，例如 `uploads/abc.jpg`、`images/banner/abc.png`
+    """,
+    responses={
+        200: {"description": "縮放後的圖片"},
+        304: {"description": "圖片未變更"},
+        400: {"description": "尺寸或裁切方式不在允許範圍內"},
+        404: {"description": "原圖不存在"}
+    }
+)
+async def get_resized_image(request: Request, size: str, fit: str, path: str):
+    """取得縮放後的圖片"""
+    width, _, height = size.partition("x")
+    if not (width.isdigit() and height.isdigit()) or not image_cache.is_allowed(int(width), int(height), fit):
+        allowed = ", ".join(f"{w}x{h}" for w, h in sorted(image_cache.sizes))
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支援的圖片尺寸或裁切方式；可用尺寸: {allowed}；裁切方式: {', '.join(FITS)}"
+        )
+
+    source = image_cache.resolve_source(path)
+    if source is None:
+        raise HTTPException(status_code=404, detail="圖片不存在")
+
+    webp = "image/webp" in request.headers.get("accept", "")
+    key = image_cache.cache_key(source, int(width), int(height), fit, webp)
+    headers = {"Cache-Control": CACHE_CONTROL, "Vary": "Accept", "ETag": f'"{key}"'}
+
+    cached = not_modified(request, headers["ETag"])
+    if cached is not None:
+        cached.headers.update(headers)
+        return cached
+
+    try:
+        file_path, media_type = await image_cache.get(key, source, int(width), int(height), fit, webp)
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FileResponse(file_path, media_type=media_type, headers=headers)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from typing import List, Optional
@@ -16,6 +16,7 @@ from app.schemas.newsletter import (
     NewsletterStats
 )
 from app.auth import get_current_admin_user
+from app.utils.pagination import keyset_paginate, NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/newsletter", tags=["電子報"])
 
@@ -30,14 +31,16 @@ def check_newsletter_enabled():
 @router.get("/", response_model=List[NewsletterSubscriberResponse])
 @router.get("", response_model=List[NewsletterSubscriberResponse])  # 添加不帶尾隨斜線的路由別名
 async def get_subscribers(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     is_active: Optional[bool] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="游標分頁：第一頁傳空字串，之後傳入回應標頭 X-Next-Cursor 的值"),
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin_user)
 ):
-    """取得電子報訂閱者列表（管理員專用）"""
+    """取得電子報訂閱者列表（管理員專用）；帶入 cursor 時改用游標分頁，下一頁游標放在 X-Next-Cursor 標頭"""
     query = db.query(NewsletterSubscriber)
     
     if is_active is not None:
@@ -49,6 +52,12 @@ async def get_subscribers(
             NewsletterSubscriber.name.contains(search)
         )
     
+    if cursor is not None:
+        subscribers, next_cursor = keyset_paginate(query, NewsletterSubscriber, cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return subscribers
+
     subscribers = query.offset(skip).limit(limit).all()
     return subscribers
 
@@ -1,5 +1,5 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import desc, func, or_
 from typing import List, Optional
@@ -13,6 +13,8 @@ from ..models.user import User
 from ..auth import get_current_active_user, get_current_admin_user
 from ..services.payment_service import PaymentService
 from ..utils.helpers import generate_order_number
+from ..utils.pagination import keyset_paginate
+from ..utils.count_cache import count_cache, TOTAL_MODE_PATTERN
 from ..schemas.order import (
     OrderResponse, OrderCreate, OrderUpdate, OrderListResponse, 
     OrderStatusUpdate, OrderStatsResponse
@@ -134,10 +136,12 @@ def list_orders(
     status: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    total_mode: str = Query("exact", alias="total", pattern=TOTAL_MODE_PATTERN, description="總數計算方式：exact（精確）、approx（估計）、none（不計算）"),
+    cursor: Optional[str] = Query(None, description="游標分頁：第一頁傳空字串，之後傳入回應的 next_cursor"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """管理員獲取所有訂單，支援分頁、搜尋和篩選。"""
+    """管理員獲取所有訂單，支援分頁、搜尋和篩選；帶入 cursor 時改用游標分頁。"""
     query = db.query(Order).options(selectinload(Order.items)).order_by(desc(Order.created_at))
 
     if search:
@@ -163,10 +167,15 @@ def list_orders(
     if end_date:
         query = query.filter(Order.created_at < (end_date + timedelta(days=1)))
 
-    total = query.count()
+    if cursor is not None:
+        orders, next_cursor = keyset_paginate(query, Order, cursor, limit)
+        return OrderListResponse(items=orders, next_cursor=next_cursor)
+
+    filters = {"search": search, "status": status, "start_date": start_date, "end_date": end_date}
+    total, approximate = count_cache.count(query, Order.__tablename__, filters, total_mode)
     orders = query.offset(skip).limit(limit).all()
     
-    return OrderListResponse(items=orders, total=total)
+    return OrderListResponse(items=orders, total=total, total_approximate=approximate)
 
 
 @router.get("/my", response_model=List[OrderResponse], summary="獲取我的訂單")
@@ -1,10 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, load_only, object_session
+from datetime import datetime
+from typing import List, Optional, Tuple
 from app.database import get_db
 from app.models.post import Post
-from app.schemas.post import PostCreate, PostUpdate, PostResponse, PostListResponse
-from app.services.markdown_service import markdown_service
+from app.schemas.post import PostCreate, PostUpdate, PostResponse, PostSummary, PostListResponse
+from app.services.markdown_service import markdown_service, RENDERER_VERSION
+from app.services.post_render_service import PostRenderService
+from app.services.search_service import post_search, post_document, highlight
+from app.services.autocomplete_service import autocomplete_index
+from app.utils.pagination import keyset_paginate
+from app.utils.count_cache import count_cache, TOTAL_MODE_PATTERN
+from app.utils.projection import parse_fields, load_columns, loaded_attributes, sparse_response
+from app.utils.conditional import make_etag, not_modified, validator_headers
 from app.services.view_tracking_service import ViewTrackingService
 from app.auth import get_current_admin_user, get_current_user_optional
 from app.models.user import User
@@ -12,12 +21,88 @@ from app.models.user import User
 router = APIRouter(prefix="/posts", tags=["文章"])
 
 
+def _sync_post_indexes(db: Session, post: Post) -> None:
+    """文章異動後同步搜尋與自動完成索引"""
+    post_search.upsert(db, post.id, post_document(post))
+    autocomplete_index.upsert_post(post)
+
+
+def _drop_post_indexes(db: Session, post_id: int) -> None:
+    """文章刪除後移除搜尋與自動完成索引"""
+    post_search.delete(db, post_id)
+    autocomplete_index.remove("post", post_id)
+
+
+def _post_validators(post: Post) -> Tuple[str, datetime]:
+    """
+    由更新時間與內容雜湊產生 ETag 與最後修改時間
+
+    回應中的瀏覽次數會隨瀏覽變動，因此使用弱 ETag；包含渲染器版本，
+    渲染器更新後舊的驗證器自動失效。
+    """
+    modified = post.updated_at or post.created_at
+    etag = make_etag(f"{post.id}:{modified}:{post.content_hash}:{RENDERER_VERSION}".encode(), weak=True)
+    return etag, modified
+
+
+def _post_detail_response(
+    db: Session,
+    request: Request,
+    current_user: Optional[User],
+    post_id: Optional[int] = None,
+    slug: Optional[str] = None
+):
+    """
+    回應單一文章
+
+    先只讀取驗證器需要的欄位，用戶端快取仍有效時直接回應 304，
+    不載入內文也不序列化；否則才讀取完整文章。
+    """
+    query = db.query(Post).options(load_only(Post.id, Post.content_hash, Post.created_at, Post.updated_at))
+    query = query.filter(Post.id == post_id) if post_id is not None else query.filter(Post.slug == slug)
+    post = query.first()
+    if not post:
+        raise HTTPException(status_code=404, detail="文章不存在")
+    post_id = post.id
+    rendered = post.content_hash is not None
+    etag, last_modified = _post_validators(post)
+    
+    # 記錄瀏覽量
+    ViewTrackingService.record_view(
+        db=db,
+        content_type="post",
+        content_id=post_id,
+        user_id=current_user.id if current_user else None,
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent", "")
+    )
+    
+    # 尚未預先渲染的舊資料需完整讀取並渲染
+    if rendered:
+        unchanged = not_modified(request, etag, last_modified)
+        if unchanged is not None:
+            return unchanged
+    
+    post = db.query(Post).populate_existing().filter(Post.id == post_id).first()
+    data = process_post_content(post)
+    etag, last_modified = _post_validators(post)
+    return JSONResponse(
+        PostResponse.model_validate(data).model_dump(mode="json"),
+        headers=validator_headers(etag, last_modified)
+    )
+
+
 def process_post_content(post: Post) -> dict:
     """
     處理文章內容，添加 Markdown 渲染結果
     
-    將文章的 Markdown 內容轉換為 HTML，並生成目錄和摘要。
+    使用儲存時預先渲染的 HTML、目錄和摘要；舊資料或渲染器版本變更時才重新渲染並寫回。
     """
+    if PostRenderService.apply(post):
+        session = object_session(post)
+        if session is not None:
+            session.commit()
+    
     post_dict = {
         "id": post.id,
         "title": post.title,
@@ -32,15 +117,11 @@ def process_post_content(post: Post) -> dict:
         "view_count": post.view_count,
         "created_at": post.created_at,
         "updated_at": post.updated_at,
-        # 添加 Markdown 處理結果
-        "content_html": markdown_service.render(post.content),
-        "toc": markdown_service.get_toc(post.content)
+        # 預先渲染的 Markdown 處理結果
+        "content_html": post.content_html,
+        "toc": post.toc
     }
     
-    # 如果沒有摘要，自動生成
-    if not post.excerpt and post.content:
-        post_dict["excerpt"] = markdown_service.extract_excerpt(post.content)
-    
     return post_dict
 
 
@@ -50,41 +131,85 @@ def get_posts(
     search: Optional[str] = Query(None, description="搜尋標題或內容"),
     skip: int = Query(0, ge=0, description="跳過的項目數"),
     limit: int = Query(10, ge=1, le=50, description="限制項目數"),
+    total_mode: str = Query("exact", alias="total", pattern=TOTAL_MODE_PATTERN, description="總數計算方式：exact（精確）、approx（估計）、none（不計算）"),
+    cursor: Optional[str] = Query(None, description="游標分頁：第一頁傳空字串，之後傳入回應的 next_cursor"),
+    fields: Optional[str] = Query(None, description="只回傳指定欄位（逗號分隔），例如 fields=title,slug,excerpt"),
     db: Session = Depends(get_db)
 ):
     """
     取得文章列表，支援分頁、搜尋和發布狀態篩選功能。
+    帶入 cursor 時改用游標分頁（不計算總數）；搜尋時依相關度排序，不支援游標。
+    列表只回傳摘要欄位，不載入 Markdown 內文。
     """
+    selected = parse_fields(fields, PostSummary)
     query = db.query(Post)
     if published_only is not None:
         query = query.filter(Post.is_published == published_only)
     if search:
-        query = query.filter(
-            Post.title.contains(search) |
-            Post.content.contains(search)
+        result = _search_posts(query, search, skip, limit, db)
+        return sparse_response(PostListResponse(**result), selected) if selected else result
+    
+    columns = load_columns(Post, PostSummary, selected)
+    
+    total = next_cursor = None
+    approximate = False
+    if cursor is not None:
+        db_posts, next_cursor = keyset_paginate(query.options(columns), Post, cursor, limit)
+    else:
+        total, approximate = count_cache.count(
+            query, Post.__tablename__, {"published_only": published_only}, total_mode
         )
+        db_posts = query.options(columns).order_by(Post.created_at.desc()).offset(skip).limit(limit).all()
     
-    total = query.count()
-    db_posts = query.order_by(Post.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # 修正：每篇文章都帶有 excerpt（若無則自動產生），並確保 content 欄位存在
     items = []
     for post in db_posts:
-        excerpt = post.excerpt or (markdown_service.extract_excerpt(post.content) if post.content else "")
+        item = loaded_attributes(post)
+        # 舊資料沒有摘要時才讀取內文產生
+        if "excerpt" in item and not item["excerpt"]:
+            item["excerpt"] = markdown_service.extract_excerpt(post.content) if post.content else ""
+        items.append(item)
+    
+    payload = PostListResponse(items=items, total=total, next_cursor=next_cursor, total_approximate=approximate)
+    return sparse_response(payload, selected) if selected else payload
+
+
+def _search_posts(query, search: str, skip: int, limit: int, db: Session) -> dict:
+    """
+    以全文索引搜尋文章
+
+    依相關度排序，只讀取摘要欄位，高亮片段由索引保存的純文字產生，不載入 Markdown 原文。
+    """
+    page_ids, total = post_search.search_page(db, search, query, Post.id, skip, limit)
+    if not page_ids:
+        return {"items": [], "total": total}
+
+    posts_by_id = {
+        post.id: post
+        for post in db.query(Post).options(load_only(
+            Post.id, Post.title, Post.excerpt, Post.featured_image, Post.is_published,
+            Post.slug, Post.view_count, Post.created_at, Post.updated_at
+        )).filter(Post.id.in_(page_ids))
+    }
+    stored = post_search.get_stored(db, page_ids)
+
+    items = []
+    for post_id in page_ids:
+        post = posts_by_id.get(post_id)
+        if post is None:
+            continue
+        body = (stored.get(post_id) or {}).get("body") or ""
         items.append({
             "id": post.id,
             "title": post.title,
-            "excerpt": excerpt,
-            "content": post.content,
+            "excerpt": post.excerpt or body[:200],
             "featured_image": post.featured_image,
             "is_published": post.is_published,
-            "meta_title": post.meta_title,
-            "meta_description": post.meta_description,
-            "meta_keywords": post.meta_keywords,
             "slug": post.slug,
             "view_count": post.view_count,
             "created_at": post.created_at,
-            "updated_at": post.updated_at
+            "updated_at": post.updated_at,
+            "title_highlight": highlight(post.title, search, width=len(post.title)),
+            "highlight": highlight(body, search)
         })
     return {"items": items, "total": total}
 
@@ -157,21 +282,7 @@ def get_post(
     
     獲取指定 ID 的文章完整內容，同時記錄瀏覽統計。
     """
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="文章不存在")
-    
-    # 記錄瀏覽量
-    ViewTrackingService.record_view(
-        db=db,
-        content_type="post",
-        content_id=post_id,
-        user_id=current_user.id if current_user else None,
-        ip_address=request.client.host if request.client else None,
-        user_agent=request.headers.get("user-agent", "")
-    )
-    
-    return process_post_content(post)
+    return _post_detail_response(db, request, current_user, post_id=post_id)
 
 
 @router.get(
@@ -230,21 +341,7 @@ def get_post_by_slug(
     
     使用 SEO 友好的 slug 獲取文章內容，同時記錄瀏覽統計。
     """
-    post = db.query(Post).filter(Post.slug == slug).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="文章不存在")
-    
-    # 記錄瀏覽量
-    ViewTrackingService.record_view(
-        db=db,
-        content_type="post",
-        content_id=post.id,
-        user_id=current_user.id if current_user else None,
-        ip_address=request.client.host if request.client else None,
-        user_agent=request.headers.get("user-agent", "")
-    )
-    
-    return process_post_content(post)
+    return _post_detail_response(db, request, current_user, slug=slug)
 
 
 @router.post(
@@ -320,12 +417,10 @@ def create_post(
     # 建立文章
     post_data = post.model_dump()
     
-    # 如果沒有摘要，自動從內容生成
-    if not post_data.get('excerpt') and post_data.get('content'):
-        post_data['excerpt'] = markdown_service.extract_excerpt(post_data['content'])
-    
+    # 摘要為空時由渲染結果自動產生
     db_post = Post(**post_data)
     db_post.slug = db_post.generate_slug(post.title)
+    PostRenderService.apply(db_post)
     
     # 檢查 slug 是否重複
     slug_exists = db.query(Post).filter(Post.slug == db_post.slug).first()
@@ -336,6 +431,8 @@ def create_post(
     db.add(db_post)
     db.commit()
     db.refresh(db_post)
+
+    _sync_post_indexes(db, db_post)
     return process_post_content(db_post)
 
 
@@ -409,9 +506,9 @@ def update_post(
     
     update_data = post_update.model_dump(exclude_unset=True)
     
-    # 如果更新內容但沒有摘要，自動生成摘要
+    # 如果更新內容但沒有摘要，清空摘要讓渲染結果重新產生
     if "content" in update_data and update_data["content"] and not update_data.get("excerpt"):
-        update_data["excerpt"] = markdown_service.extract_excerpt(update_data["content"])
+        update_data["excerpt"] = None
     
     # 如果更新標題，需要重新生成 slug
     if "title" in update_data:
@@ -427,9 +524,12 @@ def update_post(
     
     for field, value in update_data.items():
         setattr(post, field, value)
+    PostRenderService.apply(post)
     
     db.commit()
     db.refresh(post)
+
+    _sync_post_indexes(db, post)
     return process_post_content(post)
 
 
@@ -494,5 +594,6 @@ def delete_post(
     
     db.delete(post)
     db.commit()
-    
+
+    _drop_post_indexes(db, post_id)
     return {"message": "文章已刪除", "deleted_id": post_id} 
\ No newline at end of file
@@ -1,16 +1,89 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductListResponse
+from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductSummary, ProductListResponse
 from app.services.view_tracking_service import ViewTrackingService
+from app.services.recommendation_service import recommendation_service
+from app.services.search_service import product_search, product_document
+from app.services.autocomplete_service import autocomplete_index
+from app.services.product_cache import product_cache
+from app.utils.pagination import keyset_paginate
+from app.utils.count_cache import count_cache, TOTAL_MODE_PATTERN
+from app.utils.projection import parse_fields, load_columns, loaded_attributes, sparse_response
+from app.utils.conditional import not_modified, validator_headers
 from app.auth import get_current_admin_user, get_current_user_optional
 from app.models.user import User
 
 router = APIRouter(prefix="/products", tags=["商品"])
 
 
+def _sync_product_indexes(db: Session, product: Product) -> None:
+    """商品異動後同步搜尋、自動完成索引與商品快取"""
+    product_cache.invalidate(product.id)
+    product_search.upsert(db, product.id, product_document(product))
+    autocomplete_index.upsert_product(product)
+
+
+def _drop_product_indexes(db: Session, product_id: int) -> None:
+    """商品刪除後移除搜尋、自動完成索引與商品快取"""
+    product_cache.invalidate(product_id)
+    product_search.delete(db, product_id)
+    autocomplete_index.remove("product", product_id)
+
+
+def _cached_product_response(
+    db: Session,
+    request: Request,
+    current_user: Optional[User],
+    product_id: Optional[int] = None,
+    slug: Optional[str] = None
+) -> JSONResponse:
+    """
+    由商品快取回應單一商品
+
+    快取未命中時查詢資料庫並寫入快取；庫存與瀏覽次數在記錄瀏覽後以主鍵查詢最新值。
+    用戶端帶有相符的 If-None-Match / If-Modified-Since 時直接回應 304。
+    """
+    data = product_cache.lookup(product_id=product_id, slug=slug)
+    if data is None:
+        query = db.query(Product)
+        query = query.filter(Product.id == product_id) if product_id is not None else query.filter(Product.slug == slug)
+        product = query.first()
+        if not product:
+            raise HTTPException(status_code=404, detail="商品不存在")
+        data = product_cache.store(product)
+
+    # 記錄瀏覽量
+    ViewTrackingService.record_view(
+        db=db,
+        content_type="product",
+        content_id=data["id"],
+        user_id=current_user.id if current_user else None,
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent", "")
+    )
+
+    data = product_cache.with_live_fields(db, data)
+    if data is None:
+        raise HTTPException(status_code=404, detail="商品不存在")
+
+    etag, last_modified = product_cache.validators(data)
+    unchanged = not_modified(request, etag, last_modified)
+    if unchanged is not None:
+        return unchanged
+    return JSONResponse(data, headers=validator_headers(etag, last_modified))
+
+
+def _product_list_response(products: List[Product], fields: Optional[List[str]], **pagination):
+    """組成商品列表回應；指定 fields 時只輸出已載入的指定欄位"""
+    if fields is None:
+        return ProductListResponse(items=products, **pagination)
+    items = [loaded_attributes(product) for product in products]
+    return sparse_response(ProductListResponse(items=items, **pagination), fields)
+
 
 @router.get("", response_model=ProductListResponse, summary="取得商品列表")
 def get_products(
@@ -18,11 +91,18 @@ def get_products(
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0, description="跳過的項目數"),
     limit: int = Query(20, ge=1, le=100, description="限制項目數"),
+    total_mode: str = Query("exact", alias="total", pattern=TOTAL_MODE_PATTERN, description="總數計算方式：exact（精確）、approx（估計）、none（不計算）"),
+    cursor: Optional[str] = Query(None, description="游標分頁：第一頁傳空字串，之後傳入回應的 next_cursor"),
+    fields: Optional[str] = Query(None, description="只回傳指定欄位（逗號分隔），例如 fields=name,slug,price"),
 ):
     """
     取得商品列表，支援多種篩選和搜尋選項。
     此端點會從查詢參數中讀取篩選條件。
+    帶入 cursor 時改用游標分頁（依建立時間新到舊，不計算總數）；搜尋時依相關度排序，不支援游標。
+    列表只回傳摘要欄位（不含描述、圖庫與 SEO 欄位），完整資料請使用單一商品端點。
     """
+    selected = parse_fields(fields, ProductSummary)
+    columns = load_columns(Product, ProductSummary, selected)
     query = db.query(Product)
     
     # 從請求的查詢參數中獲取篩選條件
@@ -33,12 +113,6 @@ def get_products(
     min_price = params.get("min_price")
     max_price = params.get("max_price")
 
-    if search:
-        query = query.filter(
-            Product.name.contains(search) | 
-            Product.description.contains(search)
-        )
-        
     if status:
         if status == 'active':
             query = query.filter(Product.is_active == True)
@@ -57,10 +131,26 @@ def get_products(
     if max_price is not None:
         query = query.filter(Product.price <= float(max_price))
     
-    total = query.count()
-    products = query.order_by(Product.created_at.desc()).offset(skip).limit(limit).all()
+    if search:
+        # 篩選條件與全文索引在資料庫端一起套用，依相關度分頁
+        page_ids, total = product_search.search_page(db, search, query, Product.id, skip, limit)
+
+        products_by_id = {
+            product.id: product
+            for product in db.query(Product).options(columns).filter(Product.id.in_(page_ids)).all()
+        } if page_ids else {}
+        products = [products_by_id[product_id] for product_id in page_ids if product_id in products_by_id]
+        return _product_list_response(products, selected, total=total)
+
+    if cursor is not None:
+        products, next_cursor = keyset_paginate(query.options(columns), Product, cursor, limit)
+        return _product_list_response(products, selected, next_cursor=next_cursor)
+
+    filters = {"status": status, "featured": featured, "min_price": min_price, "max_price": max_price}
+    total, approximate = count_cache.count(query, Product.__tablename__, filters, total_mode)
+    products = query.options(columns).order_by(Product.created_at.desc()).offset(skip).limit(limit).all()
     
-    return ProductListResponse(items=products, total=total)
+    return _product_list_response(products, selected, total=total, total_approximate=approximate)
 
 
 
@@ -76,6 +166,7 @@ def get_products(
     - 🔍 完整的商品資訊回應
     - 💰 包含價格計算和特價資訊
     - 📈 支援用戶行為追蹤
+    - ⚡ 商品資料由快取提供，庫存與瀏覽次數即時查詢
     
     ## 注意事項
     - 會自動記錄商品瀏覽量
@@ -118,21 +209,7 @@ def get_product(
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="商品不存在")
-    
-    # 記錄瀏覽量
-    ViewTrackingService.record_view(
-        db=db,
-        content_type="product",
-        content_id=product_id,
-        user_id=current_user.id if current_user else None,
-        ip_address=request.client.host if request.client else None,
-        user_agent=request.headers.get("user-agent", "")
-    )
-    
-    return product
+    return _cached_product_response(db, request, current_user, product_id=product_id)
 
 
 @router.get("/slug/{slug}", response_model=ProductResponse)
@@ -143,21 +220,7 @@ def get_product_by_slug(
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """透過 slug 取得商品"""
-    product = db.query(Product).filter(Product.slug == slug).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="商品不存在")
-    
-    # 記錄瀏覽量
-    ViewTrackingService.record_view(
-        db=db,
-        content_type="product",
-        content_id=product.id,
-        user_id=current_user.id if current_user else None,
-        ip_address=request.client.host if request.client else None,
-        user_agent=request.headers.get("user-agent", "")
-    )
-    
-    return product
+    return _cached_product_response(db, request, current_user, slug=slug)
 
 
 @router.post("/", response_model=ProductResponse)
@@ -187,6 +250,8 @@ def create_product(
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+
+    _sync_product_indexes(db, db_product)
     return db_product
 
 
@@ -230,6 +295,8 @@ def update_product(
     
     db.commit()
     db.refresh(product)
+
+    _sync_product_indexes(db, product)
     return product
 
 
@@ -255,6 +322,8 @@ def delete_product(
     
     db.delete(product)
     db.commit()
+
+    _drop_product_indexes(db, product_id)
     return {"message": "商品已刪除"}
 
 
@@ -264,18 +333,9 @@ def get_related_products(
     limit: int = Query(4, ge=1, le=20, description="限制項目數"),
     db: Session = Depends(get_db)
 ):
-    """取得相關商品"""
-    current_product = db.query(Product).filter(Product.id == product_id).first()
+    """取得相關商品（依預先計算的共同瀏覽 / 共同購買推薦排序）"""
+    current_product = db.query(Product.id).filter(Product.id == product_id).first()
     if not current_product:
         raise HTTPException(status_code=404, detail="商品不存在")
-    
-    # 取得其他商品（排除目前商品）
-    query = db.query(Product).filter(
-        Product.id != product_id,
-        Product.is_active == True
-    )
-    
-    # 如果沒有足夠的相關商品，補足其他商品
-    other_products = query.order_by(Product.created_at.desc()).limit(limit).all()
-    
-    return other_products 
\ No newline at end of file
+
+    return recommendation_service.get_related(db, product_id, limit)
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.services.autocomplete_service import autocomplete_index
+
+router = APIRouter(prefix="/search", tags=["搜尋"])
+
+
+@router.get(
+    "/autocomplete",
+    summary="⌨️ 搜尋自動完成",
+    description="""
+    ## 🎯 功能描述
+    依使用者輸入的前綴提供商品名稱、SKU 與文章標題的即時建議。
+
+    ## 📋 功能特點
+    - ⚡ 程序內前綴索引，查詢不存取資料庫
+    - 📈 依瀏覽次數排序
+    - 🔤 比對名稱開頭、任一單字開頭或 SKU
+    - 🔄 商品 / 文章異動時即時更新；索引過期後於回應送出後在背景重建，不延遲查詢
+
+    ## 🔍 參數說明
+    - **q**: 使用者輸入的前綴
+    - **type**: 限定 `product` 或 `post`，不指定則兩者皆包含
+    - **limit**: 最多回傳筆數
+    """,
+    responses={
+        200: {
+            "description": "成功取得建議",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "query": "藍牙",
+                        "items": [
+                            {
+                                "type": "product",
+                                "id": 12,
+                                "label": "藍牙耳機 Pro",
+                                "slug": "lan-ya-er-ji-pro",
+                                "url": "/product/lan-ya-er-ji-pro",
+                                "weight": 1250
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+    }
+)
+def autocomplete(
+    background_tasks: BackgroundTasks,
+    q: str = Query(..., min_length=1, max_length=100, description="搜尋前綴"),
+    type: Optional[str] = Query(None, pattern="^(product|post)$", description="內容類型"),
+    limit: int = Query(8, ge=1, le=20, description="限制項目數"),
+    db: Session = Depends(get_db)
+):
+    """取得搜尋自動完成建議"""
+    autocomplete_index.ensure_loaded(db)
+    if autocomplete_index.is_stale():
+        # 索引過期時於回應送出後重建，本次查詢仍使用舊索引
+        background_tasks.add_task(autocomplete_index.rebuild_detached)
+    return {"query": q, "items": autocomplete_index.suggest(q, limit, type)}
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, FileResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 import json
@@ -15,6 +16,7 @@ from ..schemas.settings import (
     PaymentTransferDetails, PaymentLinePayDetails, PaymentECPayDetails, PaymentPayPalDetails
 )
 from ..auth import get_current_user, get_current_admin_user
+from ..utils.conditional import not_modified, query_etag, validator_headers
 
 router = APIRouter(tags=["系統設定"])
 
@@ -84,11 +86,13 @@ class SettingsManager:
         ).all()
         return {setting.key: setting.parse_value() for setting in settings}
     
+    def public_settings_query(self):
+        """公開設定的查詢"""
+        return self.db.query(SystemSettings).filter(SystemSettings.is_public == True)
+    
     def get_public_settings(self) -> Dict[str, Any]:
         """獲取所有公開設定"""
-        settings = self.db.query(SystemSettings).filter(
-            SystemSettings.is_public == True
-        ).all()
+        settings = self.public_settings_query().all()
         return {setting.key: setting.parse_value() for setting in settings}
 
 
@@ -110,9 +114,17 @@ async def get_all_settings(
 
 
 @router.get("/settings/public")
-async def get_public_settings(db: Session = Depends(get_db)):
+async def get_public_settings(request: Request, response: Response, db: Session = Depends(get_db)):
     """獲取公開設定（不需要認證）"""
     manager = SettingsManager(db)
+    # updated_at 只精確到秒，另納入設定值長度，同一秒內的修改也能反映
+    etag = query_etag(
+        manager.public_settings_query(), SystemSettings, func.sum(func.length(SystemSettings.value))
+    )
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(validator_headers(etag))
     return manager.get_public_settings()
 
 
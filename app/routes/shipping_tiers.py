@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -14,6 +14,7 @@ from app.schemas.shipping_tier import (
 from app.services.shipping_tier_service import ShippingTierService
 from app.auth import get_current_admin_user, get_current_user_optional
 from app.models.user import User
+from app.utils.conditional import not_modified, query_etag, validator_headers
 
 
 router = APIRouter(prefix="/shipping-tiers", tags=["運費級距"])
@@ -75,6 +76,8 @@ router = APIRouter(prefix="/shipping-tiers", tags=["運費級距"])
     }
 )
 async def get_shipping_tiers(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="跳過的項目數"),
     limit: int = Query(100, ge=1, le=100, description="每頁項目數限制"),
     is_active: Optional[bool] = Query(None, description="啟用狀態篩選"),
@@ -87,6 +90,15 @@ async def get_shipping_tiers(
     支援多種篩選條件的運費級距列表查詢。
     """
     shipping_service = ShippingTierService(db)
+    etag = query_etag(
+        shipping_service.shipping_tiers_query(is_active), ShippingTier,
+        extra=f"{skip}:{limit}:{sort_by_amount}"
+    )
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(validator_headers(etag))
+
     tiers = shipping_service.get_shipping_tiers(
         skip=skip,
         limit=limit,
@@ -152,6 +164,8 @@ async def get_shipping_tiers(
     }
 )
 async def get_active_shipping_tiers(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
@@ -160,6 +174,12 @@ async def get_active_shipping_tiers(
     返回所有啟用的運費級距，按金額排序。
     """
     shipping_service = ShippingTierService(db)
+    etag = query_etag(shipping_service.shipping_tiers_query(is_active=True), ShippingTier)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(validator_headers(etag))
+
     tiers = shipping_service.get_active_shipping_tiers()
     
     return [ShippingTierResponse.model_validate(tier) for tier in tiers]
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.services.view_tracking_service import ViewTrackingService
-from app.auth import get_current_user_optional
+from app.services.attribution_service import AttributionService, GROUP_BY_FIELDS
+from app.auth import get_current_user_optional, get_current_admin_user
 from app.models.user import User
 from pydantic import BaseModel
 from typing import Optional, List, Dict
+from datetime import date
 from urllib.parse import urlparse, parse_qs
 
 
@@ -210,22 +212,22 @@ def get_popular_content(
     summary="📈 獲取趨勢內容",
     description="""
     ## 🎯 功能描述
-    獲取指定內容類型的趨勢項目，基於短時間內的瀏覽增長。
+    獲取指定內容類型的趨勢項目，基於時間衰減的瀏覽分數。
     
     ## 📋 功能特點
-    - 📊 基於瀏覽增長率排序
-    - ⏰ 短時間範圍分析
+    - 📊 基於指數衰減分數排序（越新的瀏覽權重越高）
+    - ⚡ 分數於瀏覽寫入時增量更新，讀取不需掃描瀏覽記錄
     - 🔥 即時趨勢發現
-    - 📈 增長率計算
+    - 📈 加速度指標（短期與長期瀏覽率的比值）
     
     ## 🔍 統計邏輯
-    - 分析指定小時數內的瀏覽趨勢
-    - 計算瀏覽增長率
-    - 識別快速增長的內容
-    - 按趨勢強度排序
+    - 短期分數半衰期 6 小時，作為排序依據
+    - 長期分數半衰期 72 小時，用於計算加速度
+    - acceleration > 1 代表近期瀏覽正在加速
+    - 分數定期保存，重啟後自動載入
     
     ## 📊 回應格式
-    返回趨勢項目列表，包含增長率和內容資訊。
+    返回趨勢項目列表，包含趨勢分數、加速度和內容資訊。
     """,
     responses={
         200: {
@@ -235,12 +237,12 @@ def get_popular_content(
                     "example": {
                         "trending_items": [
                             {
-                                "content_id": 456,
-                                "content_type": "post",
-                                "view_count": 123,
-                                "growth_rate": 85.2,
+                                "id": 456,
                                 "title": "趨勢文章",
-                                "url": "/blog/456"
+                                "slug": "trending-post",
+                                "total_views": 1234,
+                                "trend_score": 85.2,
+                                "acceleration": 1.8
                             }
                         ]
                     }
@@ -259,7 +261,7 @@ def get_trending_content(
     """
     獲取趨勢內容
     
-    分析短時間內瀏覽量快速增長的內容。
+    從記憶體中的時間衰減分數取得目前趨勢內容。
     """
     
     if content_type not in ["post", "product"]:
@@ -355,23 +357,21 @@ def get_content_stats(
     summary="📚 獲取瀏覽歷史",
     description="""
     ## 🎯 功能描述
-    獲取當前用戶的瀏覽歷史記錄。
+    獲取當前用戶的最近瀏覽記錄（每個內容只保留最近一次）。
     
     ## 📋 功能特點
     - 🔐 需要用戶認證
     - 📅 時間順序排列
     - 🔍 內容類型篩選
-    - 📊 瀏覽詳情記錄
+    - ♻️ 重複瀏覽自動去重
+    - ⚡ 讀取固定長度的最近瀏覽清單，不掃描瀏覽記錄
     
     ## 🔍 記錄項目
     - 瀏覽時間
     - 內容類型和 ID
-    - 停留時間
-    - 來源頁面
-    - 瀏覽序列
     
     ## 📊 回應格式
-    返回用戶的瀏覽歷史陣列，按時間降序排列。
+    返回用戶的瀏覽歷史陣列，按時間降序排列，最多保留 50 筆。
     """,
     responses={
         200: {
@@ -381,12 +381,9 @@ def get_content_stats(
                     "example": {
                         "history": [
                             {
-                                "id": 789,
                                 "content_type": "product",
                                 "content_id": 123,
-                                "viewed_at": "2024-01-15T14:30:00",
-                                "duration": 45,
-                                "referrer": "https://google.com"
+                                "viewed_at": "2024-01-15T14:30:00"
                             }
                         ]
                     }
@@ -399,7 +396,7 @@ def get_content_stats(
 )
 def get_user_view_history(
     content_type: Optional[str] = None,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=50, description="限制項目數"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_optional)
 ):
@@ -426,12 +423,254 @@ def get_user_view_history(
     history_data = []
     for view in history:
         history_data.append({
-            "id": view.id,
-            "content_type": view.content_type,
-            "content_id": view.content_id,
-            "viewed_at": view.viewed_at.isoformat(),
-            "duration": view.duration,
-            "referrer": view.referrer
+            "content_type": view["content_type"],
+            "content_id": view["content_id"],
+            "viewed_at": view["viewed_at"].isoformat()
         })
     
-    return {"history": history_data} 
\ No newline at end of file
+    return {"history": history_data} 
+
+
+@router.get(
+    "/continue-browsing",
+    summary="👀 獲取繼續瀏覽清單",
+    description="""
+    ## 🎯 功能描述
+    獲取當前用戶最近瀏覽的文章與商品，包含標題、連結與圖片，供「繼續瀏覽」區塊使用。
+    
+    ## 📋 功能特點
+    - 🔐 需要用戶認證
+    - ♻️ 已去重的最近瀏覽清單
+    - 🚫 自動略過已下架商品與未發布文章
+    """,
+    responses={
+        200: {
+            "description": "成功獲取繼續瀏覽清單",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "items": [
+                            {
+                                "content_type": "product",
+                                "content_id": 123,
+                                "viewed_at": "2024-01-15T14:30:00",
+                                "title": "精選商品",
+                                "url": "/product/selected-product",
+                                "image": "/static/uploads/product.jpg",
+                                "price": 80.0
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        400: {"description": "無效的內容類型"},
+        401: {"description": "需要用戶認證"}
+    }
+)
+def get_continue_browsing(
+    content_type: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50, description="限制項目數"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_optional)
+):
+    """
+    獲取繼續瀏覽清單
+    
+    返回用戶最近瀏覽且仍可瀏覽的內容。
+    """
+    
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    if content_type and content_type not in ["post", "product"]:
+        raise HTTPException(status_code=400, detail="Invalid content type")
+    
+    items = ViewTrackingService.get_continue_browsing(
+        db=db,
+        user_id=current_user.id,
+        content_type=content_type,
+        limit=limit
+    )
+    
+    for item in items:
+        item["viewed_at"] = item["viewed_at"].isoformat()
+    
+    return {"items": items}
+
+@router.get(
+    "/attribution",
+    summary="🎯 獲取來源歸因彙總",
+    description="""
+    ## 🎯 功能描述
+    依來源、媒介、活動彙總指定期間的瀏覽、會話、訂單與營收。
+    
+    ## 📋 功能特點
+    - 🔐 需要管理員權限
+    - 📊 讀取每日歸因彙總表，不掃描原始瀏覽記錄
+    - 🔄 尚未彙總的日期在回應送出後於背景補算；首次回補大量歷史資料請使用 `python -m app.services.attribution_service`
+    - 🧮 可自訂分組維度（source / medium / campaign）
+    
+    ## 🔍 歸因規則
+    - 有 UTM 參數時以 utm_source / utm_medium 為準
+    - 否則以來源網域為 source、referral 為 medium
+    - 無來源或站內來源視為 (direct) / (none)
+    - 訂單歸因到下單使用者 30 天內最後一次有來源的瀏覽
+    
+    ## ⚠️ 注意事項
+    跨日加總的獨立會話數為近似值。
+    """,
+    responses={
+        200: {
+            "description": "成功獲取來源歸因彙總",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "period_days": 30,
+                        "group_by": ["source", "medium"],
+                        "items": [
+                            {
+                                "source": "google",
+                                "medium": "cpc",
+                                "views": 1234,
+                                "unique_sessions": 567,
+                                "orders": 12,
+                                "revenue": 15800.0,
+                                "conversion_rate": 2.12
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        401: {"description": "需要管理員權限"}
+    }
+)
+def get_attribution_summary(
+    background_tasks: BackgroundTasks,
+    days: int = Query(30, ge=1, le=366, description="統計天數"),
+    group_by: str = Query("source,medium", description="分組維度，以逗號分隔（source/medium/campaign）"),
+    limit: int = Query(50, ge=1, le=500, description="限制項目數"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    獲取來源歸因彙總
+    
+    從每日歸因彙總表計算行銷來源成效。
+    """
+    dimensions = [field.strip() for field in group_by.split(",") if field.strip()]
+    invalid = [field for field in dimensions if field not in GROUP_BY_FIELDS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid group_by field: {', '.join(invalid)}")
+    
+    # 增量彙總在回應送出後執行，報表讀取目前已彙總的資料
+    background_tasks.add_task(AttributionService.refresh_detached)
+    
+    items = AttributionService.get_summary(
+        db=db,
+        days=days,
+        group_by=dimensions,
+        limit=limit
+    )
+    
+    return {"period_days": days, "group_by": dimensions or ["source"], "items": items}
+
+
+@router.get(
+    "/attribution/daily",
+    summary="📅 獲取每日歸因趨勢",
+    description="""
+    ## 🎯 功能描述
+    取得指定來源 / 媒介 / 活動的每日瀏覽、會話、訂單與營收趨勢。
+    
+    ## 📋 功能特點
+    - 🔐 需要管理員權限
+    - 📊 讀取每日歸因彙總表（增量彙總在回應送出後於背景執行）
+    - 🔍 可依 source、medium、campaign 篩選
+    """,
+    responses={
+        200: {
+            "description": "成功獲取每日歸因趨勢",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "period_days": 7,
+                        "daily": [
+                            {"date": "2024-01-01", "views": 50, "unique_sessions": 30, "orders": 2, "revenue": 1200.0}
+                        ]
+                    }
+                }
+            }
+        },
+        401: {"description": "需要管理員權限"}
+    }
+)
+def get_attribution_daily(
+    background_tasks: BackgroundTasks,
+    days: int = Query(30, ge=1, le=366, description="統計天數"),
+    source: Optional[str] = Query(None, description="來源篩選"),
+    medium: Optional[str] = Query(None, description="媒介篩選"),
+    campaign: Optional[str] = Query(None, description="活動篩選"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    獲取每日歸因趨勢
+    
+    回傳指定期間內逐日的歸因指標。
+    """
+    background_tasks.add_task(AttributionService.refresh_detached)
+    
+    daily = AttributionService.get_daily(
+        db=db,
+        days=days,
+        source=source,
+        medium=medium,
+        campaign=campaign
+    )
+    
+    return {"period_days": days, "daily": daily}
+
+
+@router.post(
+    "/attribution/rollup",
+    summary="🔄 重新計算歸因彙總",
+    description="""
+    ## 🎯 功能描述
+    手動觸發來源歸因彙總的增量計算，或重新計算指定日期。
+    
+    ## 📋 功能特點
+    - 🔐 需要管理員權限
+    - 🔄 未指定日期時補算所有尚未彙總的日期
+    - 📅 指定日期時只重算該日
+    """,
+    responses={
+        200: {
+            "description": "成功重新計算",
+            "content": {
+                "application/json": {
+                    "example": {"success": True, "processed_dates": ["2024-01-01", "2024-01-02"]}
+                }
+            }
+        },
+        401: {"description": "需要管理員權限"}
+    }
+)
+def rollup_attribution(
+    stat_date: Optional[date] = Query(None, description="指定重算的日期"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    重新計算歸因彙總
+    
+    供排程或管理員手動觸發。
+    """
+    if stat_date:
+        AttributionService.recompute_day(db, stat_date)
+        processed = [stat_date]
+    else:
+        processed = AttributionService.refresh(db, force=True)
+    
+    return {"success": True, "processed_dates": [day.isoformat() for day in processed]}
@@ -169,7 +169,9 @@ class OrderSummary(BaseSchema):
 
 class OrderListResponse(BaseSchema):
     items: List[OrderSummary]
-    total: int
+    total: Optional[int] = None          # 游標分頁模式不計算總數
+    next_cursor: Optional[str] = None    # 游標分頁模式的下一頁游標
+    total_approximate: bool = False      # total 是否為估計值（total=approx）
 
 
 class OrderStatusUpdate(BaseSchema):
@@ -47,12 +47,14 @@ class PostResponse(PostBase, BaseResponseSchema, SlugSchema):
 
 
 class PostSummary(BaseResponseSchema, SlugSchema):
-    """文章列表項目摘要"""
-    title: str
+    """文章列表項目摘要（不含內文；使用 fields 參數時只會包含指定的欄位）"""
+    title: Optional[str] = None
     excerpt: Optional[str] = None
     featured_image: Optional[str] = None
-    is_published: bool
-    view_count: int = 0
+    is_published: Optional[bool] = None
+    view_count: Optional[int] = None
+    title_highlight: Optional[str] = None  # 搜尋時：標題高亮 HTML
+    highlight: Optional[str] = None        # 搜尋時：內文命中片段（高亮 HTML）
 
     class Config:
         from_attributes = True
@@ -61,4 +63,6 @@ class PostSummary(BaseResponseSchema, SlugSchema):
 class PostListResponse(BaseSchema):
     """文章列表的分頁回應"""
     items: List[PostSummary]
-    total: int 
\ No newline at end of file
+    total: Optional[int] = None          # 游標分頁模式不計算總數
+    next_cursor: Optional[str] = None    # 游標分頁模式的下一頁游標
+    total_approximate: bool = False      # total 是否為估計值（total=approx） 
\ No newline at end of file
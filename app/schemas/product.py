@@ -1,7 +1,7 @@
 import json
 from typing import Optional, List, Type, Any
 from decimal import Decimal
-from pydantic import field_validator, GetCoreSchemaHandler
+from pydantic import Field, field_validator, model_validator, GetCoreSchemaHandler
 from pydantic_core import CoreSchema, PydanticCustomError, core_schema
 
 from app.schemas.base import BaseSchema, BaseResponseSchema
@@ -92,6 +92,104 @@ class ProductResponse(ProductBase, BaseResponseSchema):
     class Config:
         from_attributes = True
 
+class ProductSummary(BaseResponseSchema):
+    """
+    商品列表項目摘要
+
+    不含描述、圖庫與 SEO 欄位；使用 fields 參數時只會包含指定的欄位。
+    """
+    name: Optional[str] = None
+    slug: Optional[str] = None
+    short_description: Optional[str] = None
+    price: Optional[Decimal] = None
+    sale_price: Optional[Decimal] = None
+    sku: Optional[str] = None
+    stock_quantity: Optional[int] = None
+    is_active: Optional[bool] = None
+    is_featured: Optional[bool] = None
+    featured_image: Optional[str] = None
+    view_count: Optional[int] = None
+
+    @field_validator('featured_image', mode='before')
+    @classmethod
+    def add_featured_image_prefix(cls, v: Optional[str]) -> Optional[str]:
+        if v and not v.startswith('/static/'):
+            return f"/static/images/{v}"
+        return v
+
+    class Config:
+        from_attributes = True
+
 class ProductListResponse(BaseSchema):
-    items: List[ProductResponse]
-    total: int
+    items: List[ProductSummary]
+    total: Optional[int] = None          # 游標分頁模式不計算總數
+    next_cursor: Optional[str] = None    # 游標分頁模式的下一頁游標
+    total_approximate: bool = False      # total 是否為估計值（total=approx）
+
+
+class ProductBulkUpdate(BaseSchema):
+    """
+    批次更新商品
+
+    以 product_ids、篩選條件（search / status）或 all_products 三擇一選取商品，
+    並套用一或多個操作；百分比調整以調整前的原價計算。
+    """
+    # 選取商品
+    product_ids: Optional[List[int]] = Field(None, description="指定商品 ID", min_length=1)
+    search: Optional[str] = Field(None, description="篩選名稱、描述或商品編號包含關鍵字的商品", min_length=1)
+    status: Optional[str] = Field(None, description="篩選狀態：active / inactive / featured",
+                                  pattern="^(active|inactive|featured)$")
+    all_products: bool = Field(False, description="套用到所有商品（需明確指定）")
+
+    # 價格
+    price: Optional[Decimal] = Field(None, description="設定原價", gt=0)
+    price_percent: Optional[Decimal] = Field(None, description="原價調整百分比，例如 10 為漲價 10%、-10 為降價 10%", gt=-100)
+    sale_price: Optional[Decimal] = Field(None, description="設定特價", gt=0)
+    sale_percent: Optional[Decimal] = Field(None, description="依原價打折設定特價，例如 20 為原價的 8 折", gt=0, lt=100)
+    clear_sale_price: bool = Field(False, description="清除特價")
+
+    # 狀態
+    is_active: Optional[bool] = Field(None, description="上架 / 下架")
+    is_featured: Optional[bool] = Field(None, description="設定 / 取消推薦商品")
+
+    # 庫存
+    stock_quantity: Optional[int] = Field(None, description="設定庫存數量", ge=0)
+    stock_delta: Optional[int] = Field(None, description="增減庫存數量（結果最少為 0）")
+
+    @field_validator('search', mode='before')
+    @classmethod
+    def strip_search(cls, v):
+        """去除前後空白；空白關鍵字會因 min_length 驗證失敗，不會變成選取全部商品"""
+        return v.strip() if isinstance(v, str) else v
+
+    @model_validator(mode="after")
+    def validate_selection_and_operations(self):
+        """驗證選取方式只有一種、至少有一個操作，且同一欄位的操作不衝突"""
+        selections = [
+            self.product_ids is not None,
+            self.search is not None or self.status is not None,
+            self.all_products,
+        ]
+        if sum(selections) != 1:
+            raise ValueError("請擇一指定 product_ids、篩選條件（search / status）或 all_products")
+
+        conflicts = [
+            ("price", "price_percent"),
+            ("sale_price", "sale_percent", "clear_sale_price"),
+            ("stock_quantity", "stock_delta"),
+        ]
+        for fields in conflicts:
+            if sum(getattr(self, field) not in (None, False) for field in fields) > 1:
+                raise ValueError(f"{' / '.join(fields)} 只能擇一指定")
+
+        operations = ("price", "price_percent", "sale_price", "sale_percent", "is_active",
+                      "is_featured", "stock_quantity", "stock_delta")
+        if not self.clear_sale_price and all(getattr(self, field) is None for field in operations):
+            raise ValueError("請至少指定一個操作")
+        return self
+
+
+class ProductBulkUpdateResponse(BaseSchema):
+    message: str
+    affected: int
+    product_ids: List[int]
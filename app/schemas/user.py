@@ -134,4 +134,5 @@ class TokenData(BaseSchema):
 class UserListResponse(BaseSchema):
     """使用者列表的分頁回應"""
     items: list[UserResponse]
-    total: int 
\ No newline at end of file
+    total: Optional[int] = None          # 游標分頁模式不計算總數
+    next_cursor: Optional[str] = None    # 游標分頁模式的下一頁游標
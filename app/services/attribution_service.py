@@ -0,0 +1,357 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, desc, or_
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.models.attribution import AttributionDailyStats
+from app.models.view_log import ViewLog
+from app.models.order import Order, OrderStatus
+from app.config import settings
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+from typing import Optional, Dict, List, Tuple
+from urllib.parse import urlparse
+from app.utils.logger import app_logger
+import bisect
+import threading
+
+
+DIRECT_SOURCE = "(direct)"
+NO_MEDIUM = "(none)"
+NO_CAMPAIGN = "(not set)"
+
+# 計入營收的訂單狀態（與即時分析一致）
+REVENUE_STATUSES = (OrderStatus.CONFIRMED, OrderStatus.SHIPPED, OrderStatus.DELIVERED)
+
+# 訂單歸因回溯天數（最後一次有來源資訊的瀏覽）
+ATTRIBUTION_WINDOW_DAYS = 30
+
+# 首次建立彙總時最多回補的天數
+MAX_BACKFILL_DAYS = 400
+
+# 同一程序內同時只執行一個彙總，避免對同一天重複刪除 / 寫入
+_refresh_lock = threading.Lock()
+
+GROUP_BY_FIELDS = ("source", "medium", "campaign")
+
+
+class AttributionService:
+    """來源歸因彙總服務"""
+
+    # 今日（未完成）資料的重算間隔
+    refresh_interval = timedelta(minutes=5)
+    _last_refresh: Optional[datetime] = None
+
+    @staticmethod
+    def _site_host() -> str:
+        return (urlparse(settings.site_url).hostname or "").lower()
+
+    @staticmethod
+    def normalize_source(
+        utm_source: Optional[str],
+        utm_medium: Optional[str],
+        utm_campaign: Optional[str],
+        referrer: Optional[str]
+    ) -> Tuple[str, str, str]:
+        """將 UTM 參數與來源頁面正規化為 (source, medium, campaign)"""
+        campaign = (utm_campaign or "").strip().lower()[:100] or NO_CAMPAIGN
+
+        source = (utm_source or "").strip().lower()[:100]
+        if source:
+            medium = (utm_medium or "").strip().lower()[:100] or NO_MEDIUM
+            return source, medium, campaign
+
+        host = ""
+        if referrer:
+            host = (urlparse(referrer).hostname or "").lower()
+            if host.startswith("www."):
+                host = host[4:]
+
+        # 站內導覽不算外部來源
+        site_host = AttributionService._site_host()
+        if not host or host == site_host or host == f"www.{site_host}":
+            return DIRECT_SOURCE, NO_MEDIUM, campaign
+
+        return host[:100], "referral", campaign
+
+    @staticmethod
+    def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+        start = datetime.combine(day, time.min)
+        return start, start + timedelta(days=1)
+
+    @staticmethod
+    def _attribute_orders(db: Session, day: date) -> Dict[Tuple[str, str, str], Dict]:
+        """將當日訂單歸因到下單使用者最後一次有來源資訊的瀏覽"""
+        start, end = AttributionService._day_bounds(day)
+
+        orders = db.query(
+            Order.user_id, Order.created_at, Order.total_amount, Order.status
+        ).filter(
+            and_(Order.created_at >= start, Order.created_at < end)
+        ).all()
+
+        totals: Dict[Tuple[str, str, str], Dict] = {}
+        if not orders:
+            return totals
+
+        # 一次取回所有下單使用者在歸因區間內的有來源瀏覽
+        user_ids = {o.user_id for o in orders if o.user_id}
+        touches: Dict[int, Tuple[List[datetime], List[Tuple[str, str, str]]]] = {}
+        if user_ids:
+            rows = db.query(
+                ViewLog.user_id, ViewLog.viewed_at, ViewLog.utm_source,
+                ViewLog.utm_medium, ViewLog.utm_campaign, ViewLog.referrer
+            ).filter(
+                and_(
+                    ViewLog.user_id.in_(user_ids),
+                    ViewLog.viewed_at >= start - timedelta(days=ATTRIBUTION_WINDOW_DAYS),
+                    ViewLog.viewed_at < end,
+                    (ViewLog.utm_source.isnot(None)) | (ViewLog.referrer.isnot(None))
+                )
+            ).order_by(ViewLog.viewed_at).all()
+
+            for row in rows:
+                dims = AttributionService.normalize_source(
+                    row.utm_source, row.utm_medium, row.utm_campaign, row.referrer
+                )
+                if dims[0] == DIRECT_SOURCE:
+                    continue
+                times, keys = touches.setdefault(row.user_id, ([], []))
+                times.append(row.viewed_at)
+                keys.append(dims)
+
+        for order in orders:
+            dims = (DIRECT_SOURCE, NO_MEDIUM, NO_CAMPAIGN)
+            user_touches = touches.get(order.user_id)
+            if user_touches and order.created_at:
+                created_at = order.created_at.replace(tzinfo=None)
+                idx = bisect.bisect_right(user_touches[0], created_at) - 1
+                if idx >= 0:
+                    dims = user_touches[1][idx]
+
+            bucket = totals.setdefault(dims, {"orders": 0, "revenue": Decimal("0")})
+            bucket["orders"] += 1
+            if order.status in REVENUE_STATUSES:
+                bucket["revenue"] += Decimal(order.total_amount or 0)
+
+        return totals
+
+    @staticmethod
+    def rollup_day(db: Session, day: date) -> int:
+        """重新計算單日的歸因彙總（只掃描當日的瀏覽與訂單）"""
+        start, end = AttributionService._day_bounds(day)
+
+        buckets: Dict[Tuple[str, str, str], Dict] = {}
+        rows = db.query(
+            ViewLog.utm_source, ViewLog.utm_medium, ViewLog.utm_campaign,
+            ViewLog.referrer, ViewLog.session_id, ViewLog.user_id
+        ).filter(
+            and_(ViewLog.viewed_at >= start, ViewLog.viewed_at < end)
+        ).yield_per(1000)
+
+        for row in rows:
+            dims = AttributionService.normalize_source(
+                row.utm_source, row.utm_medium, row.utm_campaign, row.referrer
+            )
+            bucket = buckets.setdefault(dims, {"views": 0, "sessions": set()})
+            bucket["views"] += 1
+            visitor = row.session_id or (f"user:{row.user_id}" if row.user_id else None)
+            if visitor:
+                bucket["sessions"].add(visitor)
+
+        conversions = AttributionService._attribute_orders(db, day)
+
+        db.query(AttributionDailyStats).filter(
+            AttributionDailyStats.stat_date == day
+        ).delete(synchronize_session=False)
+
+        # 沒有任何瀏覽與訂單的日期寫入一筆零值，讓 max(stat_date) 代表已處理到的日期
+        if not buckets and not conversions:
+            buckets[(DIRECT_SOURCE, NO_MEDIUM, NO_CAMPAIGN)] = {"views": 0, "sessions": set()}
+
+        for dims in set(buckets) | set(conversions):
+            views = buckets.get(dims, {})
+            converted = conversions.get(dims, {})
+            db.add(AttributionDailyStats(
+                stat_date=day,
+                source=dims[0],
+                medium=dims[1],
+                campaign=dims[2],
+                views=views.get("views", 0),
+                unique_sessions=len(views.get("sessions", ())),
+                orders=converted.get("orders", 0),
+                revenue=converted.get("revenue", Decimal("0")),
+            ))
+
+        try:
+            db.commit()
+        except IntegrityError:
+            # 其他程序同時彙總同一天，以對方的結果為準
+            db.rollback()
+            app_logger.warning(f"歸因彙總 {day} 與其他程序同時寫入，略過")
+            return 0
+        return len(set(buckets) | set(conversions))
+
+    @staticmethod
+    def refresh(db: Session, force: bool = False) -> List[date]:
+        """
+        增量更新歸因彙總
+
+        從最後一個已彙總的日期（可能是未完成的當日）開始補算到今天；
+        今日資料依 refresh_interval 節流重算。首次建立時會回補最多 MAX_BACKFILL_DAYS 天，
+        請求路徑應使用 refresh_detached，大量回補請使用 CLI。
+        """
+        with _refresh_lock:
+            return AttributionService._refresh(db, force)
+
+    @staticmethod
+    def recompute_day(db: Session, day: date) -> int:
+        """重新計算指定日期（與增量彙總互斥）"""
+        with _refresh_lock:
+            return AttributionService.rollup_day(db, day)
+
+    @staticmethod
+    def refresh_detached() -> None:
+        """
+        以獨立的資料庫連線增量更新（供回應送出後的背景任務使用）
+
+        已有其他彙總在執行時直接略過；失敗只記錄警告，不影響報表請求。
+        """
+        if not _refresh_lock.acquire(blocking=False):
+            return
+        db = SessionLocal()
+        try:
+            AttributionService._refresh(db, force=False)
+        except Exception as e:
+            db.rollback()
+            app_logger.warning(f"背景更新歸因彙總失敗: {e}")
+        finally:
+            db.close()
+            _refresh_lock.release()
+
+    @staticmethod
+    def _refresh(db: Session, force: bool) -> List[date]:
+        now = datetime.utcnow()
+        today = now.date()
+
+        last_date = db.query(func.max(AttributionDailyStats.stat_date)).scalar()
+        if last_date is None:
+            first_view = db.query(func.min(ViewLog.viewed_at)).scalar()
+            first_order = db.query(func.min(Order.created_at)).scalar()
+            candidates = [d.date() for d in (first_view, first_order) if d]
+            if not candidates:
+                return []
+            start_day = max(min(candidates), today - timedelta(days=MAX_BACKFILL_DAYS))
+        else:
+            start_day = last_date
+            if (
+                start_day >= today
+                and not force
+                and AttributionService._last_refresh
+                and now - AttributionService._last_refresh < AttributionService.refresh_interval
+            ):
+                return []
+
+        processed = []
+        day = start_day
+        while day <= today:
+            AttributionService.rollup_day(db, day)
+            processed.append(day)
+            day += timedelta(days=1)
+
+        AttributionService._last_refresh = now
+        return processed
+
+    @staticmethod
+    def get_summary(
+        db: Session,
+        days: int = 30,
+        group_by: Optional[List[str]] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """依來源/媒介/活動彙總指定天數內的歸因數據"""
+        group_by = [field for field in (group_by or ["source", "medium"]) if field in GROUP_BY_FIELDS] or ["source"]
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        columns = [getattr(AttributionDailyStats, field) for field in group_by]
+
+        rows = db.query(
+            *columns,
+            func.sum(AttributionDailyStats.views).label('views'),
+            func.sum(AttributionDailyStats.unique_sessions).label('unique_sessions'),
+            func.sum(AttributionDailyStats.orders).label('orders'),
+            func.sum(AttributionDailyStats.revenue).label('revenue')
+        ).filter(
+            AttributionDailyStats.stat_date >= since
+        ).group_by(*columns).having(
+            # 略過只有零值標記的分組
+            or_(func.sum(AttributionDailyStats.views) > 0, func.sum(AttributionDailyStats.orders) > 0)
+        ).order_by(desc('views')).limit(limit).all()
+
+        results = []
+        for row in rows:
+            item = {field: getattr(row, field) for field in group_by}
+            sessions = int(row.unique_sessions or 0)
+            orders = int(row.orders or 0)
+            item.update({
+                'views': int(row.views or 0),
+                # 跨日加總的會話數為近似值（同一會話跨日會重複計算）
+                'unique_sessions': sessions,
+                'orders': orders,
+                'revenue': float(row.revenue or 0),
+                'conversion_rate': round(orders / sessions * 100, 2) if sessions else 0.0
+            })
+            results.append(item)
+
+        return results
+
+    @staticmethod
+    def get_daily(
+        db: Session,
+        days: int = 30,
+        source: Optional[str] = None,
+        medium: Optional[str] = None,
+        campaign: Optional[str] = None
+    ) -> List[Dict]:
+        """取得指定維度的每日歸因趨勢"""
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+
+        query = db.query(
+            AttributionDailyStats.stat_date,
+            func.sum(AttributionDailyStats.views).label('views'),
+            func.sum(AttributionDailyStats.unique_sessions).label('unique_sessions'),
+            func.sum(AttributionDailyStats.orders).label('orders'),
+            func.sum(AttributionDailyStats.revenue).label('revenue')
+        ).filter(AttributionDailyStats.stat_date >= since)
+
+        if source:
+            query = query.filter(AttributionDailyStats.source == source.lower())
+        if medium:
+            query = query.filter(AttributionDailyStats.medium == medium.lower())
+        if campaign:
+            query = query.filter(AttributionDailyStats.campaign == campaign.lower())
+
+        rows = query.group_by(AttributionDailyStats.stat_date).order_by(AttributionDailyStats.stat_date).all()
+
+        return [
+            {
+                'date': row.stat_date.isoformat(),
+                'views': int(row.views or 0),
+                'unique_sessions': int(row.unique_sessions or 0),
+                'orders': int(row.orders or 0),
+                'revenue': float(row.revenue or 0)
+            }
+            for row in rows
+        ]
+
+
+if __name__ == "__main__":
+    import sys
+    from app.database import init_db
+
+    # 首次建立或長時間未更新時，以 CLI 回補歸因彙總：python -m app.services.attribution_service [--force]
+    init_db()
+    db = SessionLocal()
+    try:
+        days = AttributionService.refresh(db, force="--force" in sys.argv[1:])
+        print(f"已彙總 {len(days)} 天的歸因數據")
+    finally:
+        db.close()
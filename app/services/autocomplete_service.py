@@ -0,0 +1,259 @@
+"""
+搜尋自動完成服務
+
+以排序陣列 + bisect 建立程序內的前綴索引，涵蓋商品名稱、SKU 與文章標題，
+依瀏覽次數加權排序。查詢時不存取資料庫；索引過期後於回應送出後在背景由資料庫重建，
+並在商品 / 文章異動時增量更新。
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.post import Post
+from app.models.product import Product
+from app.utils.cache import LRUCache
+from app.utils.logger import app_logger
+
+EntryKey = Tuple[str, int]
+
+_WORD_BOUNDARY = re.compile(r"[\s\-_/|,.:;()\[\]（）【】「」、，。：；]+")
+
+CONTENT_URLS = {
+    "product": "/product/{slug}",
+    "post": "/blog/{slug}",
+}
+
+
+def normalize(value: Optional[str]) -> str:
+    """正規化為小寫並壓縮空白"""
+    if not value:
+        return ""
+    return " ".join(value.lower().split())
+
+
+class AutocompleteIndex:
+    """
+    前綴自動完成索引
+
+    - 每個項目產生數個索引鍵：完整名稱、SKU，以及最多 max_keys_per_entry 個單字起點的後綴
+    - 所有索引鍵存於排序陣列，以 bisect 找到前綴範圍後依權重取前幾名
+    - 單次查詢最多掃描 max_scan 個鍵，查詢結果另以 LRU 快取，異動時清空
+    """
+
+    def __init__(
+        self,
+        refresh_interval: int = 600,
+        max_keys_per_entry: int = 8,
+        max_scan: int = 5000,
+        max_label_length: int = 100
+    ):
+        self.refresh_interval = refresh_interval
+        self.max_keys_per_entry = max_keys_per_entry
+        self.max_scan = max_scan
+        self.max_label_length = max_label_length
+
+        self._keys: List[Tuple[str, str, int]] = []
+        self._entries: Dict[EntryKey, dict] = {}
+        self._results = LRUCache(maxsize=2048)
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+
+    def _index_keys(self, label: str, extra: Tuple[Optional[str], ...] = ()) -> List[str]:
+        # 完整名稱與 SKU 一定保留，只有單字起點的後綴受 max_keys_per_entry 限制
+        normalized = normalize(label)[:self.max_label_length]
+        keys = [normalized] + [normalize(value) for value in extra if value]
+        suffixes = []
+        for match in _WORD_BOUNDARY.finditer(normalized):
+            suffix = normalized[match.end():]
+            if suffix:
+                suffixes.append(suffix)
+        keys.extend(suffixes[:self.max_keys_per_entry])
+        return list(dict.fromkeys(key for key in keys if key))
+
+    def _entry(self, content_type: str, content_id: int, label: str, slug: Optional[str],
+               weight: int, extra: Tuple[Optional[str], ...] = ()) -> dict:
+        return {
+            "type": content_type,
+            "id": content_id,
+            "label": label,
+            "slug": slug,
+            "url": CONTENT_URLS[content_type].format(slug=slug) if slug else None,
+            "weight": weight or 0,
+            "keys": self._index_keys(label, extra),
+        }
+
+    def _add(self, content_type: str, content_id: int, label: str, slug: Optional[str],
+             weight: int, extra: Tuple[Optional[str], ...] = ()) -> None:
+        entry = self._entry(content_type, content_id, label, slug, weight, extra)
+        self._entries[(content_type, content_id)] = entry
+        for key in entry["keys"]:
+            insort(self._keys, (key, content_type, content_id))
+
+    def _remove(self, content_type: str, content_id: int) -> None:
+        entry = self._entries.pop((content_type, content_id), None)
+        if entry is None:
+            return
+        for key in entry["keys"]:
+            position = bisect_left(self._keys, (key, content_type, content_id))
+            if position < len(self._keys) and self._keys[position] == (key, content_type, content_id):
+                del self._keys[position]
+
+    def rebuild(self, db: Session) -> int:
+        """
+        由資料庫重建整個索引（僅上架商品與已發布文章）
+
+        新索引在鎖外建立完成後才替換，重建期間查詢繼續使用舊索引。
+        """
+        products = db.query(
+            Product.id, Product.name, Product.sku, Product.slug, Product.view_count
+        ).filter(Product.is_active == True).all()
+        posts = db.query(
+            Post.id, Post.title, Post.slug, Post.view_count
+        ).filter(Post.is_published == True).all()
+
+        entries: Dict[EntryKey, dict] = {}
+        for row in products:
+            entries[("product", row.id)] = self._entry("product", row.id, row.name, row.slug, row.view_count, (row.sku,))
+        for row in posts:
+            entries[("post", row.id)] = self._entry("post", row.id, row.title, row.slug, row.view_count)
+        keys = sorted(
+            (key, content_type, content_id)
+            for (content_type, content_id), entry in entries.items()
+            for key in entry["keys"]
+        )
+
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self._results.clear()
+            self._loaded_at = time.monotonic()
+
+        app_logger.info(f"自動完成索引已重建：{len(entries)} 個項目、{len(keys)} 個索引鍵")
+        return len(entries)
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_interval
+
+    def is_stale(self) -> bool:
+        """是否超過重建間隔或已標記過期"""
+        return not self._is_fresh()
+
+    def ensure_loaded(self, db: Session) -> None:
+        """
+        尚未建立索引時同步建立（第一次查詢）
+
+        已有索引但過期時不在此重建，由呼叫端以 rebuild_detached 在背景重建，
+        重建完成前繼續使用舊索引。
+        """
+        if self._entries or self._is_fresh():
+            return
+        with self._rebuild_lock:
+            if not self._entries and not self._is_fresh():
+                self.rebuild(db)
+
+    def rebuild_detached(self) -> None:
+        """
+        以獨立的資料庫連線重建（供回應送出後的背景任務使用，同步最新的瀏覽次數權重）
+
+        已有其他重建在執行或索引仍有效時直接略過；失敗只記錄警告，繼續使用舊索引。
+        """
+        if not self._rebuild_lock.acquire(blocking=False):
+            return
+        db = SessionLocal()
+        try:
+            if not self._is_fresh():
+                self.rebuild(db)
+        except Exception as e:
+            app_logger.warning(f"背景重建自動完成索引失敗: {e}")
+        finally:
+            db.close()
+            self._rebuild_lock.release()
+
+    def mark_stale(self) -> None:
+        """標記索引過期，下次使用時重建（批次匯入等大量異動後使用）"""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._loaded_at = None
+                self._results.clear()
+
+    def upsert_product(self, product: Product) -> None:
+        """商品新增 / 更新後同步；下架商品會被移除"""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            self._remove("product", product.id)
+            if product.is_active:
+                self._add("product", product.id, product.name, product.slug,
+                          product.view_count, (product.sku,))
+            self._results.clear()
+
+    def upsert_post(self, post: Post) -> None:
+        """文章新增 / 更新後同步；未發布文章會被移除"""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            self._remove("post", post.id)
+            if post.is_published:
+                self._add("post", post.id, post.title, post.slug, post.view_count)
+            self._results.clear()
+
+    def remove(self, content_type: str, content_id: int) -> None:
+        """刪除項目"""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            self._remove(content_type, content_id)
+            self._results.clear()
+
+    def suggest(self, prefix: str, limit: int = 8, content_type: Optional[str] = None) -> List[dict]:
+        """
+        取得前綴建議
+
+        Args:
+            prefix: 使用者輸入的前綴
+            limit: 最多回傳筆數
+            content_type: 限定 product 或 post
+
+        Returns:
+            依瀏覽次數排序的建議清單
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        cache_key = (prefix, limit, content_type)
+        cached = self._results.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            best: Dict[EntryKey, int] = {}
+            position = bisect_left(self._keys, (prefix,))
+            end = min(len(self._keys), position + self.max_scan)
+            while position < end:
+                key, item_type, item_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if content_type and item_type != content_type:
+                    continue
+                best[(item_type, item_id)] = self._entries[(item_type, item_id)]["weight"]
+
+            ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            results = [
+                {field: value for field, value in self._entries[entry_key].items() if field != "keys"}
+                for entry_key, _ in ranked
+            ]
+
+        self._results.set(cache_key, results)
+        return results
+
+
+# 創建全局實例
+autocomplete_index = AutocompleteIndex()
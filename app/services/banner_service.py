@@ -120,6 +120,19 @@ class BannerService:
         
         return query.offset(skip).limit(limit).all()
     
+    def active_banners_query(self, position: BannerPosition):
+        """指定版位目前啟用且在有效期間內的廣告查詢（未排序，可用於計算 ETag）"""
+        current_time = datetime.now(timezone.utc)
+        
+        return self.db.query(Banner).filter(
+            and_(
+                Banner.position == position,
+                Banner.is_active == True,
+                Banner.start_date <= current_time,
+                Banner.end_date >= current_time
+            )
+        )
+    
     def get_active_banners_by_position(self, position: BannerPosition) -> List[Banner]:
         """
         取得指定版位的所有啟用廣告
@@ -130,16 +143,9 @@ class BannerService:
         Returns:
             List[Banner]: 啟用的廣告列表
         """
-        current_time = datetime.now(timezone.utc)
-        
-        return self.db.query(Banner).filter(
-            and_(
-                Banner.position == position,
-                Banner.is_active == True,
-                Banner.start_date <= current_time,
-                Banner.end_date >= current_time
-            )
-        ).order_by(desc(Banner.sort_order), desc(Banner.created_at)).all()
+        return self.active_banners_query(position).order_by(
+            desc(Banner.sort_order), desc(Banner.created_at)
+        ).all()
     
     def update_banner(self, banner_id: int, banner_data: BannerUpdate) -> Optional[Banner]:
         """
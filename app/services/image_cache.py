@@ -0,0 +1,182 @@
+"""
+圖片轉換快取
+
+/img/{w}x{h}/{fit}/{path} 第一次請求時在圖片執行緒池中由原圖產生縮圖並寫入磁碟，
+之後直接以檔案回應。快取目錄以總大小限制，超過時依最近使用時間（LRU）淘汰；
+最近使用時間記錄在檔案的 mtime，重新啟動後仍能延續淘汰順序。
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from app.config import settings
+from app.services.image_service import image_service
+
+FITS = ("cover", "contain")
+# 可作為原圖來源的靜態子目錄（上傳圖片與廣告圖片）
+SOURCE_DIRS = ("uploads", "images")
+SOURCE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+OUTPUT_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+MEDIA_TYPES = {"webp": "image/webp", "jpg": "image/jpeg", "png": "image/png"}
+
+
+def parse_sizes(value: str) -> FrozenSet[Tuple[int, int]]:
+    """解析逗號分隔的尺寸白名單，例如 640x640,1280x0"""
+    sizes = set()
+    for part in value.split(","):
+        width, _, height = part.strip().partition("x")
+        if width.isdigit() and height.isdigit() and int(width) > 0:
+            sizes.add((int(width), int(height)))
+    return frozenset(sizes)
+
+
+class ImageTransformCache:
+    """以大小限制的磁碟 LRU 快取保存轉換後的圖片"""
+
+    def __init__(self, source_root: str, cache_dir: str, max_bytes: int,
+                 sizes: FrozenSet[Tuple[int, int]]):
+        self.source_root = Path(source_root).resolve()
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.sizes = sizes
+        # 快取鍵 -> (檔案路徑, 大小)，順序即最近使用順序
+        self._index: "OrderedDict[str, Tuple[Path, int]]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def is_allowed(self, width: int, height: int, fit: str) -> bool:
+        return (width, height) in self.sizes and fit in FITS
+
+    def resolve_source(self, path: str) -> Optional[Path]:
+        """將請求路徑對應到靜態目錄下的原圖，不在允許範圍或不存在時回傳 None"""
+        relative = path.lstrip("/")
+        if relative.startswith("static/"):
+            relative = relative[len("static/"):]
+        if relative.split("/", 1)[0] not in SOURCE_DIRS:
+            return None
+        source = (self.source_root / relative).resolve()
+        if not source.is_relative_to(self.source_root) or source.suffix.lower() not in SOURCE_EXTENSIONS:
+            return None
+        return source if source.is_file() else None
+
+    def cache_key(self, source: Path, width: int, height: int, fit: str, webp: bool) -> str:
+        """快取鍵包含原圖的修改時間與大小，原圖被替換後自然產生新的快取"""
+        stat = source.stat()
+        raw = f"{source}|{stat.st_mtime_ns}|{stat.st_size}|{width}x{height}|{fit}|{'webp' if webp else 'auto'}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def ensure_loaded(self) -> None:
+        """
+        掃描既有的快取檔案，依 mtime 重建 LRU 順序（每個程序只執行一次）
+
+        會走訪整個快取目錄，請在執行緒池中呼叫，不要在事件迴圈上執行。
+        """
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            entries = []
+            if self.cache_dir.is_dir():
+                for path in self.cache_dir.rglob("*"):
+                    if path.is_file() and not path.name.endswith(".tmp"):
+                        stat = path.stat()
+                        entries.append((stat.st_mtime, path.stem, path, stat.st_size))
+            entries.sort()
+            self._index = OrderedDict((key, (path, size)) for _, key, path, size in entries)
+            self._total = sum(size for _, _, _, size in entries)
+            self._loaded = True
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """取得快取檔案並標記為最近使用"""
+        self.ensure_loaded()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            path, size = entry
+            try:
+                os.utime(path)
+            except OSError:
+                # 可能已被其他 worker 淘汰
+                del self._index[key]
+                self._total -= size
+                return None
+            self._index.move_to_end(key)
+            return path
+
+    def store(self, key: str, data: bytes, fmt: str) -> Path:
+        """寫入快取檔案並淘汰最久未使用的檔案，直到總大小不超過上限"""
+        extension = OUTPUT_EXTENSIONS[fmt]
+        path = self.cache_dir / key[:2] / f"{key}.{extension}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self._total -= previous[1]
+            self._index[key] = (path, len(data))
+            self._total += len(data)
+            while self._total > self.max_bytes and len(self._index) > 1:
+                _, (old_path, old_size) = self._index.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old_path)
+
+        for old_path in evicted:
+            try:
+                old_path.unlink()
+            except OSError:
+                pass
+        return path
+
+    def _render(self, key: str, source: Path, width: int, height: int, fit: str, webp: bool) -> Path:
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+        data, fmt = image_service.transform(str(source), width, height, fit, webp)
+        return self.store(key, data, fmt)
+
+    async def get(self, key: str, source: Path, width: int, height: int, fit: str, webp: bool) -> Tuple[Path, str]:
+        """
+        取得轉換後的圖片，快取未命中時在圖片執行緒池中產生
+
+        同一個快取鍵同時有多個請求時只產生一次。
+
+        Returns:
+            (快取檔案路徑, Content-Type)
+        """
+        if not self._loaded:
+            # 第一次使用時在圖片執行緒池中建立索引，避免掃描磁碟阻塞事件迴圈
+            await asyncio.get_running_loop().run_in_executor(image_service.executor, self.ensure_loaded)
+        path = self.lookup(key)
+        if path is None:
+            future = self._pending.get(key)
+            if future is None:
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(
+                    image_service.executor, self._render, key, source, width, height, fit, webp
+                )
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._pending.pop(key, None))
+            path = await future
+
+        return path, MEDIA_TYPES[path.suffix.lstrip(".")]
+
+
+# 創建全局實例
+image_cache = ImageTransformCache(
+    source_root="app/static",
+    cache_dir=settings.image_cache_dir,
+    max_bytes=settings.image_cache_max_bytes,
+    sizes=parse_sizes(settings.image_transform_sizes),
+)
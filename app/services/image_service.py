@@ -0,0 +1,250 @@
+"""
+圖片處理服務
+
+上傳的圖片在專用的執行緒池中處理（Pillow 的縮放與編碼會釋放 GIL，不會阻塞事件迴圈，
+也不佔用 Starlette 給同步路由使用的執行緒池）：
+
+- 以上傳時串流計算的 SHA-256 命名，相同內容重複上傳時直接回傳既有的結果
+- 依 EXIF 方向轉正後重新編碼，去除 EXIF / XMP 等中繼資料
+- 依設定的寬度產生 WebP 與 JPEG（含透明度時為 PNG）響應式版本，回傳 srcset 資訊
+"""
+import asyncio
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.config import settings
+from app.utils.logger import app_logger
+from app.utils.uploads import StreamedUpload
+
+# 支援的來源格式與原圖儲存的副檔名
+SOURCE_FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+HASH_LENGTH = 32
+METADATA_SUFFIX = ".json"
+
+
+class ImageProcessingError(ValueError):
+    """無法辨識或處理的圖片"""
+
+
+def parse_widths(value: str) -> List[int]:
+    """解析逗號分隔的寬度設定"""
+    widths = {int(part) for part in value.split(",") if part.strip().isdigit() and int(part) > 0}
+    return sorted(widths)
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # 先寫入暫存檔再改名，同時處理相同內容的請求不會讀到寫到一半的檔案
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _encode(img: Image.Image, fmt: str, quality: int, icc_profile: Optional[bytes]) -> bytes:
+    """重新編碼（只保留色彩描述檔，不寫入 EXIF 等中繼資料）"""
+    options = {}
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    if fmt == "JPEG":
+        options.update(quality=quality, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        options.update(quality=quality, method=4)
+    elif fmt == "PNG":
+        options.update(optimize=True)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+class ImageService:
+    """響應式圖片處理"""
+
+    def __init__(self, widths: List[int], max_workers: int = 2,
+                 webp_quality: int = 80, jpeg_quality: int = 82):
+        self.widths = widths
+        self.max_workers = max_workers
+        self.webp_quality = webp_quality
+        self.jpeg_quality = jpeg_quality
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="image-worker"
+                    )
+        return self._executor
+
+    async def process_upload(self, upload: StreamedUpload, directory: str, url_prefix: str) -> Dict:
+        """
+        在圖片執行緒池中處理上傳的圖片
+
+        Args:
+            upload: 已串流寫入暫存檔的上傳檔案（含 SHA-256）
+            directory: 儲存目錄，例如 app/static/uploads
+            url_prefix: 對應的網址前綴，例如 /static/uploads
+
+        Returns:
+            圖片資訊（url、width、height、variants、srcset 等），重複上傳時 duplicate 為 True
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.process, upload.path, upload.sha256, directory, url_prefix
+        )
+
+    def process(self, source_path: str, sha256: str, directory: str, url_prefix: str) -> Dict:
+        """處理圖片（同步版本，供執行緒池與命令列使用）"""
+        digest = sha256[:HASH_LENGTH]
+        url_prefix = url_prefix.rstrip("/")
+        metadata_path = os.path.join(directory, f"{digest}{METADATA_SUFFIX}")
+
+        existing = self._load_metadata(metadata_path)
+        if existing is not None:
+            return {**existing, "duplicate": True}
+
+        try:
+            with Image.open(source_path) as source:
+                fmt = source.format
+                if fmt not in SOURCE_FORMATS:
+                    raise ImageProcessingError(f"不支援的圖片格式: {fmt}")
+                animated = getattr(source, "is_animated", False)
+                icc_profile = source.info.get("icc_profile")
+                width, height = source.size
+                img = ImageOps.exif_transpose(source) if not animated else None
+                if img is not None:
+                    img.load()
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            raise ImageProcessingError("無法辨識的圖片檔案") from e
+
+        os.makedirs(directory, exist_ok=True)
+        extension = SOURCE_FORMATS[fmt]
+        original_name = f"{digest}.{extension}"
+
+        if animated:
+            # 動畫圖片重新編碼會失去影格，原檔直接移動到正式路徑且不產生響應式版本
+            os.replace(source_path, os.path.join(directory, original_name))
+            variants = []
+        else:
+            width, height = img.size
+            _write_atomic(
+                os.path.join(directory, original_name),
+                _encode(img, fmt, self.jpeg_quality if fmt == "JPEG" else self.webp_quality, icc_profile),
+            )
+            variants = self._write_variants(img, digest, directory, url_prefix, icc_profile)
+
+        result = {
+            "hash": digest,
+            "filename": original_name,
+            "url": f"{url_prefix}/{original_name}",
+            "width": width,
+            "height": height,
+            "variants": variants,
+            "srcset": ", ".join(f"{v['webp']} {v['width']}w" for v in variants),
+            "fallback_srcset": ", ".join(f"{v['fallback']} {v['width']}w" for v in variants),
+        }
+        _write_atomic(metadata_path, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        return {**result, "duplicate": False}
+
+    def _target_widths(self, width: int) -> List[int]:
+        # 不放大：小於原圖的設定寬度，原圖比最大設定寬度小時再加上原圖寬度
+        targets = [w for w in self.widths if w < width]
+        if not self.widths or width <= self.widths[-1]:
+            targets.append(width)
+        return targets
+
+    def _write_variants(self, img: Image.Image, digest: str, directory: str,
+                        url_prefix: str, icc_profile: Optional[bytes]) -> List[Dict]:
+        alpha = _has_alpha(img)
+        img = img.convert("RGBA" if alpha else "RGB")
+        fallback_format, fallback_ext = ("PNG", "png") if alpha else ("JPEG", "jpg")
+
+        variants = []
+        for target in self._target_widths(img.width):
+            target_height = max(1, round(img.height * target / img.width))
+            resized = img if target == img.width else img.resize((target, target_height), Image.Resampling.LANCZOS)
+
+            webp_name = f"{digest}-{target}w.webp"
+            fallback_name = f"{digest}-{target}w.{fallback_ext}"
+            _write_atomic(os.path.join(directory, webp_name),
+                          _encode(resized, "WEBP", self.webp_quality, icc_profile))
+            _write_atomic(os.path.join(directory, fallback_name),
+                          _encode(resized, fallback_format, self.jpeg_quality, icc_profile))
+            variants.append({
+                "width": target,
+                "height": target_height,
+                "webp": f"{url_prefix}/{webp_name}",
+                "fallback": f"{url_prefix}/{fallback_name}",
+            })
+        return variants
+
+    def transform(self, source_path: str, width: int, height: int, fit: str, webp: bool) -> Tuple[bytes, str]:
+        """
+        縮放圖片（供 /img 轉換端點使用）
+
+        Args:
+            width, height: 目標尺寸，height 為 0 時依比例計算
+            fit: cover（裁切填滿）或 contain（完整縮放在範圍內）
+            webp: 輸出 WebP，否則輸出 JPEG（含透明度時為 PNG）
+
+        不會放大原圖；動畫圖片只取第一個影格。
+
+        Returns:
+            (編碼後的內容, 輸出格式)
+        """
+        try:
+            with Image.open(source_path) as source:
+                icc_profile = source.info.get("icc_profile")
+                img = ImageOps.exif_transpose(source)
+                img.load()
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            raise ImageProcessingError("無法辨識的圖片檔案") from e
+
+        alpha = _has_alpha(img)
+        fmt = "WEBP" if webp else ("PNG" if alpha else "JPEG")
+        img = img.convert("RGBA" if alpha else "RGB")
+
+        if fit == "cover" and height:
+            # 原圖比目標小時等比例縮小裁切範圍，維持目標的長寬比
+            scale = min(1.0, img.width / width, img.height / height)
+            box = (max(1, round(width * scale)), max(1, round(height * scale)))
+            img = ImageOps.fit(img, box, Image.Resampling.LANCZOS)
+        else:
+            img.thumbnail((width, height or img.height), Image.Resampling.LANCZOS)
+
+        quality = self.webp_quality if fmt == "WEBP" else self.jpeg_quality
+        return _encode(img, fmt, quality, icc_profile), fmt
+
+    @staticmethod
+    def _load_metadata(path: str) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"圖片資訊讀取失敗，重新處理 {path}: {e}")
+            return None
+
+
+# 創建全局實例
+image_service = ImageService(
+    widths=parse_widths(settings.image_widths),
+    max_workers=settings.image_workers,
+    webp_quality=settings.image_webp_quality,
+    jpeg_quality=settings.image_jpeg_quality,
+)
@@ -1,10 +1,88 @@
 """
 Markdown 處理服務
+
+每個執行緒重複使用同一個 Markdown 實例（以 reset() 清除狀態），
+一次解析同時產生 HTML、目錄與摘要；HTML 的樣式調整在樹處理器中完成。
 """
+import hashlib
 import markdown
 import re
-from typing import Optional
-from markdown.extensions import codehilite, tables, toc, fenced_code
+import threading
+from typing import Dict, List, Optional, Tuple
+from xml.etree import ElementTree as etree
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+
+# 渲染輸出有變動（擴展、後處理規則）時遞增，讓已儲存的文章重新渲染
+RENDERER_VERSION = 3
+
+# 行內元素之間不補空白，其餘（區塊）元素之間以空白分隔
+INLINE_TAGS = {'a', 'abbr', 'b', 'code', 'del', 'em', 'i', 'img', 'ins', 'mark', 'span', 'strong', 'sub', 'sup'}
+
+# Markdown 暫存區佔位符（原始 HTML、程式碼塊等）
+STASH_PLACEHOLDER_RE = re.compile(r'\x02[^\x03]*\x03')
+
+
+class ResponsiveHtmlTreeprocessor(Treeprocessor):
+    """
+    調整輸出 HTML 並擷取純文字
+
+    - 圖片加上響應式 CSS 類
+    - 表格加上樣式類並以 div.table-responsive 包裝
+    - 外部連結加上 target 與 rel 屬性
+    - 擷取純文字供摘要使用（略過目錄永久連結與程式碼塊）
+    """
+
+    def run(self, root: etree.Element) -> None:
+        for parent in list(root.iter()):
+            for index, child in enumerate(list(parent)):
+                if child.tag == 'img':
+                    self._add_class(child, 'img-responsive')
+                elif child.tag == 'a':
+                    href = child.get('href', '')
+                    if href.startswith(('http://', 'https://')):
+                        child.set('target', '_blank')
+                        child.set('rel', 'noopener noreferrer')
+                elif child.tag == 'table':
+                    self._add_class(child, 'table table-bordered')
+                    wrapper = etree.Element('div', {'class': 'table-responsive'})
+                    wrapper.tail, child.tail = child.tail, None
+                    wrapper.append(child)
+                    parent[index] = wrapper
+
+        parts: List[str] = []
+        self._collect_text(root, parts)
+        text = STASH_PLACEHOLDER_RE.sub(' ', ''.join(parts))
+        self.md.plain_text = re.sub(r'\s+', ' ', text).strip()
+
+    @staticmethod
+    def _add_class(element: etree.Element, css_class: str) -> None:
+        existing = element.get('class')
+        element.set('class', f"{existing} {css_class}" if existing else css_class)
+
+    def _collect_text(self, element: etree.Element, parts: List[str]) -> None:
+        if element.get('class') != 'headerlink':
+            if element.text:
+                parts.append(element.text)
+            for child in element:
+                self._collect_text(child, parts)
+        if element.tag not in INLINE_TAGS:
+            parts.append(' ')
+        if element.tail:
+            parts.append(element.tail)
+
+
+class ResponsiveHtmlExtension(Extension):
+    """註冊 ResponsiveHtmlTreeprocessor（在所有內建樹處理器之後執行）"""
+
+    def extendMarkdown(self, md: markdown.Markdown) -> None:
+        self.md = md
+        md.registerExtension(self)
+        md.treeprocessors.register(ResponsiveHtmlTreeprocessor(md), 'responsive_html', -1)
+
+    def reset(self) -> None:
+        self.md.plain_text = ''
 
 
 class MarkdownService:
@@ -35,6 +113,34 @@ class MarkdownService:
                 'toc_depth': 6,
             }
         }
+        
+        self._local = threading.local()
+    
+    def _get_markdown(self) -> markdown.Markdown:
+        """取得目前執行緒的 Markdown 實例並重設狀態"""
+        md = getattr(self._local, 'md', None)
+        if md is None:
+            md = markdown.Markdown(
+                extensions=self.extensions + [ResponsiveHtmlExtension()],
+                extension_configs=self.extension_configs
+            )
+            self._local.md = md
+        md.reset()
+        return md
+    
+    def _discard_markdown(self) -> None:
+        # 轉換失敗後實例狀態不可靠，下次重新建立
+        self._local.md = None
+    
+    def _convert(self, content: str) -> Tuple[str, markdown.Markdown]:
+        """解析內容，回傳 HTML 與保留本次結果（toc、plain_text）的 Markdown 實例"""
+        md = self._get_markdown()
+        try:
+            html = md.convert(content)
+        except Exception:
+            self._discard_markdown()
+            raise
+        return html, md
     
     def render(self, content: str) -> str:
         """
@@ -50,16 +156,7 @@ class MarkdownService:
             return ""
         
         try:
-            md = markdown.Markdown(
-                extensions=self.extensions,
-                extension_configs=self.extension_configs
-            )
-            
-            html = md.convert(content)
-            
-            # 後處理 HTML
-            html = self._post_process_html(html)
-            
+            html, _ = self._convert(content)
             return html
             
         except Exception as e:
@@ -67,43 +164,53 @@ class MarkdownService:
             print(f"Markdown 處理錯誤: {e}")
             return content.replace('\n', '<br>')
     
-    def _post_process_html(self, html: str) -> str:
+    def content_hash(self, content: Optional[str]) -> str:
+        """
+        計算內容雜湊（包含渲染器版本）
+        
+        Args:
+            content: Markdown 內容
+            
+        Returns:
+            SHA-256 十六進位字串
+        """
+        payload = f"{RENDERER_VERSION}:{content or ''}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def render_artifacts(self, content: str) -> Dict[str, Optional[str]]:
         """
-        後處理 HTML 內容
+        產生文章需要儲存的所有渲染結果
         
         Args:
-            html: 原始 HTML
+            content: Markdown 內容
             
         Returns:
-            處理後的 HTML
+            包含 content_html、toc、excerpt、content_hash 的字典
         """
-        # 為圖片添加響應式 CSS 類
-        html = re.sub(
-            r'<img([^>]*)>',
-            r'<img\1 class="img-responsive">',
-            html
-        )
-        
-        # 為表格添加響應式包裝
-        html = re.sub(
-            r'<table([^>]*)>',
-            r'<div class="table-responsive"><table\1 class="table table-bordered">',
-            html
-        )
-        html = re.sub(
-            r'</table>',
-            r'</table></div>',
-            html
-        )
-        
-        # 為連結添加目標屬性（外部連結）
-        html = re.sub(
-            r'<a href="(https?://[^"]*)"([^>]*)>',
-            r'<a href="\1"\2 target="_blank" rel="noopener noreferrer">',
-            html
-        )
-        
-        return html
+        if not content:
+            return {
+                "content_html": "",
+                "toc": None,
+                "excerpt": "",
+                "content_hash": self.content_hash(content),
+            }
+        
+        try:
+            html, md = self._convert(content)
+            return {
+                "content_html": html,
+                "toc": md.toc or None,
+                "excerpt": self._truncate(md.plain_text, 200),
+                "content_hash": self.content_hash(content),
+            }
+        except Exception as e:
+            print(f"Markdown 處理錯誤: {e}")
+            return {
+                "content_html": content.replace('\n', '<br>'),
+                "toc": None,
+                "excerpt": self.extract_excerpt(content),
+                "content_hash": self.content_hash(content),
+            }
     
     def extract_excerpt(self, content: str, max_length: int = 200) -> str:
         """
@@ -126,16 +233,33 @@ class MarkdownService:
             # 清理空白字符
             text = re.sub(r'\s+', ' ', text).strip()
             
-            # 截取指定長度
-            if len(text) > max_length:
-                text = text[:max_length].rsplit(' ', 1)[0] + '...'
-            
-            return text
+            return self._truncate(text, max_length)
             
         except Exception as e:
             print(f"摘要提取錯誤: {e}")
             return content[:max_length] + '...' if len(content) > max_length else content
     
+    @staticmethod
+    def _truncate(text: str, max_length: int) -> str:
+        """截取指定長度，盡量在空白處斷開"""
+        if len(text) > max_length:
+            text = text[:max_length].rsplit(' ', 1)[0] + '...'
+        return text
+    
+    def to_plain_text(self, content: Optional[str]) -> str:
+        """
+        將 Markdown 內容轉為單行純文字（供搜尋索引使用）
+        
+        Args:
+            content: Markdown 內容
+            
+        Returns:
+            純文字內容
+        """
+        if not content:
+            return ""
+        return re.sub(r'\s+', ' ', self._strip_markdown(content)).strip()
+    
     def _strip_markdown(self, content: str) -> str:
         """
         移除 Markdown 語法，只保留純文字
@@ -148,10 +272,10 @@ class MarkdownService:
         """
         # 移除 Markdown 語法
         patterns = [
+            r'```[\s\S]*?```',            # 程式碼塊
             r'!\[.*?\]\(.*?\)',           # 圖片
             r'\[([^\]]+)\]\([^\)]+\)',    # 連結
             r'`([^`]+)`',                 # 行內程式碼
-            r'```[\s\S]*?```',            # 程式碼塊
             r'^#{1,6}\s*',                # 標題
             r'^\s*[-*+]\s+',              # 無序列表
             r'^\s*\d+\.\s+',              # 有序列表
@@ -167,7 +291,14 @@ class MarkdownService:
                 # 多行模式
                 text = re.sub(pattern, '', text, flags=re.MULTILINE)
             else:
-                text = re.sub(pattern, r'\1', text)
+                # 沒有群組的樣式（圖片、程式碼塊）直接移除
+                text = re.sub(pattern, r'\1' if re.compile(pattern).groups else '', text)
+        
+        # 表格：移除分隔列（|---|:--:|），儲存格間的直線改為空白
+        text = re.sub(r'^[ \t]*\|?[ \t]*:?-+:?[ \t]*(\|[ \t]*:?-+:?[ \t]*)+\|?[ \t]*$', '', text, flags=re.MULTILINE)
+        text = re.sub(r'^[ \t]*\||\|[ \t]*$', '', text, flags=re.MULTILINE)
+        text = re.sub(r'[ \t]*(?<!\\)\|[ \t]*', ' ', text)
+        text = text.replace('\\|', '|')
         
         return text
     
@@ -185,23 +316,8 @@ class MarkdownService:
             return None
         
         try:
-            md = markdown.Markdown(
-                extensions=['markdown.extensions.toc'],
-                extension_configs={
-                    'markdown.extensions.toc': {
-                        'permalink': True,
-                        'permalink_title': '永久連結',
-                        'baselevel': 2,
-                    }
-                }
-            )
-            
-            md.convert(content)
-            
-            if hasattr(md, 'toc') and md.toc:
-                return md.toc
-            
-            return None
+            _, md = self._convert(content)
+            return md.toc or None
             
         except Exception as e:
             print(f"目錄生成錯誤: {e}")
@@ -0,0 +1,75 @@
+"""
+文章渲染結果服務
+
+文章的 HTML、目錄與摘要在儲存時預先渲染並寫入 posts 資料表，
+讀取時直接使用；內容或渲染器版本變動時（content_hash 不一致）才重新渲染。
+"""
+from sqlalchemy.orm import Session
+
+from app.models.post import Post
+from app.services.markdown_service import markdown_service
+from app.utils.logger import app_logger
+
+
+class PostRenderService:
+    """文章渲染結果服務"""
+
+    @staticmethod
+    def is_stale(post: Post) -> bool:
+        """儲存的渲染結果是否需要更新"""
+        return post.content_hash != markdown_service.content_hash(post.content)
+
+    @staticmethod
+    def apply(post: Post, force: bool = False) -> bool:
+        """
+        更新文章的渲染結果（不會提交）
+
+        已有摘要時保留原摘要，只在摘要為空時填入自動產生的摘要。
+        回傳是否有重新渲染。
+        """
+        if not force and not PostRenderService.is_stale(post):
+            return False
+
+        artifacts = markdown_service.render_artifacts(post.content)
+        post.content_html = artifacts["content_html"]
+        post.toc = artifacts["toc"]
+        post.content_hash = artifacts["content_hash"]
+        if not post.excerpt:
+            post.excerpt = artifacts["excerpt"]
+        return True
+
+    @staticmethod
+    def rerender_all(db: Session, force: bool = False, batch_size: int = 100) -> int:
+        """
+        批次重新渲染所有過期的文章
+
+        依 ID 分批讀取與提交，避免一次載入全部文章。回傳重新渲染的篇數。
+        """
+        rendered = 0
+        last_id = 0
+        while True:
+            posts = db.query(Post).filter(Post.id > last_id).order_by(Post.id).limit(batch_size).all()
+            if not posts:
+                break
+            for post in posts:
+                if PostRenderService.apply(post, force=force):
+                    rendered += 1
+            db.commit()
+            last_id = posts[-1].id
+            db.expunge_all()
+
+        app_logger.info(f"文章渲染結果已更新：{rendered} 篇")
+        return rendered
+
+
+if __name__ == "__main__":
+    import sys
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        count = PostRenderService.rerender_all(db, force="--force" in sys.argv[1:])
+        print(f"已重新渲染 {count} 篇文章")
+    finally:
+        db.close()
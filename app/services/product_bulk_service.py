@@ -0,0 +1,126 @@
+"""
+商品批次操作
+
+調價、上下架、推薦與庫存調整以單一 UPDATE 陳述式在一個交易內完成，
+不逐筆載入 ORM 物件；支援 RETURNING 的資料庫（SQLite 3.35+、PostgreSQL）
+直接由 UPDATE 取得受影響的商品 ID。
+"""
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.schemas.product import ProductBulkUpdate
+from app.services.autocomplete_service import autocomplete_index
+from app.services.product_cache import product_cache
+from app.utils.count_cache import count_cache
+from app.utils.logger import app_logger
+
+
+def product_filters(search: Optional[str] = None, status: Optional[str] = None) -> List[Any]:
+    """後台商品列表與批次操作共用的篩選條件"""
+    conditions = []
+    if search:
+        conditions.append(or_(
+            Product.name.contains(search),
+            Product.description.contains(search),
+            Product.sku.contains(search)
+        ))
+    if status == "active":
+        conditions.append(Product.is_active == True)
+    elif status == "inactive":
+        conditions.append(Product.is_active == False)
+    elif status == "featured":
+        conditions.append(Product.is_featured == True)
+    return conditions
+
+
+def _percent_of_price(percent: Decimal):
+    return func.round(Product.price * (1 + percent / 100), 2)
+
+
+class ProductBulkService:
+    """商品批次操作服務"""
+
+    @staticmethod
+    def _values(operation: ProductBulkUpdate) -> Dict[str, Any]:
+        """將操作轉換為 UPDATE 的 SET 子句（右側欄位皆為更新前的值）"""
+        values: Dict[str, Any] = {}
+
+        if operation.price is not None:
+            values["price"] = operation.price
+        elif operation.price_percent is not None:
+            values["price"] = _percent_of_price(operation.price_percent)
+
+        if operation.sale_price is not None:
+            values["sale_price"] = operation.sale_price
+        elif operation.sale_percent is not None:
+            values["sale_price"] = _percent_of_price(-operation.sale_percent)
+        elif operation.clear_sale_price:
+            values["sale_price"] = None
+
+        if operation.is_active is not None:
+            values["is_active"] = operation.is_active
+        if operation.is_featured is not None:
+            values["is_featured"] = operation.is_featured
+
+        if operation.stock_quantity is not None:
+            values["stock_quantity"] = operation.stock_quantity
+        elif operation.stock_delta is not None:
+            stock = func.coalesce(Product.stock_quantity, 0) + operation.stock_delta
+            values["stock_quantity"] = case((stock < 0, 0), else_=stock)
+
+        values["updated_at"] = func.now()
+        return values
+
+    @staticmethod
+    def apply(db: Session, operation: ProductBulkUpdate) -> List[int]:
+        """
+        套用批次操作
+
+        Returns:
+            受影響的商品 ID（遞增排序）
+
+        Raises:
+            ValueError: 沒有選取條件且未指定 all_products
+        """
+        if operation.product_ids is not None:
+            conditions = [Product.id.in_(operation.product_ids)]
+        else:
+            conditions = product_filters(operation.search, operation.status)
+        # 沒有任何條件的 UPDATE 會套用到所有商品，只允許明確指定 all_products 時執行
+        if not conditions and not operation.all_products:
+            raise ValueError("未指定選取條件，請以 all_products 明確套用到所有商品")
+
+        statement = (
+            update(Product)
+            .where(*conditions)
+            .values(**ProductBulkService._values(operation))
+            .execution_options(synchronize_session=False)
+        )
+
+        try:
+            if db.get_bind().dialect.update_returning:
+                product_ids = list(db.execute(statement.returning(Product.id)).scalars())
+            else:
+                product_ids = [row.id for row in db.query(Product.id).filter(*conditions).with_for_update()]
+                if product_ids:
+                    db.execute(statement)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        product_ids.sort()
+        if product_ids:
+            # UPDATE 陳述式不經過 ORM 的 flush 事件，需手動讓快取失效
+            for product_id in product_ids:
+                product_cache.invalidate(product_id)
+            count_cache.invalidate(Product.__tablename__)
+            if operation.is_active is not None:
+                autocomplete_index.mark_stale()
+
+        app_logger.info(f"商品批次操作完成：{len(product_ids)} 筆")
+        return product_ids
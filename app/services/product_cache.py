@@ -0,0 +1,174 @@
+"""
+商品讀取快取
+
+以商品 ID / slug 快取序列化後的 ProductResponse，商品異動時由路由同步失效。
+庫存與瀏覽次數屬於高頻變動欄位，不從快取回傳，而是每次以主鍵查詢最新值覆蓋
+（一併讀取 updated_at，作為 ETag / Last-Modified 的依據）。
+SSR 商品頁另外使用快取的描述 HTML（page_data）。
+"""
+import json
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.schemas.product import ProductResponse
+from app.services.markdown_service import markdown_service
+from app.utils.cache import LRUCache, get_redis_client
+from app.utils.conditional import make_etag
+from app.utils.logger import app_logger
+
+# 每次回應前重新讀取的欄位
+LIVE_FIELDS = ("stock_quantity", "view_count", "updated_at")
+
+
+class ProductCache:
+    """
+    商品快取
+
+    - 啟用 Redis 時所有 worker 共用 Redis 快取，失效即時生效
+    - 未啟用時使用程序內 LRU，並以較短的 TTL 限制多 worker 之間的不一致時間
+    """
+
+    def __init__(self, maxsize: int = 1000, local_ttl: int = 60, redis_ttl: int = 3600):
+        self.redis_ttl = redis_ttl
+        self._by_id = LRUCache(maxsize=maxsize, ttl=local_ttl)
+        self._slug_to_id = LRUCache(maxsize=maxsize, ttl=local_ttl)
+        # 商品頁描述的 Markdown 渲染結果（內容雜湊 -> HTML），各程序各自保留
+        self._description_html = LRUCache(maxsize=maxsize)
+
+    @staticmethod
+    def _id_key(product_id: int) -> str:
+        return f"product_cache:id:{product_id}"
+
+    @staticmethod
+    def _slug_key(slug: str) -> str:
+        return f"product_cache:slug:{slug}"
+
+    def _get(self, product_id: int) -> Optional[Dict]:
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return self._by_id.get(product_id)
+        try:
+            raw = redis_client.get(self._id_key(product_id))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            app_logger.warning(f"讀取商品快取失敗: {e}")
+            return None
+
+    def _resolve_slug(self, slug: str) -> Optional[int]:
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return self._slug_to_id.get(slug)
+        try:
+            raw = redis_client.get(self._slug_key(slug))
+            return int(raw) if raw else None
+        except Exception as e:
+            app_logger.warning(f"讀取商品快取失敗: {e}")
+            return None
+
+    def store(self, product: Product) -> Dict:
+        """序列化商品並寫入快取，回傳序列化結果"""
+        data = ProductResponse.model_validate(product).model_dump(mode="json")
+
+        redis_client = get_redis_client()
+        if redis_client is None:
+            self._by_id.set(product.id, data)
+            if data.get("slug"):
+                self._slug_to_id.set(data["slug"], product.id)
+            return data
+
+        try:
+            pipe = redis_client.pipeline()
+            pipe.set(self._id_key(product.id), json.dumps(data), ex=self.redis_ttl)
+            if data.get("slug"):
+                pipe.set(self._slug_key(data["slug"]), product.id, ex=self.redis_ttl)
+            pipe.execute()
+        except Exception as e:
+            app_logger.warning(f"寫入商品快取失敗: {e}")
+        return data
+
+    def lookup(self, product_id: Optional[int] = None, slug: Optional[str] = None) -> Optional[Dict]:
+        """依 ID 或 slug 取得快取的序列化商品（不含最新庫存），未命中回傳 None"""
+        if product_id is None and slug is not None:
+            product_id = self._resolve_slug(slug)
+        if product_id is None:
+            return None
+
+        data = self._get(product_id)
+        if data is not None and slug is not None and data.get("slug") != slug:
+            return None
+        return data
+
+    def with_live_fields(self, db: Session, data: Dict) -> Optional[Dict]:
+        """以主鍵查詢覆蓋庫存、瀏覽次數與更新時間；商品已不存在時回傳 None"""
+        row = db.query(*[getattr(Product, field) for field in LIVE_FIELDS]).filter(
+            Product.id == data["id"]
+        ).first()
+        if row is None:
+            self.invalidate(data["id"])
+            return None
+        live = dict(zip(LIVE_FIELDS, row))
+        if live["updated_at"] is not None:
+            live["updated_at"] = live["updated_at"].isoformat()
+        return {**data, **live}
+
+    @staticmethod
+    def validators(data: Dict) -> Tuple[str, Optional[datetime]]:
+        """
+        由序列化商品產生 ETag 與最後修改時間（不需重新序列化）
+
+        瀏覽次數不影響更新時間，回應內容會隨瀏覽變動，因此使用弱 ETag。
+        """
+        modified = data.get("updated_at") or data.get("created_at")
+        etag = make_etag(f"{data['id']}:{modified}:{data['stock_quantity']}".encode(), weak=True)
+        return etag, datetime.fromisoformat(modified) if modified else None
+
+    def page_data(self, db: Session, slug: str) -> Optional[Dict]:
+        """
+        SSR 商品頁使用的資料：快取的序列化商品加上 description_html
+
+        描述的 HTML 以內容雜湊為鍵快取，商品更新後序列化結果失效、描述變動時雜湊也隨之改變。
+        庫存等高頻欄位與 API 相同，以主鍵查詢最新值。商品不存在時回傳 None。
+        """
+        data = self.lookup(slug=slug)
+        if data is None:
+            product = db.query(Product).filter(Product.slug == slug).first()
+            if not product:
+                return None
+            data = self.store(product)
+
+        data = self.with_live_fields(db, data)
+        if data is None:
+            return None
+
+        description = data.get("description") or ""
+        key = markdown_service.content_hash(description)
+        description_html = self._description_html.get(key)
+        if description_html is None:
+            description_html = markdown_service.render(description)
+            self._description_html.set(key, description_html)
+        return {**data, "description_html": description_html}
+
+    def invalidate(self, product_id: int) -> None:
+        """商品新增 / 更新 / 刪除後清除快取（含舊 slug 對應）"""
+        data = self._get(product_id)
+        slug = data.get("slug") if data else None
+
+        redis_client = get_redis_client()
+        if redis_client is None:
+            self._by_id.pop(product_id)
+            if slug:
+                self._slug_to_id.pop(slug)
+            return
+
+        try:
+            keys = [self._id_key(product_id)] + ([self._slug_key(slug)] if slug else [])
+            redis_client.delete(*keys)
+        except Exception as e:
+            app_logger.warning(f"清除商品快取失敗: {e}")
+
+
+# 創建全局實例
+product_cache = ProductCache()
@@ -0,0 +1,503 @@
+"""
+商品批次匯入 / 匯出（CSV 與 JSON Lines）
+
+匯入：
+- 逐列讀取檔案，每 batch_size 列驗證後以一個交易寫入；批次寫入失敗時改為逐列寫入，
+  只有與既有資料衝突的列失敗
+- 依 id（既有商品）、再依商品編號（SKU）判斷更新的商品，都找不到時新增；
+  匯出檔的 id 欄位讓沒有 SKU 的商品也能再匯入更新，不會重複建立
+- 開始前一次載入既有的 SKU 與 slug，重複檢查與 slug 衝突（附加 -2、-3…）都在記憶體中完成，
+  不必逐列查詢資料庫
+- 新增以 INSERT ... RETURNING、更新以依主鍵的批次 UPDATE 寫入，不建立 ORM 物件
+- 更新只覆寫檔案中有值的欄位；slug 只有在檔案指定時才變更，避免既有網址失效
+
+匯出：以 yield_per 逐批讀取並邊讀邊輸出，記憶體用量與商品數量無關。
+匯出的欄位可直接再匯入：id 用於找到原商品更新，view_count 與時間欄位在匯入時略過。
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from slugify import slugify
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.product import Product
+from app.schemas.product import ProductCreate, ProductUpdate
+from app.services.autocomplete_service import autocomplete_index
+from app.services.product_cache import product_cache
+from app.services.search_service import product_document, product_search
+from app.utils.count_cache import count_cache
+from app.utils.logger import app_logger
+
+FORMAT_PATTERN = "^(csv|jsonl)$"
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+# 可匯入的欄位（其他欄位略過）
+IMPORT_FIELDS = tuple(ProductCreate.model_fields)
+# 匯出欄位：可匯入欄位加上唯讀資訊
+EXPORT_FIELDS = ("id",) + IMPORT_FIELDS + ("view_count", "created_at", "updated_at")
+
+# 回應中最多列出的錯誤數（失敗總數仍完整計算）
+MAX_ERRORS = 100
+EXPORT_CHUNK_ROWS = 1000
+
+Row = Tuple[int, Any]
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    """依副檔名判斷檔案格式"""
+    if not filename:
+        return None
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    return None
+
+
+def read_csv(stream: IO[str]) -> Iterator[Row]:
+    """逐列讀取 CSV（第一列為欄位名稱），回傳（行號, 資料）"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # 多出的欄位會放在 None 鍵下，直接略過
+        row.pop(None, None)
+        yield reader.line_num, row
+
+
+def read_jsonl(stream: IO[str]) -> Iterator[Row]:
+    """逐行讀取 JSON Lines，格式錯誤的行以 ValueError 代替資料"""
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError:
+            yield line_no, ValueError("JSON 格式錯誤")
+            continue
+        yield line_no, value if isinstance(value, dict) else ValueError("每行必須是 JSON 物件")
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def _parse_id(value: Any) -> Optional[int]:
+    """讀取列中的商品 ID，空值回傳 None，格式錯誤時拋出 ValueError"""
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def _clean(row: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留可匯入的欄位，空字串視為未提供"""
+    cleaned = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            continue
+        cleaned[field] = value
+    return cleaned
+
+
+def _error_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or '資料'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def _export_value(field: str, value: Any, fmt: str) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if field == "gallery_images" and fmt == "jsonl" and value:
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+class ImportResult:
+    """匯入結果統計"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def fail(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "message": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+class ProductImportService:
+    """商品批次匯入 / 匯出"""
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+
+    # --- 匯入 ---
+
+    def import_file(self, db: Session, path: str, fmt: str) -> Dict[str, Any]:
+        """
+        匯入 CSV 或 JSON Lines 檔案
+
+        Args:
+            path: 檔案路徑（UTF-8，可帶 BOM）
+            fmt: csv 或 jsonl
+
+        Returns:
+            {created, updated, failed, errors: [{line, message}]}
+        """
+        with open(path, "r", encoding="utf-8-sig", newline="") as stream:
+            try:
+                return self.import_rows(db, READERS[fmt](stream))
+            except (csv.Error, UnicodeDecodeError) as e:
+                raise ValueError(f"檔案格式錯誤: {e}")
+
+    def import_rows(self, db: Session, rows: Iterable[Row]) -> Dict[str, Any]:
+        """逐批驗證並寫入（行號, 資料）序列"""
+        result = ImportResult()
+        state = _ImportState.load(db)
+
+        batch: List[Row] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._import_batch(db, batch, state, result)
+                batch = []
+        if batch:
+            self._import_batch(db, batch, state, result)
+
+        if result.created or result.updated:
+            # 批次寫入不經過 ORM 的 flush 事件，需手動讓列表總數與自動完成索引失效
+            count_cache.invalidate(Product.__tablename__)
+            autocomplete_index.mark_stale()
+        app_logger.info(
+            f"商品匯入完成：新增 {result.created}、更新 {result.updated}、失敗 {result.failed}"
+        )
+        return result.to_dict()
+
+    def _import_batch(self, db: Session, batch: List[Row], state: "_ImportState", result: ImportResult) -> None:
+        pending: List[_PendingRow] = []
+
+        for line, raw in batch:
+            if isinstance(raw, Exception):
+                result.fail(line, str(raw))
+                continue
+            data = _clean(raw)
+            sku = data.get("sku")
+            if sku is not None:
+                sku = data["sku"] = str(sku)
+                if sku in state.file_skus:
+                    result.fail(line, f"商品編號與第 {state.file_skus[sku]} 行重複")
+                    continue
+            try:
+                record_id = _parse_id(raw.get("id"))
+            except (TypeError, ValueError):
+                result.fail(line, "id: 必須為整數")
+                continue
+
+            # 既有商品的 id 優先，其次為 SKU；都找不到時新增（id 不沿用）
+            if record_id in state.product_ids:
+                product_id = record_id
+                owner = state.sku_ids.get(sku) if sku else None
+                if owner is not None and owner != product_id:
+                    result.fail(line, f"商品編號已屬於其他商品（ID {owner}）")
+                    continue
+            else:
+                product_id = state.sku_ids.get(sku) if sku else None
+            if product_id is not None and product_id in state.file_ids:
+                result.fail(line, f"與第 {state.file_ids[product_id]} 行為同一商品")
+                continue
+
+            try:
+                if product_id is None:
+                    values = ProductCreate.model_validate(data).model_dump()
+                else:
+                    values = ProductUpdate.model_validate(data).model_dump(exclude_unset=True)
+            except ValidationError as e:
+                result.fail(line, _error_message(e))
+                continue
+
+            row = _PendingRow(line, values, sku or None)
+            if product_id is None:
+                if not values.get("description"):
+                    result.fail(line, "description: 商品描述為必填")
+                    continue
+                row.slug = values["slug"] = state.allocate_slug(values.get("slug") or values["name"])
+            else:
+                values.pop("slug", None)
+                if "slug" in data:
+                    current = state.current_slug(product_id)
+                    slug = state.allocate_slug(data["slug"], product_id)
+                    if slug != current:
+                        row.slug = values["slug"] = slug
+                        row.previous_slug = current
+                values["id"] = product_id
+                values["updated_at"] = datetime.now(timezone.utc)
+                state.file_ids[product_id] = line
+
+            if sku:
+                state.file_skus[sku] = line
+            pending.append(row)
+
+        if not pending:
+            return
+
+        try:
+            created = self._write(db, pending)
+            written = pending
+        except SQLAlchemyError as e:
+            db.rollback()
+            # 批次中有列與既有資料衝突時改為逐列寫入，只讓出錯的列失敗
+            app_logger.warning(f"商品匯入批次寫入失敗，改為逐列寫入: {e}")
+            created, written = [], []
+            for row in pending:
+                try:
+                    created.extend(self._write(db, [row]))
+                    written.append(row)
+                except SQLAlchemyError as row_error:
+                    db.rollback()
+                    app_logger.error(f"商品匯入第 {row.line} 行寫入失敗: {row_error}")
+                    state.release(row)
+                    result.fail(row.line, "資料寫入失敗（可能與既有資料衝突）")
+
+        for product in created:
+            state.created(product.id, product.sku, product.slug)
+        for row in written:
+            if not row.is_create and row.sku:
+                state.updated_sku(row.values["id"], row.sku)
+
+        updated_ids = [row.values["id"] for row in written if not row.is_create]
+        result.created += len(created)
+        result.updated += len(updated_ids)
+        if created or updated_ids:
+            self._sync_indexes(db, [product.id for product in created], updated_ids)
+
+    @staticmethod
+    def _write(db: Session, rows: List["_PendingRow"]) -> List[Any]:
+        """以一個交易寫入多列，回傳新增商品的 (id, sku, slug)"""
+        creates = [row.values for row in rows if row.is_create]
+        updates = [row.values for row in rows if not row.is_create]
+        created = []
+        if creates:
+            created = db.execute(
+                insert(Product).returning(Product.id, Product.sku, Product.slug), creates
+            ).all()
+        if updates:
+            # 依主鍵的批次 UPDATE：各列欄位不同時 SQLAlchemy 會依欄位組合分組執行
+            db.execute(update(Product), updates)
+        db.commit()
+        return created
+
+    @staticmethod
+    def _sync_indexes(db: Session, created_ids: List[int], updated_ids: List[int]) -> None:
+        """同步商品快取與全文索引（每批次一次查詢、一次提交）"""
+        for product_id in updated_ids:
+            product_cache.invalidate(product_id)
+        rows = db.query(
+            Product.id, Product.name, Product.sku, Product.short_description,
+            Product.meta_keywords, Product.description
+        ).filter(Product.id.in_(created_ids + updated_ids)).all()
+        product_search.upsert_many(db, ((row.id, product_document(row)) for row in rows))
+
+    # --- 匯出 ---
+
+    def export_lines(self, fmt: str) -> Iterator[str]:
+        """
+        逐批輸出所有商品
+
+        使用獨立的資料庫連線，適合作為串流回應的內容來源（回應送出期間仍持續讀取）。
+        CSV 以 UTF-8 BOM 開頭，方便以 Excel 開啟。
+        """
+        db = SessionLocal()
+        try:
+            columns = [getattr(Product, field) for field in EXPORT_FIELDS]
+            rows = db.query(*columns).order_by(Product.id).yield_per(EXPORT_CHUNK_ROWS)
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer) if fmt == "csv" else None
+            if writer is not None:
+                buffer.write("\ufeff")
+                writer.writerow(EXPORT_FIELDS)
+
+            pending = 0
+            for row in rows:
+                values = [_export_value(field, value, fmt) for field, value in zip(EXPORT_FIELDS, row)]
+                if writer is not None:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False))
+                    buffer.write("\n")
+                pending += 1
+                if pending >= EXPORT_CHUNK_ROWS:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            db.close()
+
+    def export_file(self, path: str, fmt: str) -> None:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for chunk in self.export_lines(fmt):
+                f.write(chunk)
+
+
+class _ImportState:
+    """匯入期間在記憶體中維護的商品 ID、SKU 與 slug 對照"""
+
+    def __init__(self, products: Iterable[Tuple[int, Optional[str], Optional[str]]]):
+        self.product_ids = set()
+        self.product_skus: Dict[int, str] = {}
+        self.sku_ids: Dict[str, int] = {}
+        self.slug_ids: Dict[str, int] = {}
+        self.product_slugs: Dict[int, str] = {}
+        for product_id, sku, slug in products:
+            self.product_ids.add(product_id)
+            if sku is not None:
+                self.sku_ids[sku] = product_id
+                self.product_skus[product_id] = sku
+            if slug is not None:
+                self.slug_ids[slug] = product_id
+                self.product_slugs[product_id] = slug
+        # 本次檔案中出現過的 SKU / 更新的商品 ID -> 行號
+        self.file_skus: Dict[str, int] = {}
+        self.file_ids: Dict[int, int] = {}
+
+    @classmethod
+    def load(cls, db: Session) -> "_ImportState":
+        return cls(db.query(Product.id, Product.sku, Product.slug).all())
+
+    def current_slug(self, product_id: int) -> Optional[str]:
+        return self.product_slugs.get(product_id)
+
+    def allocate_slug(self, value: str, product_id: Optional[int] = None) -> str:
+        """
+        取得不與其他商品衝突的 slug 並保留
+
+        Args:
+            value: 指定的 slug 或商品名稱
+            product_id: 更新既有商品時傳入，商品原本的 slug 不視為衝突
+        """
+        base = slugify(value) or "product"
+        slug, suffix = base, 2
+        while slug in self.slug_ids and (product_id is None or self.slug_ids[slug] != product_id):
+            slug = f"{base}-{suffix}"
+            suffix += 1
+        if product_id is not None and slug != self.product_slugs.get(product_id):
+            self.slug_ids.pop(self.product_slugs.get(product_id), None)
+            self.product_slugs[product_id] = slug
+        self.slug_ids[slug] = product_id
+        return slug
+
+    def created(self, product_id: int, sku: Optional[str], slug: str) -> None:
+        """記錄新增商品的 ID，之後的批次可依 ID 或 SKU 更新"""
+        self.product_ids.add(product_id)
+        if sku:
+            self.sku_ids[sku] = product_id
+            self.product_skus[product_id] = sku
+        self.slug_ids[slug] = product_id
+        self.product_slugs[product_id] = slug
+
+    def updated_sku(self, product_id: int, sku: str) -> None:
+        """依 ID 更新的商品變更了 SKU 時，改用新的 SKU 對照"""
+        previous = self.product_skus.get(product_id)
+        if previous != sku:
+            self.sku_ids.pop(previous, None)
+            self.sku_ids[sku] = product_id
+            self.product_skus[product_id] = sku
+
+    def release(self, row: "_PendingRow") -> None:
+        """寫入失敗時釋放該列保留的 slug 與 SKU，更新列還原原本的 slug"""
+        if row.slug is not None:
+            self.slug_ids.pop(row.slug, None)
+            if row.previous_slug is not None:
+                product_id = row.values["id"]
+                self.slug_ids[row.previous_slug] = product_id
+                self.product_slugs[product_id] = row.previous_slug
+        if row.sku:
+            self.file_skus.pop(row.sku, None)
+        if not row.is_create:
+            self.file_ids.pop(row.values["id"], None)
+
+
+class _PendingRow:
+    """已驗證、等待寫入的一列"""
+
+    __slots__ = ("line", "values", "sku", "slug", "previous_slug")
+
+    def __init__(self, line: int, values: Dict[str, Any], sku: Optional[str]):
+        self.line = line
+        self.values = values
+        self.sku = sku
+        # 本列新保留的 slug；更新列變更 slug 時另記原本的 slug
+        self.slug: Optional[str] = None
+        self.previous_slug: Optional[str] = None
+
+    @property
+    def is_create(self) -> bool:
+        return "id" not in self.values
+
+
+# 創建全局實例
+product_import_service = ProductImportService(batch_size=settings.product_import_batch_size)
+
+
+if __name__ == "__main__":
+    import sys
+    from app.database import init_db
+
+    usage = "用法: python -m app.services.product_import_service import|export <檔案.csv|檔案.jsonl>"
+    if len(sys.argv) != 3 or sys.argv[1] not in ("import", "export"):
+        sys.exit(usage)
+    command, path = sys.argv[1], sys.argv[2]
+    fmt = detect_format(path)
+    if fmt is None:
+        sys.exit(usage)
+
+    init_db()
+    if command == "export":
+        product_import_service.export_file(path, fmt)
+        print(f"已匯出商品至 {path}")
+    else:
+        db = SessionLocal()
+        try:
+            summary = product_import_service.import_file(db, path, fmt)
+        finally:
+            db.close()
+        print(f"新增 {summary['created']} 筆、更新 {summary['updated']} 筆、失敗 {summary['failed']} 筆")
+        for error in summary["errors"]:
+            print(f"  第 {error['line']} 行: {error['message']}")
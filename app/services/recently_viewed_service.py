@@ -0,0 +1,175 @@
+"""
+會員最近瀏覽服務
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from app.models.recently_viewed import RecentlyViewed
+from app.utils.cache import LRUCache, get_redis_client
+from app.utils.logger import app_logger
+
+ItemKey = Tuple[str, int]
+
+
+class RecentlyViewedStore:
+    """
+    每位會員的固定長度最近瀏覽清單
+
+    - 同一內容重複瀏覽時移到最前面（去重）
+    - 每位會員最多保留 capacity 筆，超過時淘汰最舊的項目
+    - 讀取順序：Redis（若啟用）→ 程序內 LRU → recently_viewed 資料表
+    - 寫入時同步更新資料表，確保重啟或多 worker 時仍可取得
+    """
+
+    def __init__(self, capacity: int = 50, max_users: int = 10000):
+        self.capacity = capacity
+        self._local = LRUCache(maxsize=max_users)
+
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"recently_viewed:{user_id}"
+
+    @staticmethod
+    def _member(content_type: str, content_id: int) -> str:
+        return f"{content_type}:{content_id}"
+
+    @staticmethod
+    def _score(viewed_at: datetime) -> float:
+        # 資料表中的時間為不含時區的 UTC，需明確指定時區，否則 timestamp() 會當作本地時間
+        if viewed_at.tzinfo is None:
+            viewed_at = viewed_at.replace(tzinfo=timezone.utc)
+        return viewed_at.timestamp()
+
+    @staticmethod
+    def _from_score(score: float) -> datetime:
+        # 與資料表讀出的值一致：不含時區的 UTC
+        return datetime.fromtimestamp(score, timezone.utc).replace(tzinfo=None)
+
+    def _load_from_db(self, db: Session, user_id: int) -> "OrderedDict[ItemKey, datetime]":
+        rows = db.query(
+            RecentlyViewed.content_type, RecentlyViewed.content_id, RecentlyViewed.viewed_at
+        ).filter(
+            RecentlyViewed.user_id == user_id
+        ).order_by(desc(RecentlyViewed.viewed_at)).limit(self.capacity).all()
+
+        # 內部順序為舊 → 新，方便以 move_to_end 更新
+        buffer: "OrderedDict[ItemKey, datetime]" = OrderedDict()
+        for row in reversed(rows):
+            buffer[(row.content_type, row.content_id)] = row.viewed_at
+        return buffer
+
+    def _save_to_db(self, db: Session, user_id: int, content_type: str, content_id: int, viewed_at: datetime) -> None:
+        entry = db.query(RecentlyViewed).filter(
+            RecentlyViewed.user_id == user_id,
+            RecentlyViewed.content_type == content_type,
+            RecentlyViewed.content_id == content_id
+        ).first()
+
+        if entry:
+            entry.viewed_at = viewed_at
+            db.commit()
+            return
+
+        db.add(RecentlyViewed(
+            user_id=user_id,
+            content_type=content_type,
+            content_id=content_id,
+            viewed_at=viewed_at
+        ))
+        db.flush()
+
+        # 只在新增時修剪超出上限的舊項目
+        stale_ids = [
+            row.id for row in db.query(RecentlyViewed.id).filter(
+                RecentlyViewed.user_id == user_id
+            ).order_by(desc(RecentlyViewed.viewed_at)).offset(self.capacity).all()
+        ]
+        if stale_ids:
+            db.query(RecentlyViewed).filter(
+                RecentlyViewed.id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+        db.commit()
+
+    def record(self, db: Session, user_id: int, content_type: str, content_id: int,
+               viewed_at: Optional[datetime] = None) -> None:
+        """記錄一次瀏覽"""
+        viewed_at = viewed_at or datetime.utcnow()
+
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                key = self._redis_key(user_id)
+                pipe = redis_client.pipeline()
+                if not redis_client.exists(key):
+                    # Redis 重啟或剛啟用時先由資料表回填，避免清單只剩這一筆而遮蔽既有紀錄
+                    history = self._load_from_db(db, user_id)
+                    if history:
+                        pipe.zadd(key, {
+                            self._member(item_type, item_id): self._score(item_viewed_at)
+                            for (item_type, item_id), item_viewed_at in history.items()
+                        })
+                pipe.zadd(key, {self._member(content_type, content_id): self._score(viewed_at)})
+                pipe.zremrangebyrank(key, 0, -self.capacity - 1)
+                pipe.execute()
+            except Exception as e:
+                app_logger.warning(f"最近瀏覽寫入 Redis 失敗: {e}")
+
+        buffer = self._local.get(user_id)
+        if buffer is not None:
+            buffer[(content_type, content_id)] = viewed_at
+            buffer.move_to_end((content_type, content_id))
+            while len(buffer) > self.capacity:
+                buffer.popitem(last=False)
+
+        self._save_to_db(db, user_id, content_type, content_id, viewed_at)
+
+    def _read_redis(self, user_id: int) -> Optional[List[Tuple[str, int, datetime]]]:
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return None
+        try:
+            members = redis_client.zrevrange(self._redis_key(user_id), 0, self.capacity - 1, withscores=True)
+        except Exception as e:
+            app_logger.warning(f"最近瀏覽讀取 Redis 失敗: {e}")
+            return None
+        if not members:
+            return None
+
+        items = []
+        for member, score in members:
+            content_type, _, content_id = member.decode().partition(":")
+            items.append((content_type, int(content_id), self._from_score(score)))
+        return items
+
+    def get(self, db: Session, user_id: int, content_type: Optional[str] = None,
+            limit: int = 20) -> List[Dict]:
+        """取得最近瀏覽清單（新 → 舊）"""
+        items = self._read_redis(user_id)
+
+        if items is None:
+            buffer = self._local.get(user_id)
+            if buffer is None:
+                buffer = self._load_from_db(db, user_id)
+                self._local.set(user_id, buffer)
+            items = [(key[0], key[1], viewed_at) for key, viewed_at in reversed(buffer.items())]
+
+        results = []
+        for item_type, item_id, viewed_at in items:
+            if content_type and item_type != content_type:
+                continue
+            results.append({
+                'content_type': item_type,
+                'content_id': item_id,
+                'viewed_at': viewed_at
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+
+# 創建全局實例
+recently_viewed = RecentlyViewedStore()
@@ -0,0 +1,228 @@
+"""
+商品推薦服務（共同瀏覽 / 共同購買）
+"""
+import heapq
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.order import OrderItem
+from app.models.product import Product
+from app.models.recommendation import ProductRecommendation
+from app.models.view_log import ViewLog
+from app.utils.logger import app_logger
+
+SparseMatrix = Dict[int, Dict[int, float]]
+
+# 全量 / 部分重建互斥，避免同時刪除與寫入推薦表
+_rebuild_lock = threading.Lock()
+
+
+class RecommendationService:
+    """
+    商品對商品推薦服務
+
+    - 共同瀏覽：同一會話（或會員）在期間內瀏覽過的商品視為同一籃
+    - 共同購買：同一訂單的商品視為同一籃
+    - 以稀疏共現矩陣計算餘弦相似度，加權合併後保留每個商品前 top_n 名
+    - 結果寫入 product_recommendations，讀取時只做索引查詢
+    - 啟動時推薦表為空會在背景建立，之後依 recommendation_rebuild_hours 定時全量重建；
+      也可由管理員 API 或 CLI 手動重建
+    """
+
+    def __init__(
+        self,
+        top_n: int = 12,
+        coview_days: int = 90,
+        coview_weight: float = 1.0,
+        copurchase_weight: float = 2.0,
+        max_basket_size: int = 50
+    ):
+        self.top_n = top_n
+        self.coview_days = coview_days
+        self.coview_weight = coview_weight
+        self.copurchase_weight = copurchase_weight
+        # 限制單籃大小，避免爬蟲會話造成平方級的配對數
+        self.max_basket_size = max_basket_size
+
+    def _coview_baskets(self, db: Session) -> Iterator[Set[int]]:
+        since = datetime.utcnow() - timedelta(days=self.coview_days)
+        rows = db.query(
+            ViewLog.session_id, ViewLog.user_id, ViewLog.content_id
+        ).filter(
+            ViewLog.content_type == "product",
+            ViewLog.viewed_at >= since,
+            (ViewLog.session_id.isnot(None)) | (ViewLog.user_id.isnot(None))
+        ).order_by(ViewLog.session_id, ViewLog.user_id).yield_per(2000)
+
+        for _, group in groupby(rows, key=lambda row: (row.session_id, row.user_id)):
+            yield {row.content_id for row in group}
+
+    def _copurchase_baskets(self, db: Session) -> Iterator[Set[int]]:
+        rows = db.query(
+            OrderItem.order_id, OrderItem.product_id
+        ).order_by(OrderItem.order_id).yield_per(2000)
+
+        for _, group in groupby(rows, key=lambda row: row.order_id):
+            yield {row.product_id for row in group}
+
+    def _cosine_similarity(self, baskets: Iterable[Set[int]], restrict: Optional[Set[int]] = None) -> SparseMatrix:
+        """
+        由購物籃計算稀疏共現矩陣的餘弦相似度
+
+        restrict 有值時只保留列（product_id）屬於 restrict 的部分，用於增量更新。
+        """
+        item_counts: Dict[int, int] = defaultdict(int)
+        co_counts: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+        for basket in baskets:
+            if len(basket) < 2 or len(basket) > self.max_basket_size:
+                for item in basket:
+                    item_counts[item] += 1
+                continue
+
+            items = sorted(basket)
+            for item in items:
+                item_counts[item] += 1
+            for i, a in enumerate(items):
+                for b in items[i + 1:]:
+                    if restrict is None or a in restrict:
+                        co_counts[a][b] += 1
+                    if restrict is None or b in restrict:
+                        co_counts[b][a] += 1
+
+        similarity: SparseMatrix = {}
+        for a, row in co_counts.items():
+            norm_a = item_counts[a]
+            similarity[a] = {
+                b: count / math.sqrt(norm_a * item_counts[b])
+                for b, count in row.items()
+            }
+        return similarity
+
+    def rebuild(self, db: Session, product_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        重新計算推薦結果
+
+        未指定 product_ids 時全量重建；指定時只重算這些商品的相關商品。
+        回傳寫入的推薦筆數。
+        """
+        with _rebuild_lock:
+            return self._rebuild(db, product_ids)
+
+    def rebuild_detached(self, only_if_empty: bool = False) -> None:
+        """
+        以獨立的資料庫連線全量重建（供啟動與定時背景任務使用）
+
+        only_if_empty 時只在推薦表沒有資料時建立（部署後第一次啟動）；
+        已有其他重建在執行時直接略過；失敗只記錄警告。
+        """
+        if not _rebuild_lock.acquire(blocking=False):
+            return
+        db = SessionLocal()
+        try:
+            if only_if_empty and db.query(ProductRecommendation.id).first() is not None:
+                return
+            self._rebuild(db, None)
+        except Exception as e:
+            db.rollback()
+            app_logger.warning(f"背景重建商品推薦失敗: {e}")
+        finally:
+            db.close()
+            _rebuild_lock.release()
+
+    def _rebuild(self, db: Session, product_ids: Optional[Iterable[int]]) -> int:
+        restrict = set(product_ids) if product_ids is not None else None
+
+        coview = self._cosine_similarity(self._coview_baskets(db), restrict)
+        copurchase = self._cosine_similarity(self._copurchase_baskets(db), restrict)
+
+        active_ids = {row.id for row in db.query(Product.id).filter(Product.is_active == True).all()}
+        targets = restrict if restrict is not None else set(coview) | set(copurchase)
+
+        rows = []
+        for product_id in targets:
+            view_row = coview.get(product_id, {})
+            purchase_row = copurchase.get(product_id, {})
+            scores = {}
+            for related_id in set(view_row) | set(purchase_row):
+                if related_id == product_id or related_id not in active_ids:
+                    continue
+                scores[related_id] = (
+                    self.coview_weight * view_row.get(related_id, 0.0)
+                    + self.copurchase_weight * purchase_row.get(related_id, 0.0)
+                )
+
+            best = heapq.nlargest(self.top_n, scores.items(), key=lambda item: item[1])
+            for rank, (related_id, score) in enumerate(best, start=1):
+                if related_id in view_row and related_id in purchase_row:
+                    source = "hybrid"
+                elif related_id in purchase_row:
+                    source = "copurchase"
+                else:
+                    source = "coview"
+                rows.append({
+                    "product_id": product_id,
+                    "related_product_id": related_id,
+                    "score": round(score, 6),
+                    "rank": rank,
+                    "source": source,
+                })
+
+        query = db.query(ProductRecommendation)
+        if restrict is not None:
+            query = query.filter(ProductRecommendation.product_id.in_(restrict))
+        query.delete(synchronize_session=False)
+
+        if rows:
+            db.bulk_insert_mappings(ProductRecommendation, rows)
+        db.commit()
+
+        app_logger.info(f"商品推薦已更新：{len(targets)} 個商品、{len(rows)} 筆推薦")
+        return len(rows)
+
+    def get_related(self, db: Session, product_id: int, limit: int = 4) -> List[Product]:
+        """
+        取得相關商品
+
+        先依預先計算的推薦排序查詢，不足時以最新上架的商品補足。
+        """
+        related = db.query(Product).join(
+            ProductRecommendation, ProductRecommendation.related_product_id == Product.id
+        ).filter(
+            ProductRecommendation.product_id == product_id,
+            Product.is_active == True
+        ).order_by(ProductRecommendation.rank).limit(limit).all()
+
+        if len(related) < limit:
+            exclude_ids = [product_id] + [product.id for product in related]
+            related += db.query(Product).filter(
+                Product.id.notin_(exclude_ids),
+                Product.is_active == True
+            ).order_by(Product.created_at.desc()).limit(limit - len(related)).all()
+
+        return related
+
+
+# 創建全局實例
+recommendation_service = RecommendationService()
+
+
+if __name__ == "__main__":
+    import sys
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        ids = [int(arg) for arg in sys.argv[1:]] or None
+        count = recommendation_service.rebuild(db, ids)
+        print(f"已寫入 {count} 筆商品推薦")
+    finally:
+        db.close()
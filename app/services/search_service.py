@@ -0,0 +1,619 @@
+"""
+全文搜尋服務
+
+- 中文（CJK）以單字 + 雙字（bigram）切詞，英數字以單字切詞並轉小寫，
+  切好的詞以空白串接後交給資料庫，避免依賴資料庫端的中文斷詞器
+- SQLite 使用 FTS5 虛擬表並以 bm25() 排序
+- PostgreSQL 使用 tsvector + GIN 索引並以 ts_rank_cd() 排序
+- 其他資料庫或 FTS5 不可用時，退回程序內的 BM25 反向索引
+"""
+import html
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, bindparam, false, select, text
+from sqlalchemy.orm import Query, Session
+
+from app.models.post import Post
+from app.models.product import Product
+from app.services.markdown_service import markdown_service
+from app.utils.logger import app_logger
+
+Document = Dict[str, Optional[str]]
+Loader = Callable[[Session], Iterable[Tuple[int, Document]]]
+
+_CJK_CHARS = (
+    r"\u3400-\u4dbf"   # CJK 擴充 A
+    r"\u4e00-\u9fff"   # CJK 統一表意文字
+    r"\uf900-\ufaff"   # CJK 相容表意文字
+    r"\u3040-\u30ff"   # 日文假名
+    r"\uac00-\ud7af"   # 韓文音節
+)
+_TOKEN_PATTERN = re.compile(rf"[{_CJK_CHARS}]+|[a-z0-9]+")
+_CJK_PATTERN = re.compile(rf"[{_CJK_CHARS}]")
+
+
+def _split_runs(value: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(value.lower())
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """
+    建立索引用的切詞
+
+    中文連續字串同時產生單字與雙字，讓單字查詢與多字查詢都能命中。
+    """
+    if not value:
+        return []
+
+    tokens = []
+    for run in _split_runs(value):
+        if _CJK_PATTERN.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def tokenize_query(value: Optional[str]) -> List[str]:
+    """
+    查詢用的切詞
+
+    中文連續字串只取雙字（單一字時取單字），比單字更精確；重複的詞只保留一次。
+    """
+    if not value:
+        return []
+
+    tokens = []
+    for run in _split_runs(value):
+        if _CJK_PATTERN.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return list(dict.fromkeys(tokens))
+
+
+def _is_prefixable(token: str) -> bool:
+    return not _CJK_PATTERN.match(token)
+
+
+def highlight(value: Optional[str], query: str, width: int = 120, tag: str = "mark") -> str:
+    """
+    產生含高亮標記的摘要片段（已做 HTML 跳脫）
+
+    以第一個命中的位置為中心擷取 width 個字元，找不到時回傳開頭片段。
+    """
+    if not value:
+        return ""
+
+    patterns = set()
+    for run in _split_runs(query):
+        if _CJK_PATTERN.match(run):
+            patterns.add(re.escape(run))
+            patterns.update(re.escape(run[i:i + 2]) for i in range(len(run) - 1))
+        else:
+            patterns.add(re.escape(run) + "[a-z0-9]*")
+    if not patterns:
+        return html.escape(value[:width])
+
+    matcher = re.compile("|".join(sorted(patterns, key=len, reverse=True)), re.IGNORECASE)
+    first = matcher.search(value)
+    start = max(0, first.start() - width // 3) if first else 0
+    end = min(len(value), start + width)
+
+    fragment = value[start:end]
+    pieces = ["…"] if start > 0 else []
+    cursor = 0
+    for match in matcher.finditer(fragment):
+        pieces.append(html.escape(fragment[cursor:match.start()]))
+        pieces.append(f"<{tag}>{html.escape(match.group())}</{tag}>")
+        cursor = match.end()
+    pieces.append(html.escape(fragment[cursor:]))
+    if end < len(value):
+        pieces.append("…")
+    return "".join(pieces)
+
+
+class _SQLiteFTSBackend:
+    """SQLite FTS5 後端，rowid 即文件 ID"""
+
+    def __init__(self, index: "SearchIndex"):
+        self.index = index
+        self.table = f"{index.name}_fts"
+
+    def _columns(self) -> List[str]:
+        return list(self.index.fields) + [f"stored_{field}" for field in self.index.stored]
+
+    def create(self, db: Session) -> None:
+        columns = list(self.index.fields) + [f"stored_{field} UNINDEXED" for field in self.index.stored]
+        db.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5({', '.join(columns)})"))
+
+    def is_empty(self, db: Session) -> bool:
+        return db.execute(text(f"SELECT rowid FROM {self.table} LIMIT 1")).first() is None
+
+    def upsert(self, db: Session, doc_id: int, terms: Dict[str, str], stored: Document) -> None:
+        self.delete(db, doc_id)
+        columns = self._columns()
+        params = ", ".join(f":{column}" for column in columns)
+        values = {f"stored_{field}": value for field, value in stored.items()}
+        db.execute(
+            text(f"INSERT INTO {self.table} (rowid, {', '.join(columns)}) VALUES (:doc_id, {params})"),
+            {"doc_id": doc_id, **terms, **values}
+        )
+
+    def delete(self, db: Session, doc_id: int) -> None:
+        db.execute(text(f"DELETE FROM {self.table} WHERE rowid = :doc_id"), {"doc_id": doc_id})
+
+    def clear(self, db: Session) -> None:
+        db.execute(text(f"DELETE FROM {self.table}"))
+
+    def _match_query(self, tokens: List[str], prefix: bool) -> str:
+        phrases = [f'"{token}"' for token in tokens]
+        if prefix:
+            phrases[-1] += "*"
+        return " ".join(phrases)
+
+    def search(self, db: Session, tokens: List[str], prefix: bool, limit: int) -> List[int]:
+        weights = ", ".join(str(weight) for weight in self.index.fields.values())
+        rows = db.execute(
+            text(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH :query "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT :limit"
+            ),
+            {"query": self._match_query(tokens, prefix), "limit": limit}
+        )
+        return [row[0] for row in rows]
+
+    def matches(self, tokens: List[str], prefix: bool):
+        """全部命中文件的子查詢 (doc_id, rank)，rank 越小越相關"""
+        weights = ", ".join(str(weight) for weight in self.index.fields.values())
+        return text(
+            f"SELECT rowid AS doc_id, bm25({self.table}, {weights}) AS rank "
+            f"FROM {self.table} WHERE {self.table} MATCH :query"
+        ).bindparams(query=self._match_query(tokens, prefix)).columns(
+            doc_id=Integer, rank=Float
+        ).subquery(f"{self.index.name}_matches")
+
+    def get_stored(self, db: Session, doc_ids: List[int]) -> Dict[int, Document]:
+        columns = ", ".join(f"stored_{field}" for field in self.index.stored)
+        rows = db.execute(
+            text(f"SELECT rowid, {columns} FROM {self.table} WHERE rowid IN :doc_ids")
+            .bindparams(bindparam("doc_ids", expanding=True)),
+            {"doc_ids": doc_ids}
+        )
+        return {row[0]: dict(zip(self.index.stored, row[1:])) for row in rows}
+
+
+class _PostgresBackend:
+    """PostgreSQL tsvector 後端，依欄位權重對應到 A-D 四級"""
+
+    def __init__(self, index: "SearchIndex"):
+        self.index = index
+        self.table = f"{index.name}_search"
+        ranked = sorted(set(index.fields.values()), reverse=True)
+        self.labels = {
+            field: "ABCD"[min(ranked.index(weight), 3)]
+            for field, weight in index.fields.items()
+        }
+
+    def create(self, db: Session) -> None:
+        stored_columns = "".join(f", stored_{field} TEXT" for field in self.index.stored)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            f"(doc_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL{stored_columns})"
+        ))
+        db.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table}_document ON {self.table} USING GIN (document)"
+        ))
+
+    def is_empty(self, db: Session) -> bool:
+        return db.execute(text(f"SELECT doc_id FROM {self.table} LIMIT 1")).first() is None
+
+    def upsert(self, db: Session, doc_id: int, terms: Dict[str, str], stored: Document) -> None:
+        document = " || ".join(
+            f"setweight(to_tsvector('simple', :{field}), '{self.labels[field]}')"
+            for field in self.index.fields
+        )
+        stored_columns = [f"stored_{field}" for field in self.index.stored]
+        columns = ", ".join(["doc_id", "document"] + stored_columns)
+        params = ", ".join([":doc_id", document] + [f":{column}" for column in stored_columns])
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in ["document"] + stored_columns)
+        values = {f"stored_{field}": value for field, value in stored.items()}
+        db.execute(
+            text(
+                f"INSERT INTO {self.table} ({columns}) VALUES ({params}) "
+                f"ON CONFLICT (doc_id) DO UPDATE SET {updates}"
+            ),
+            {"doc_id": doc_id, **terms, **values}
+        )
+
+    def delete(self, db: Session, doc_id: int) -> None:
+        db.execute(text(f"DELETE FROM {self.table} WHERE doc_id = :doc_id"), {"doc_id": doc_id})
+
+    def clear(self, db: Session) -> None:
+        db.execute(text(f"DELETE FROM {self.table}"))
+
+    def _match_query(self, tokens: List[str], prefix: bool) -> str:
+        lexemes = [f"'{token}'" for token in tokens]
+        if prefix:
+            lexemes[-1] += ":*"
+        return " & ".join(lexemes)
+
+    def search(self, db: Session, tokens: List[str], prefix: bool, limit: int) -> List[int]:
+        rows = db.execute(
+            text(
+                f"SELECT doc_id FROM {self.table}, to_tsquery('simple', :query) AS query "
+                f"WHERE document @@ query ORDER BY ts_rank_cd(document, query) DESC LIMIT :limit"
+            ),
+            {"query": self._match_query(tokens, prefix), "limit": limit}
+        )
+        return [row[0] for row in rows]
+
+    def matches(self, tokens: List[str], prefix: bool):
+        """全部命中文件的子查詢 (doc_id, rank)，rank 越小越相關"""
+        return text(
+            f"SELECT doc_id, -ts_rank_cd(document, query) AS rank "
+            f"FROM {self.table}, to_tsquery('simple', :query) AS query WHERE document @@ query"
+        ).bindparams(query=self._match_query(tokens, prefix)).columns(
+            doc_id=Integer, rank=Float
+        ).subquery(f"{self.index.name}_matches")
+
+    def get_stored(self, db: Session, doc_ids: List[int]) -> Dict[int, Document]:
+        columns = ", ".join(f"stored_{field}" for field in self.index.stored)
+        rows = db.execute(
+            text(f"SELECT doc_id, {columns} FROM {self.table} WHERE doc_id IN :doc_ids")
+            .bindparams(bindparam("doc_ids", expanding=True)),
+            {"doc_ids": doc_ids}
+        )
+        return {row[0]: dict(zip(self.index.stored, row[1:])) for row in rows}
+
+
+class _MemoryBackend:
+    """程序內 BM25 反向索引（僅適用單一程序，重啟後由 loader 重建）"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, index: "SearchIndex"):
+        self.index = index
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        self._doc_lengths: Dict[int, float] = {}
+        self._stored: Dict[int, Document] = {}
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+
+    def create(self, db: Session) -> None:
+        pass
+
+    def is_empty(self, db: Session) -> bool:
+        return not self._doc_terms
+
+    def upsert(self, db: Session, doc_id: int, terms: Dict[str, str], stored: Document) -> None:
+        frequencies: Dict[str, float] = defaultdict(float)
+        for field, value in terms.items():
+            weight = self.index.fields[field]
+            for token in value.split():
+                frequencies[token] += weight
+
+        with self._lock:
+            self.delete(db, doc_id)
+            for token, frequency in frequencies.items():
+                self._postings[token][doc_id] = frequency
+            self._doc_terms[doc_id] = frequencies
+            self._doc_lengths[doc_id] = sum(frequencies.values())
+            self._total_length += self._doc_lengths[doc_id]
+            if stored:
+                self._stored[doc_id] = stored
+
+    def delete(self, db: Session, doc_id: int) -> None:
+        with self._lock:
+            self._stored.pop(doc_id, None)
+            frequencies = self._doc_terms.pop(doc_id, None)
+            if frequencies is None:
+                return
+            for token in frequencies:
+                postings = self._postings.get(token)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[token]
+            self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def clear(self, db: Session) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._stored.clear()
+            self._total_length = 0.0
+
+    def _postings_for(self, token: str, prefix: bool) -> Dict[int, float]:
+        if not prefix:
+            return self._postings.get(token, {})
+        merged: Dict[int, float] = defaultdict(float)
+        for term, postings in self._postings.items():
+            if term.startswith(token):
+                for doc_id, frequency in postings.items():
+                    merged[doc_id] += frequency
+        return merged
+
+    def search(self, db: Session, tokens: List[str], prefix: bool, limit: int) -> List[int]:
+        with self._lock:
+            doc_count = len(self._doc_terms)
+            if not doc_count:
+                return []
+            average_length = self._total_length / doc_count
+
+            postings_list = [
+                self._postings_for(token, prefix and i == len(tokens) - 1)
+                for i, token in enumerate(tokens)
+            ]
+            if not all(postings_list):
+                return []
+
+            # 由最短的 posting list 開始取交集
+            candidates = set(min(postings_list, key=len))
+            for postings in postings_list:
+                candidates.intersection_update(postings)
+
+            scores: Dict[int, float] = defaultdict(float)
+            for postings in postings_list:
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id in candidates:
+                    frequency = postings[doc_id]
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [doc_id for doc_id, _ in ranked[:limit]]
+
+    def matches(self, tokens: List[str], prefix: bool):
+        """程序內索引無法與資料表 JOIN，由 SearchIndex 改以 ID 清單篩選"""
+        return None
+
+    def get_stored(self, db: Session, doc_ids: List[int]) -> Dict[int, Document]:
+        with self._lock:
+            return {doc_id: self._stored[doc_id] for doc_id in doc_ids if doc_id in self._stored}
+
+
+class SearchIndex:
+    """
+    單一內容類型的全文索引
+
+    fields 為 欄位名稱 → BM25 權重；stored 為額外保存原文（不建索引）的欄位，
+    用於產生搜尋摘要而不必讀取原始資料列；loader 用於首次建立索引時載入全部文件。
+    索引會在第一次使用時建立並自動回填，之後由呼叫端在新增 / 更新 / 刪除後同步。
+    """
+
+    def __init__(self, name: str, fields: Dict[str, float], loader: Loader,
+                 stored: Tuple[str, ...] = (), max_results: int = 1000):
+        self.name = name
+        self.fields = fields
+        self.stored = stored
+        self.loader = loader
+        self.max_results = max_results
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def _select_backend(self, db: Session):
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            backend = _SQLiteFTSBackend(self)
+            try:
+                backend.create(db)
+                db.commit()
+                return backend
+            except Exception as e:
+                db.rollback()
+                app_logger.warning(f"SQLite FTS5 不可用，{self.name} 改用程序內索引: {e}")
+        elif dialect == "postgresql":
+            backend = _PostgresBackend(self)
+            backend.create(db)
+            db.commit()
+            return backend
+        return _MemoryBackend(self)
+
+    def _ensure_ready(self, db: Session):
+        if self._backend is not None:
+            return self._backend
+
+        with self._lock:
+            if self._backend is None:
+                backend = self._select_backend(db)
+                if backend.is_empty(db):
+                    self._populate(db, backend)
+                self._backend = backend
+        return self._backend
+
+    def _populate(self, db: Session, backend) -> int:
+        count = 0
+        for doc_id, document in self.loader(db):
+            backend.upsert(db, doc_id, self._terms(document), self._stored_values(document))
+            count += 1
+        db.commit()
+        app_logger.info(f"全文索引 {self.name} 已建立：{count} 筆")
+        return count
+
+    def _terms(self, document: Document) -> Dict[str, str]:
+        return {field: " ".join(tokenize(document.get(field))) for field in self.fields}
+
+    def _stored_values(self, document: Document) -> Document:
+        return {field: document.get(field) for field in self.stored}
+
+    def upsert(self, db: Session, doc_id: int, document: Document) -> None:
+        """新增或更新單一文件"""
+        try:
+            self._ensure_ready(db).upsert(db, doc_id, self._terms(document), self._stored_values(document))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            app_logger.error(f"更新全文索引 {self.name}#{doc_id} 失敗: {e}")
+
+    def upsert_many(self, db: Session, documents: Iterable[Tuple[int, Document]]) -> int:
+        """批次新增或更新文件，全部寫入後只提交一次"""
+        count = 0
+        try:
+            backend = self._ensure_ready(db)
+            for doc_id, document in documents:
+                backend.upsert(db, doc_id, self._terms(document), self._stored_values(document))
+                count += 1
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            app_logger.error(f"批次更新全文索引 {self.name} 失敗: {e}")
+        return count
+
+    def delete(self, db: Session, doc_id: int) -> None:
+        """刪除單一文件"""
+        try:
+            self._ensure_ready(db).delete(db, doc_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            app_logger.error(f"刪除全文索引 {self.name}#{doc_id} 失敗: {e}")
+
+    def rebuild(self, db: Session) -> int:
+        """清空並重建整個索引"""
+        backend = self._ensure_ready(db)
+        backend.clear(db)
+        return self._populate(db, backend)
+
+    def search(self, db: Session, query: str, limit: Optional[int] = None) -> List[int]:
+        """
+        搜尋並回傳依相關度排序的文件 ID
+
+        所有詞都必須命中；最後一個英數詞視為前綴，方便邊輸入邊搜尋。
+        最多回傳 max_results 筆，需再套用其他篩選條件時請改用 search_page / match_condition。
+        """
+        tokens = tokenize_query(query)
+        if not tokens:
+            return []
+        prefix = _is_prefixable(tokens[-1])
+        return self._ensure_ready(db).search(db, tokens, prefix, limit or self.max_results)
+
+    def _matches(self, db: Session, query: str):
+        """
+        取得全部命中文件
+
+        Returns:
+            (tokens, 子查詢)；資料庫後端的子查詢可直接與資料表 JOIN，
+            程序內索引則回傳未截斷、依相關度排序的 ID 清單
+        """
+        tokens = tokenize_query(query)
+        if not tokens:
+            return tokens, None
+        prefix = _is_prefixable(tokens[-1])
+        backend = self._ensure_ready(db)
+        matches = backend.matches(tokens, prefix)
+        if matches is None:
+            matches = backend.search(db, tokens, prefix, None)
+        return tokens, matches
+
+    def match_condition(self, db: Session, query: str, id_column):
+        """
+        全部命中文件的篩選條件（不受 max_results 限制）
+
+        適合搭配其他篩選條件與自訂排序使用，例如後台列表。
+        """
+        tokens, matches = self._matches(db, query)
+        if not tokens:
+            return false()
+        if isinstance(matches, list):
+            return id_column.in_(matches) if matches else false()
+        return id_column.in_(select(matches.c.doc_id))
+
+    def search_page(self, db: Session, query: str, base_query: Query, id_column,
+                    skip: int, limit: int) -> Tuple[List[int], int]:
+        """
+        在資料庫端套用 base_query 的篩選條件後，依相關度分頁
+
+        篩選與計數都作用在全部命中文件上，不會因 max_results 截斷而遺漏結果。
+
+        Returns:
+            (本頁文件 ID，依相關度排序, 符合篩選條件的總數)
+        """
+        tokens, matches = self._matches(db, query)
+        if not tokens:
+            return [], 0
+
+        if isinstance(matches, list):
+            # 程序內索引：分批以 IN 套用篩選條件，保留相關度順序
+            matched_ids = set()
+            for start in range(0, len(matches), 500):
+                chunk = matches[start:start + 500]
+                matched_ids.update(
+                    row[0] for row in base_query.with_entities(id_column).filter(id_column.in_(chunk))
+                )
+            ranked_ids = [doc_id for doc_id in matches if doc_id in matched_ids]
+            return ranked_ids[skip:skip + limit], len(ranked_ids)
+
+        filtered = base_query.with_entities(id_column).join(matches, matches.c.doc_id == id_column)
+        total = filtered.order_by(None).count()
+        if skip >= total:
+            return [], total
+        rows = filtered.order_by(matches.c.rank, id_column.desc()).offset(skip).limit(limit)
+        return [row[0] for row in rows], total
+
+    def get_stored(self, db: Session, doc_ids: List[int]) -> Dict[int, Document]:
+        """取得指定文件保存的原文欄位"""
+        if not self.stored or not doc_ids:
+            return {}
+        return self._ensure_ready(db).get_stored(db, doc_ids)
+
+
+def product_document(product: Product) -> Document:
+    """取得商品的索引欄位"""
+    return {
+        "name": product.name,
+        "sku": product.sku,
+        "short_description": product.short_description,
+        "meta_keywords": product.meta_keywords,
+        "description": product.description,
+    }
+
+
+def _load_products(db: Session) -> Iterable[Tuple[int, Document]]:
+    rows = db.query(
+        Product.id, Product.name, Product.sku, Product.short_description,
+        Product.meta_keywords, Product.description
+    ).yield_per(500)
+    for row in rows:
+        yield row.id, product_document(row)
+
+
+def post_document(post: Post) -> Document:
+    """取得文章的索引欄位（內文去除 Markdown 語法）"""
+    return {
+        "title": post.title,
+        "excerpt": post.excerpt,
+        "meta_keywords": post.meta_keywords,
+        "body": markdown_service.to_plain_text(post.content),
+    }
+
+
+def _load_posts(db: Session) -> Iterable[Tuple[int, Document]]:
+    rows = db.query(
+        Post.id, Post.title, Post.excerpt, Post.meta_keywords, Post.content
+    ).yield_per(200)
+    for row in rows:
+        yield row.id, post_document(row)
+
+
+# 創建全局實例
+product_search = SearchIndex(
+    "products",
+    fields={"name": 10.0, "sku": 5.0, "short_description": 3.0, "meta_keywords": 3.0, "description": 1.0},
+    loader=_load_products
+)
+
+post_search = SearchIndex(
+    "posts",
+    fields={"title": 10.0, "meta_keywords": 4.0, "excerpt": 3.0, "body": 1.0},
+    loader=_load_posts,
+    stored=("body",)
+)
@@ -95,11 +95,7 @@ class ShippingTierService:
         Returns:
             List[ShippingTier]: 運費級距列表
         """
-        query = self.db.query(ShippingTier)
-        
-        # 啟用狀態篩選
-        if is_active is not None:
-            query = query.filter(ShippingTier.is_active == is_active)
+        query = self.shipping_tiers_query(is_active)
         
         # 排序
         if sort_by_amount:
@@ -111,6 +107,13 @@ class ShippingTierService:
         
         return query.offset(skip).limit(limit).all()
     
+    def shipping_tiers_query(self, is_active: Optional[bool] = None):
+        """運費級距查詢（只含篩選條件，未排序、未分頁，可用於計算 ETag）"""
+        query = self.db.query(ShippingTier)
+        if is_active is not None:
+            query = query.filter(ShippingTier.is_active == is_active)
+        return query
+    
     def get_active_shipping_tiers(self) -> List[ShippingTier]:
         """
         取得所有啟用的運費級距
@@ -118,9 +121,9 @@ class ShippingTierService:
         Returns:
             List[ShippingTier]: 啟用的運費級距列表，按最低金額升序排列
         """
-        return self.db.query(ShippingTier).filter(
-            ShippingTier.is_active == True
-        ).order_by(asc(ShippingTier.min_amount), desc(ShippingTier.sort_order)).all()
+        return self.shipping_tiers_query(is_active=True).order_by(
+            asc(ShippingTier.min_amount), desc(ShippingTier.sort_order)
+        ).all()
     
     def update_shipping_tier(self, tier_id: int, tier_data: ShippingTierUpdate) -> Optional[ShippingTier]:
         """
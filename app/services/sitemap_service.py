@@ -0,0 +1,278 @@
+"""
+Sitemap 與文章訂閱（RSS / Atom）
+
+產生的 XML 快取在磁碟上，每個檔案附帶一個戳記（資料筆數與最後更新時間）：
+
+- sitemap.xml 為 sitemap index，商品與文章依 ID 每 50,000 筆分成一個分片，
+  單一分片不會超過 sitemap 協定的 50,000 個網址上限
+- 請求時以一次彙總查詢取得各分片的戳記，只有戳記改變的分片才重新產生
+- 產生時以 yield_per 逐批讀取資料並串流寫入暫存檔，記憶體用量與資料量無關
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, IO, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
+
+from app.config import settings
+from app.models.post import Post
+from app.models.product import Product
+from app.utils.cache import LRUCache
+from app.utils.conditional import http_date
+from app.utils.logger import app_logger
+
+# 產生格式變更時遞增，讓既有的快取檔案失效
+FORMAT_VERSION = 1
+SHARD_SIZE = 50000
+FEED_SIZE = 20
+
+# 公開的靜態頁面
+STATIC_PAGES = ["/", "/products", "/blog", "/about", "/contact", "/help", "/returns", "/privacy", "/terms"]
+
+# 區段名稱 -> (模型, 公開條件, 網址格式)
+SECTIONS = {
+    "products": (Product, lambda: Product.is_active == True, "/product/{slug}"),
+    "posts": (Post, lambda: Post.is_published == True, "/blog/{slug}"),
+}
+
+Stamp = Tuple[int, Optional[datetime]]
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _w3c(value: Optional[datetime]) -> str:
+    value = _utc(value) or datetime.now(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _modified(model):
+    # 舊資料的 updated_at 可能為空，以建立時間代替
+    return func.coalesce(model.updated_at, model.created_at)
+
+
+class SitemapService:
+    """Sitemap 與訂閱的磁碟快取"""
+
+    def __init__(self, cache_dir: str, stamp_ttl: int = 60):
+        self.cache_dir = Path(cache_dir)
+        # 彙總查詢的結果短暫保留，爬蟲密集請求時不必每次查詢
+        self._stamps = LRUCache(maxsize=16, ttl=stamp_ttl)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return settings.site_url.rstrip("/")
+
+    # --- 戳記 ---
+
+    def section_stamps(self, db: Session, section: str) -> Dict[int, Stamp]:
+        """各分片的（筆數, 最後更新時間）"""
+        cached = self._stamps.get(section)
+        if cached is not None:
+            return cached
+
+        model, condition, _ = SECTIONS[section]
+        shard = (model.id // SHARD_SIZE).label("shard")
+        rows = (
+            db.query(shard, func.count(model.id), func.max(_modified(model)))
+            .filter(condition())
+            .group_by(shard)
+            .all()
+        )
+        stamps = {int(row[0]): (row[1], _utc(row[2])) for row in rows}
+        self._stamps.set(section, stamps)
+        return stamps
+
+    @staticmethod
+    def etag(stamp: str) -> str:
+        return f'"{hashlib.sha256(stamp.encode("utf-8")).hexdigest()[:32]}"'
+
+    # --- 磁碟快取 ---
+
+    def _ensure(self, name: str, stamp: str, write: Callable[[IO[str]], None]) -> Path:
+        """戳記相同時直接使用既有檔案，否則重新產生"""
+        stamp = f"v{FORMAT_VERSION}|{self.base_url}|{stamp}"
+        path = self.cache_dir / name
+        stamp_path = self.cache_dir / f"{name}.stamp"
+
+        if self._read_stamp(stamp_path) == stamp and path.exists():
+            return path
+
+        with self._lock:
+            if self._read_stamp(stamp_path) == stamp and path.exists():
+                return path
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_dir / f"{name}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                write(f)
+            os.replace(tmp_path, path)
+            stamp_path.write_text(stamp, encoding="utf-8")
+            app_logger.info(f"已重新產生 {name}")
+        return path
+
+    @staticmethod
+    def _read_stamp(path: Path) -> Optional[str]:
+        try:
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    # --- Sitemap ---
+
+    def sitemap_index(self, db: Session) -> Tuple[Path, str]:
+        """
+        取得 sitemap index
+
+        Returns:
+            (檔案路徑, ETag)
+        """
+        entries: List[Tuple[str, Optional[datetime]]] = [("sitemap-pages.xml", None)]
+        for section in SECTIONS:
+            for shard, (_, lastmod) in sorted(self.section_stamps(db, section).items()):
+                entries.append((f"sitemap-{section}-{shard}.xml", lastmod))
+        stamp = ";".join(f"{name}@{_w3c(lastmod) if lastmod else ''}" for name, lastmod in entries)
+
+        def write(f):
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for name, lastmod in entries:
+                f.write(f"  <sitemap><loc>{escape(self.base_url)}/{name}</loc>")
+                if lastmod:
+                    f.write(f"<lastmod>{_w3c(lastmod)}</lastmod>")
+                f.write("</sitemap>\n")
+            f.write("</sitemapindex>\n")
+
+        return self._ensure("sitemap.xml", stamp, write), self.etag(stamp)
+
+    def pages_sitemap(self) -> Tuple[Path, str]:
+        stamp = ",".join(STATIC_PAGES)
+
+        def write(f):
+            self._write_urlset(f, ((path, None) for path in STATIC_PAGES))
+
+        return self._ensure("sitemap-pages.xml", stamp, write), self.etag(stamp)
+
+    def section_sitemap(self, db: Session, section: str, shard: int) -> Optional[Tuple[Path, str]]:
+        """取得商品或文章的 sitemap 分片，分片不存在時回傳 None"""
+        if section not in SECTIONS:
+            return None
+        shard_stamp = self.section_stamps(db, section).get(shard)
+        if shard_stamp is None:
+            return None
+        count, lastmod = shard_stamp
+        stamp = f"{count}@{_w3c(lastmod)}"
+        model, condition, url_format = SECTIONS[section]
+
+        def write(f):
+            rows = (
+                db.query(model.slug, _modified(model))
+                .filter(condition(), model.id >= shard * SHARD_SIZE, model.id < (shard + 1) * SHARD_SIZE)
+                .order_by(model.id)
+                .yield_per(1000)
+            )
+            self._write_urlset(f, ((url_format.format(slug=slug), modified) for slug, modified in rows))
+
+        return self._ensure(f"sitemap-{section}-{shard}.xml", stamp, write), self.etag(stamp)
+
+    def _write_urlset(self, f: IO[str], urls) -> None:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for path, modified in urls:
+            f.write(f"  <url><loc>{escape(self.base_url + path)}</loc>")
+            if modified is not None:
+                f.write(f"<lastmod>{_w3c(modified)}</lastmod>")
+            f.write("</url>\n")
+        f.write("</urlset>\n")
+
+    # --- 文章訂閱 ---
+
+    def feed(self, db: Session, kind: str) -> Tuple[Path, str]:
+        """
+        取得最新文章的訂閱
+
+        Args:
+            kind: rss 或 atom
+        """
+        stamps = self.section_stamps(db, "posts")
+        count = sum(c for c, _ in stamps.values())
+        lastmod = max((m for _, m in stamps.values() if m is not None), default=None)
+        stamp = f"{count}@{_w3c(lastmod) if lastmod else ''}|{settings.site_name}|{settings.site_description}"
+
+        def write(f):
+            posts = (
+                db.query(Post)
+                .options(load_only(Post.title, Post.slug, Post.excerpt, Post.created_at, Post.updated_at))
+                .filter(Post.is_published == True)
+                .order_by(Post.created_at.desc(), Post.id.desc())
+                .limit(FEED_SIZE)
+                .all()
+            )
+            if kind == "atom":
+                self._write_atom(f, posts, lastmod)
+            else:
+                self._write_rss(f, posts, lastmod)
+
+        name = "atom.xml" if kind == "atom" else "feed.xml"
+        return self._ensure(name, stamp, write), self.etag(stamp)
+
+    def _write_rss(self, f: IO[str], posts: List[Post], lastmod: Optional[datetime]) -> None:
+        base = escape(self.base_url)
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">\n<channel>\n')
+        f.write(f"  <title>{escape(settings.site_name)}</title>\n")
+        f.write(f"  <link>{base}/blog</link>\n")
+        f.write(f"  <description>{escape(settings.site_description)}</description>\n")
+        f.write(f'  <atom:link href="{base}/feed.xml" rel="self" type="application/rss+xml"/>\n')
+        if lastmod:
+            f.write(f"  <lastBuildDate>{http_date(lastmod)}</lastBuildDate>\n")
+        for post in posts:
+            link = f"{base}/blog/{escape(post.slug)}"
+            f.write("  <item>\n")
+            f.write(f"    <title>{escape(post.title)}</title>\n")
+            f.write(f"    <link>{link}</link>\n")
+            f.write(f'    <guid isPermaLink="true">{link}</guid>\n')
+            if post.created_at:
+                f.write(f"    <pubDate>{http_date(post.created_at)}</pubDate>\n")
+            if post.excerpt:
+                f.write(f"    <description>{escape(post.excerpt)}</description>\n")
+            f.write("  </item>\n")
+        f.write("</channel>\n</rss>\n")
+
+    def _write_atom(self, f: IO[str], posts: List[Post], lastmod: Optional[datetime]) -> None:
+        base = escape(self.base_url)
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<feed xmlns="http://www.w3.org/2005/Atom">\n')
+        f.write(f"  <title>{escape(settings.site_name)}</title>\n")
+        f.write(f"  <subtitle>{escape(settings.site_description)}</subtitle>\n")
+        f.write(f'  <link href="{base}/blog"/>\n')
+        f.write(f'  <link href="{base}/atom.xml" rel="self"/>\n')
+        f.write(f"  <id>{base}/</id>\n")
+        f.write(f"  <updated>{_w3c(lastmod)}</updated>\n")
+        for post in posts:
+            link = f"{base}/blog/{escape(post.slug)}"
+            f.write("  <entry>\n")
+            f.write(f"    <title>{escape(post.title)}</title>\n")
+            f.write(f'    <link href="{link}"/>\n')
+            f.write(f"    <id>{link}</id>\n")
+            f.write(f"    <published>{_w3c(post.created_at)}</published>\n")
+            f.write(f"    <updated>{_w3c(post.updated_at or post.created_at)}</updated>\n")
+            if post.excerpt:
+                f.write(f"    <summary>{escape(post.excerpt)}</summary>\n")
+            f.write(f"    <author><name>{escape(settings.site_name)}</name></author>\n")
+            f.write("  </entry>\n")
+        f.write("</feed>\n")
+
+
+# 創建全局實例
+sitemap_service = SitemapService(cache_dir=settings.feed_cache_dir)
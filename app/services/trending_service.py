@@ -0,0 +1,255 @@
+"""
+時間衰減趨勢分數服務
+"""
+import heapq
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.trending import TrendingScore
+from app.models.view_log import ViewLog
+from app.utils.logger import app_logger
+
+
+class DecayedScoreBoard:
+    """
+    單一內容類型的指數衰減計分板
+
+    分數以「地標時間」t0 為基準儲存：每次瀏覽累加 exp(λ·(t - t0))。
+    所有項目以相同速率衰減，因此儲存值的大小順序即為目前分數的順序，
+    寫入時只需更新單一項目，讀取時再乘上 exp(-λ·(now - t0)) 換算。
+    """
+
+    # λ·(now - t0) 超過此值時重設地標，避免浮點溢位
+    REBASE_EXPONENT = 50.0
+    # 低於此分數的項目在重設地標時移除
+    PRUNE_THRESHOLD = 0.01
+
+    def __init__(self, half_life: timedelta, slow_half_life: timedelta, capacity: int, origin: datetime):
+        self.rate = math.log(2) / half_life.total_seconds()
+        self.slow_rate = math.log(2) / slow_half_life.total_seconds()
+        self.capacity = capacity
+        self.origin = origin
+
+        self.scores: Dict[int, float] = {}
+        self.slow_scores: Dict[int, float] = {}
+
+        # 前 capacity 名候選及其最小堆（延遲刪除過期項目）
+        self.top: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+
+    def _offset(self, at: datetime) -> float:
+        return (at - self.origin).total_seconds()
+
+    def _rebase(self, at: datetime) -> None:
+        factor = math.exp(-self.rate * self._offset(at))
+        slow_factor = math.exp(-self.slow_rate * self._offset(at))
+        self.origin = at
+
+        self.scores = {
+            content_id: score * factor
+            for content_id, score in self.scores.items()
+            if score * factor >= self.PRUNE_THRESHOLD
+        }
+        self.slow_scores = {
+            content_id: score * slow_factor
+            for content_id, score in self.slow_scores.items()
+            if content_id in self.scores or score * slow_factor >= self.PRUNE_THRESHOLD
+        }
+        self.top = {content_id: self.scores[content_id] for content_id in self.top if content_id in self.scores}
+        self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(score, content_id) for content_id, score in self.top.items()]
+        heapq.heapify(self._heap)
+
+    def _update_top(self, content_id: int, score: float) -> None:
+        if content_id in self.top or len(self.top) < self.capacity:
+            self.top[content_id] = score
+            heapq.heappush(self._heap, (score, content_id))
+        else:
+            # 找出目前有效的最小值
+            while self._heap and self.top.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if self._heap and score > self._heap[0][0]:
+                _, evicted = heapq.heappop(self._heap)
+                del self.top[evicted]
+                self.top[content_id] = score
+                heapq.heappush(self._heap, (score, content_id))
+
+        if len(self._heap) > self.capacity * 4:
+            self._rebuild_heap()
+
+    def add(self, content_id: int, at: datetime, weight: float = 1.0, slow_weight: Optional[float] = None) -> None:
+        """在指定時間累加分數"""
+        if self.rate * self._offset(at) > self.REBASE_EXPONENT:
+            self._rebase(at)
+
+        offset = self._offset(at)
+        score = self.scores.get(content_id, 0.0) + weight * math.exp(self.rate * offset)
+        self.scores[content_id] = score
+        slow_weight = weight if slow_weight is None else slow_weight
+        self.slow_scores[content_id] = (
+            self.slow_scores.get(content_id, 0.0) + slow_weight * math.exp(self.slow_rate * offset)
+        )
+        self._update_top(content_id, score)
+
+    def current(self, content_id: int, now: datetime) -> Tuple[float, float]:
+        """取得目前的短期與長期衰減分數"""
+        offset = self._offset(now)
+        return (
+            self.scores.get(content_id, 0.0) * math.exp(-self.rate * offset),
+            self.slow_scores.get(content_id, 0.0) * math.exp(-self.slow_rate * offset),
+        )
+
+    def top_k(self, k: int, now: datetime) -> List[Dict]:
+        """取得前 k 名（只讀取候選集合）"""
+        items = []
+        for content_id, _ in heapq.nlargest(k, self.top.items(), key=lambda item: item[1]):
+            score, slow_score = self.current(content_id, now)
+            # 以單位時間瀏覽率比較短期與長期趨勢，> 1 代表正在加速
+            fast_rate = score * self.rate
+            slow_rate = slow_score * self.slow_rate
+            items.append({
+                'content_id': content_id,
+                'trend_score': round(score, 4),
+                'acceleration': round(fast_rate / slow_rate, 3) if slow_rate > 0 else 0.0,
+            })
+        return items
+
+    def snapshot(self, now: datetime) -> List[Tuple[int, float, float]]:
+        """輸出目前所有有效分數"""
+        rows = []
+        for content_id in self.scores:
+            score, slow_score = self.current(content_id, now)
+            if score >= self.PRUNE_THRESHOLD or slow_score >= self.PRUNE_THRESHOLD:
+                rows.append((content_id, score, slow_score))
+        return rows
+
+
+class TrendingEngine:
+    """
+    趨勢內容引擎
+
+    瀏覽寫入時增量更新各內容的指數衰減分數，趨勢排行直接從記憶體中的
+    前 K 名候選讀取；分數快照由應用程式啟動的背景排程每 persist_interval
+    保存到 trending_scores，不在瀏覽請求中寫入。
+    """
+
+    def __init__(
+        self,
+        half_life_hours: float = 6,
+        slow_half_life_hours: float = 72,
+        capacity: int = 100,
+        persist_interval: timedelta = timedelta(minutes=5),
+        bootstrap_hours: int = 72
+    ):
+        self.half_life = timedelta(hours=half_life_hours)
+        self.slow_half_life = timedelta(hours=slow_half_life_hours)
+        self.capacity = capacity
+        self.persist_interval = persist_interval
+        self.bootstrap_hours = bootstrap_hours
+
+        self._boards: Dict[str, DecayedScoreBoard] = {}
+        self._loaded = False
+        # 上次保存後是否有新的瀏覽，沒有時略過保存
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _board(self, content_type: str, now: datetime) -> DecayedScoreBoard:
+        board = self._boards.get(content_type)
+        if board is None:
+            board = DecayedScoreBoard(self.half_life, self.slow_half_life, self.capacity, origin=now)
+            self._boards[content_type] = board
+        return board
+
+    def record(self, content_type: str, content_id: int, at: Optional[datetime] = None) -> None:
+        """記錄一次瀏覽"""
+        at = at or datetime.utcnow()
+        with self._lock:
+            self._board(content_type, at).add(content_id, at)
+            self._dirty = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        """首次使用時從快照載入；沒有快照時從近期瀏覽記錄重建"""
+        if self._loaded:
+            return
+
+        with self._lock:
+            if self._loaded:
+                return
+
+            now = datetime.utcnow()
+            snapshot = db.query(TrendingScore).all()
+            if snapshot:
+                for row in snapshot:
+                    board = self._board(row.content_type, now)
+                    # 快照分數換算到快照時間點後再累加
+                    board.add(row.content_id, row.scored_at, weight=row.score, slow_weight=row.slow_score)
+            else:
+                since = now - timedelta(hours=self.bootstrap_hours)
+                rows = db.query(
+                    ViewLog.content_type, ViewLog.content_id, ViewLog.viewed_at
+                ).filter(
+                    ViewLog.viewed_at >= since
+                ).order_by(ViewLog.viewed_at).yield_per(1000)
+                for row in rows:
+                    self._board(row.content_type, now).add(row.content_id, row.viewed_at)
+
+            self._loaded = True
+
+    def top(self, content_type: str, limit: int) -> List[Dict]:
+        """取得趨勢前 limit 名"""
+        now = datetime.utcnow()
+        with self._lock:
+            board = self._boards.get(content_type)
+            if board is None:
+                return []
+            return board.top_k(limit, now)
+
+    def persist(self, db: Session) -> int:
+        """將目前分數寫入 trending_scores"""
+        now = datetime.utcnow()
+        with self._lock:
+            rows = [
+                {
+                    'content_type': content_type,
+                    'content_id': content_id,
+                    'score': score,
+                    'slow_score': slow_score,
+                    'scored_at': now,
+                }
+                for content_type, board in self._boards.items()
+                for content_id, score, slow_score in board.snapshot(now)
+            ]
+            self._dirty = False
+
+        db.query(TrendingScore).delete(synchronize_session=False)
+        if rows:
+            db.bulk_insert_mappings(TrendingScore, rows)
+        db.commit()
+        return len(rows)
+
+    def persist_detached(self) -> None:
+        """
+        以獨立的資料庫連線保存快照（供定時背景任務使用）
+
+        尚未載入或上次保存後沒有新的瀏覽時略過；失敗只記錄警告。
+        """
+        if not self._loaded or not self._dirty:
+            return
+        db = SessionLocal()
+        try:
+            self.persist(db)
+        except Exception as e:
+            db.rollback()
+            app_logger.warning(f"保存趨勢分數快照失敗: {e}")
+        finally:
+            db.close()
+
+# 創建全局實例
+trending_engine = TrendingEngine()
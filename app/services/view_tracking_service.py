@@ -1,9 +1,13 @@
 from sqlalchemy.orm import Session
+from app.database import SessionLocal
 from sqlalchemy import func, and_, desc
 from app.models.view_log import ViewLog
 from app.models.post import Post
 from app.models.product import Product
 from app.models.user import User
+from app.services.trending_service import trending_engine
+from app.services.recently_viewed_service import recently_viewed
+from app.utils.logger import app_logger
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 import uuid
@@ -28,6 +32,9 @@ class ViewTrackingService:
     ) -> ViewLog:
         """記錄瀏覽行為"""
         
+        # 趨勢引擎需在寫入新瀏覽前載入，避免重建時重複計算
+        trending_engine.ensure_loaded(db)
+        
         # 如果沒有 session_id，生成一個
         if not session_id and not user_id:
             session_id = str(uuid.uuid4())
@@ -48,6 +55,8 @@ class ViewTrackingService:
             # 更新現有記錄的時間
             existing_view.viewed_at = datetime.utcnow()
             db.commit()
+            if user_id:
+                recently_viewed.record(db, user_id, content_type, content_id, existing_view.viewed_at)
             return existing_view
         
         # 創建新的瀏覽記錄
@@ -66,19 +75,40 @@ class ViewTrackingService:
         
         db.add(view_log)
         
-        # 更新內容的瀏覽計數
-        if content_type == "post":
-            post = db.query(Post).filter(Post.id == content_id).first()
-            if post:
-                post.view_count = (post.view_count or 0) + 1
-        elif content_type == "product":
-            product = db.query(Product).filter(Product.id == content_id).first()
-            if product:
-                product.view_count = (product.view_count or 0) + 1
+        # 更新內容的瀏覽計數（單一 UPDATE 累加；保留 updated_at 作為內容的最後修改時間）
+        model = {"post": Post, "product": Product}.get(content_type)
+        if model is not None:
+            db.query(model).filter(model.id == content_id).update(
+                {model.view_count: model.view_count + 1, model.updated_at: model.updated_at},
+                synchronize_session=False
+            )
         
         db.commit()
+        
+        # 增量更新趨勢分數（快照由背景排程保存）
+        trending_engine.record(content_type, content_id, view_log.viewed_at)
+        
+        if user_id:
+            recently_viewed.record(db, user_id, content_type, content_id, view_log.viewed_at)
+        
         return view_log
     
+    @staticmethod
+    def record_view_detached(**kwargs) -> None:
+        """
+        以獨立的資料庫連線記錄瀏覽（供回應送出後的背景任務使用）
+
+        參數與 record_view 相同（不含 db）；失敗只記錄警告，不影響頁面。
+        """
+        db = SessionLocal()
+        try:
+            ViewTrackingService.record_view(db=db, **kwargs)
+        except Exception as e:
+            db.rollback()
+            app_logger.warning(f"背景記錄瀏覽失敗: {e}")
+        finally:
+            db.close()
+    
     @staticmethod
     def get_popular_content(
         db: Session,
@@ -134,15 +164,64 @@ class ViewTrackingService:
         user_id: int,
         content_type: Optional[str] = None,
         limit: int = 50
-    ) -> List[ViewLog]:
-        """獲取用戶瀏覽歷史"""
+    ) -> List[Dict]:
+        """
+        獲取用戶瀏覽歷史
+        
+        從每位會員的最近瀏覽清單讀取（已去重，新 → 舊），不查詢 view_logs。
+        """
+        return recently_viewed.get(db, user_id, content_type=content_type, limit=limit)
+    
+    @staticmethod
+    def get_continue_browsing(
+        db: Session,
+        user_id: int,
+        content_type: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict]:
+        """獲取「繼續瀏覽」清單（含內容標題、連結與圖片）"""
+        
+        history = recently_viewed.get(db, user_id, content_type=content_type, limit=limit)
         
-        query = db.query(ViewLog).filter(ViewLog.user_id == user_id)
+        post_ids = [item['content_id'] for item in history if item['content_type'] == 'post']
+        product_ids = [item['content_id'] for item in history if item['content_type'] == 'product']
         
-        if content_type:
-            query = query.filter(ViewLog.content_type == content_type)
+        posts = {}
+        if post_ids:
+            posts = {
+                post.id: post for post in db.query(Post).filter(
+                    Post.id.in_(post_ids), Post.is_published == True
+                ).all()
+            }
+        products = {}
+        if product_ids:
+            products = {
+                product.id: product for product in db.query(Product).filter(
+                    Product.id.in_(product_ids), Product.is_active == True
+                ).all()
+            }
         
-        return query.order_by(desc(ViewLog.viewed_at)).limit(limit).all()
+        items = []
+        for item in history:
+            if item['content_type'] == 'post' and item['content_id'] in posts:
+                post = posts[item['content_id']]
+                items.append({
+                    **item,
+                    'title': post.title,
+                    'url': f'/blog/{post.slug}',
+                    'image': post.featured_image
+                })
+            elif item['content_type'] == 'product' and item['content_id'] in products:
+                product = products[item['content_id']]
+                items.append({
+                    **item,
+                    'title': product.name,
+                    'url': f'/product/{product.slug}',
+                    'image': product.featured_image,
+                    'price': float(product.current_price) if product.current_price is not None else None
+                })
+        
+        return items
     
     @staticmethod
     def get_content_view_stats(
@@ -209,39 +288,38 @@ class ViewTrackingService:
         hours: int = 24,
         limit: int = 5
     ) -> List[Dict]:
-        """獲取趨勢內容（最近熱門）"""
+        """
+        獲取趨勢內容（最近熱門）
         
-        since_time = datetime.utcnow() - timedelta(hours=hours)
+        從記憶體中的時間衰減分數讀取前 limit 名，分數於瀏覽寫入時增量更新。
+        hours 保留作為相容參數，實際衰減速率由趨勢引擎的半衰期決定。
+        """
         
-        query = db.query(
-            ViewLog.content_id,
-            func.count(ViewLog.id).label('recent_views')
-        ).filter(
-            and_(
-                ViewLog.content_type == content_type,
-                ViewLog.viewed_at >= since_time
-            )
-        ).group_by(ViewLog.content_id).order_by(desc('recent_views')).limit(limit)
+        trending_engine.ensure_loaded(db)
+        ranked = trending_engine.top(content_type, limit)
+        if not ranked:
+            return []
         
-        results = query.all()
+        content_ids = [item['content_id'] for item in ranked]
+        if content_type == "post":
+            contents = db.query(Post).filter(Post.id.in_(content_ids)).all()
+        elif content_type == "product":
+            contents = db.query(Product).filter(Product.id.in_(content_ids)).all()
+        else:
+            return []
+        contents_by_id = {content.id: content for content in contents}
         
         trending_items = []
-        for result in results:
-            if content_type == "post":
-                content = db.query(Post).filter(Post.id == result.content_id).first()
-            elif content_type == "product":
-                content = db.query(Product).filter(Product.id == result.content_id).first()
-            else:
-                continue
-                
+        for item in ranked:
+            content = contents_by_id.get(item['content_id'])
             if content:
                 trending_items.append({
                     'id': content.id,
                     'title': content.title if hasattr(content, 'title') else content.name,
                     'slug': content.slug,
-                    'recent_views': result.recent_views,
                     'total_views': content.view_count,
-                    'trend_score': result.recent_views  # 可以加權計算
+                    'trend_score': item['trend_score'],
+                    'acceleration': item['acceleration']
                 })
         
-        return trending_items 
\ No newline at end of file
+        return trending_items
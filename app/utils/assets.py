@@ -0,0 +1,176 @@
+"""
+靜態資源指紋
+
+- AssetManifest：計算 app/static 下檔案的內容雜湊，產生 `/static/js/app.<hash>.js` 形式的網址
+- asset_url()：Jinja 全域函式，模板以 {{ asset_url('js/app.js') }} 取得帶指紋的網址
+- FingerprintedStaticFiles：帶指紋的請求對應回原始檔案，雜湊相符時加上一年的 immutable 快取
+"""
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import Response
+
+from app.config import settings
+from app.utils.compression import PrecompressedStaticFiles
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+HASH_LENGTH = 10
+# name.<hash>.ext
+FINGERPRINT_RE = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % HASH_LENGTH)
+
+# 不計算指紋的目錄（使用者上傳的內容由資料庫記錄原始路徑）
+EXCLUDED_DIRS = {"uploads"}
+# 預先壓縮產生的檔案
+EXCLUDED_SUFFIXES = {".gz", ".br", ".tmp"}
+
+
+class AssetManifest:
+    """靜態檔案的內容雜湊對照表"""
+
+    def __init__(self, directory: str = "app/static", url_prefix: str = "/static", watch: bool = False):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.watch = watch  # 開發模式：檔案修改後自動重新計算
+        self._hashes: Dict[str, Tuple[str, float]] = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:HASH_LENGTH]
+
+    def _is_excluded(self, relative: str) -> bool:
+        parts = relative.split("/")
+        return parts[0] in EXCLUDED_DIRS or os.path.splitext(relative)[1] in EXCLUDED_SUFFIXES
+
+    def build(self) -> int:
+        """重新計算所有檔案的雜湊，回傳檔案數"""
+        hashes = {}
+        if self.directory.is_dir():
+            for path in self.directory.rglob("*"):
+                if not path.is_file():
+                    continue
+                relative = path.relative_to(self.directory).as_posix()
+                if self._is_excluded(relative):
+                    continue
+                hashes[relative] = (self._hash_file(path), path.stat().st_mtime)
+        with self._lock:
+            self._hashes = hashes
+            self._built = True
+        return len(hashes)
+
+    def _refresh(self, relative: str) -> Optional[str]:
+        # 開發模式下依修改時間重新計算單一檔案
+        path = self.directory / relative
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            self._hashes.pop(relative, None)
+            return None
+        entry = self._hashes.get(relative)
+        if entry is None or entry[1] != mtime:
+            entry = (self._hash_file(path), mtime)
+            self._hashes[relative] = entry
+        return entry[0]
+
+    def file_hash(self, relative: str) -> Optional[str]:
+        """取得檔案目前的雜湊，檔案不存在或不納入時回傳 None"""
+        if not self._built:
+            self.build()
+        if self._is_excluded(relative):
+            return None
+        if self.watch:
+            return self._refresh(relative)
+        entry = self._hashes.get(relative)
+        return entry[0] if entry else None
+
+    def url(self, path: str) -> str:
+        """
+        取得帶指紋的靜態檔案網址
+
+        Args:
+            path: 相對於靜態目錄的路徑，或以 /static/ 開頭的網址；其他網址原樣回傳
+
+        Returns:
+            例如 /static/js/errorHandler.3f2a9c0d1b.js；找不到檔案時回傳未加指紋的網址
+        """
+        if not path:
+            return path
+        if "://" in path or path.startswith("//"):
+            return path
+        if path.startswith("/"):
+            if not path.startswith(self.url_prefix + "/"):
+                return path
+            path = path[len(self.url_prefix) + 1:]
+
+        relative = path.lstrip("/")
+        file_hash = self.file_hash(relative)
+        if file_hash is None:
+            return f"{self.url_prefix}/{relative}"
+
+        stem, ext = os.path.splitext(relative)
+        return f"{self.url_prefix}/{stem}.{file_hash}{ext}"
+
+    def resolve(self, path: str) -> Tuple[str, Optional[bool]]:
+        """
+        將請求路徑對應回原始檔案
+
+        Returns:
+            (原始相對路徑, 指紋是否與目前內容相符；未帶指紋時為 None)
+        """
+        match = FINGERPRINT_RE.match(path)
+        if not match:
+            return path, None
+        original = f"{match.group('stem')}{match.group('ext')}"
+        current = self.file_hash(original)
+        if current is None:
+            # 檔名本身就像指紋（例如建置工具產生的檔案），不做轉換
+            return path, None
+        return original, current == match.group("hash")
+
+
+class FingerprintedStaticFiles(PrecompressedStaticFiles):
+    """
+    支援指紋網址與長效快取的 StaticFiles
+
+    - manifest：帶指紋的路徑對應回原始檔案；指紋相符時回應 immutable 快取，
+      舊指紋（部署後的過期網址）仍回應目前的檔案但要求重新驗證；未帶指紋的路徑維持原樣
+    - immutable=True：目錄內的檔名本身已含雜湊（例如 Vite 建置的 assets），全部使用長效快取
+    """
+
+    def __init__(self, *args, manifest: Optional[AssetManifest] = None, immutable: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.manifest = manifest
+        self.immutable = immutable
+
+    async def get_response(self, path: str, scope) -> Response:
+        current = None
+        if self.manifest is not None:
+            path, current = self.manifest.resolve(path.replace(os.sep, "/"))
+
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            if self.immutable or current:
+                response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            elif current is False:
+                response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
+
+# 創建全局實例（debug 模式下檔案修改會即時反映）
+asset_manifest = AssetManifest(watch=settings.debug)
+
+
+def asset_url(path: str) -> str:
+    """Jinja 全域函式：取得帶指紋的靜態檔案網址"""
+    return asset_manifest.url(path)
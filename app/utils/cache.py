@@ -0,0 +1,98 @@
+"""
+快取工具
+
+提供程序內的 LRU 快取，以及依設定建立的共用 Redis 連線。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import redis
+
+from app.config import settings
+from app.utils.logger import app_logger
+
+_MISSING = object()
+_redis_client: Optional[redis.Redis] = None
+_redis_checked = False
+_redis_lock = threading.Lock()
+
+
+def get_redis_client() -> Optional[redis.Redis]:
+    """
+    取得共用的 Redis 連線
+
+    僅在 cache_type 設為 redis 且連線成功時回傳，否則回傳 None，
+    呼叫端應退回程序內快取。
+    """
+    global _redis_client, _redis_checked
+
+    if _redis_checked:
+        return _redis_client
+
+    with _redis_lock:
+        if _redis_checked:
+            return _redis_client
+
+        if settings.cache_type == "redis":
+            try:
+                client = redis.Redis.from_url(settings.redis_url, socket_timeout=0.5)
+                client.ping()
+                _redis_client = client
+            except Exception as e:
+                app_logger.warning(f"Redis 連線失敗，改用程序內快取: {e}")
+                _redis_client = None
+
+        _redis_checked = True
+        return _redis_client
+
+
+class LRUCache:
+    """
+    執行緒安全的 LRU 快取
+
+    以 maxsize 限制項目數量，可選擇設定 ttl（秒）讓項目自動過期。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
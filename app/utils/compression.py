@@ -0,0 +1,285 @@
+"""
+回應壓縮
+
+- CompressionMiddleware：API 與 HTML 等文字回應超過門檻時動態壓縮
+  （用戶端接受且已安裝 brotli 時使用 br，否則使用 gzip）
+- PrecompressedStaticFiles：靜態檔案有較新的 .br / .gz 檔時直接送出預先壓縮的版本
+- precompress_directory()：產生靜態檔案的 .gz / .br 檔（啟動時與建置後執行）
+"""
+import gzip
+import os
+import zlib
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from app.utils.logger import app_logger
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件
+    brotli = None
+
+# 值得壓縮的內容類型
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "image/svg+xml",
+)
+
+# 預先壓縮的靜態檔案副檔名
+PRECOMPRESS_EXTENSIONS = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".txt", ".xml", ".map"}
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def add_vary_accept_encoding(headers: MutableHeaders) -> None:
+    if "accept-encoding" not in headers.get("vary", "").lower():
+        headers.add_vary_header("Accept-Encoding")
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """依伺服器偏好順序回傳用戶端接受且可用的編碼"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    encodings = []
+    if brotli is not None and "br" in accepted:
+        encodings.append("br")
+    if "gzip" in accepted:
+        encodings.append("gzip")
+    return encodings
+
+
+class _Compressor:
+    """串流壓縮器（gzip 或 brotli）"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    動態壓縮中介軟體
+
+    只壓縮可壓縮的內容類型且大小達 minimum_size 的回應；已帶有 Content-Encoding
+    （例如預先壓縮的靜態檔案）則直接放行。壓縮後的回應 ETag 改為弱 ETag。
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if not encodings:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = encodings[0]
+        compressor: Optional[_Compressor] = None
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal compressor, start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    "content-encoding" in headers
+                    or "content-range" in headers
+                    or not is_compressible(headers.get("content-type"))
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.levels[encoding])
+                headers = MutableHeaders(raw=list(start_message["headers"]))
+                headers["Content-Encoding"] = encoding
+                add_vary_accept_encoding(headers)
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+
+                if more_body:
+                    del headers["Content-Length"]
+                    await send({**start_message, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+                else:
+                    payload = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(payload))
+                    await send({**start_message, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": payload})
+                return
+
+            if more_body:
+                await send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.finish()})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    優先送出預先壓縮檔案的 StaticFiles
+
+    用戶端接受 br / gzip 且存在不舊於原檔的 `<檔名>.br` / `<檔名>.gz` 時，
+    直接以該檔案回應並加上 Content-Encoding，不需在請求時壓縮。
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+
+        for encoding in accepted_encodings(request_headers.get("accept-encoding", "")):
+            compressed_path = f"{full_path}{'.br' if encoding == 'br' else '.gz'}"
+            try:
+                compressed_stat = os.stat(compressed_path)
+            except OSError:
+                continue
+            if compressed_stat.st_mtime < stat_result.st_mtime:
+                continue
+
+            response = FileResponse(
+                compressed_path,
+                status_code=status_code,
+                stat_result=compressed_stat,
+                media_type=media_type,
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if is_compressible(media_type):
+            add_vary_accept_encoding(response.headers)
+        return response
+
+
+def _precompressors():
+    """預先壓縮使用最高壓縮率（只在建置 / 啟動時執行一次）"""
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+def _write_atomic(path: str, data: bytes, mtime: float) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.utime(tmp_path, (mtime, mtime))
+    os.replace(tmp_path, path)
+
+
+def precompress_directory(directory: str, minimum_size: int = 1024,
+                          extensions: Iterable[str] = PRECOMPRESS_EXTENSIONS) -> Tuple[int, int]:
+    """
+    為目錄下的文字類靜態檔案產生 .gz（與 .br）檔
+
+    已存在且不舊於原檔的壓縮檔會略過；壓縮後沒有變小的檔案不產生。
+
+    Returns:
+        (處理的檔案數, 新產生的壓縮檔數)
+    """
+    extensions = set(extensions)
+    scanned = written = 0
+    root = Path(directory)
+    if not root.is_dir():
+        return scanned, written
+
+    for path in root.rglob("*"):
+        if not path.is_file() or path.suffix.lower() not in extensions:
+            continue
+        stat = path.stat()
+        if stat.st_size < minimum_size:
+            continue
+        scanned += 1
+
+        data = None
+        for suffix, compress in _precompressors():
+            target = f"{path}{suffix}"
+            if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                continue
+            if data is None:
+                data = path.read_bytes()
+            compressed = compress(data)
+            if len(compressed) >= len(data):
+                continue
+            _write_atomic(target, compressed, stat.st_mtime)
+            written += 1
+
+    return scanned, written
+
+
+def precompress_static(directories: Iterable[str], minimum_size: int = 1024) -> None:
+    """預先壓縮多個靜態目錄（供啟動時於背景執行）"""
+    for directory in directories:
+        try:
+            scanned, written = precompress_directory(directory, minimum_size)
+            if written:
+                app_logger.info(f"靜態檔案預先壓縮完成：{directory}（{scanned} 個檔案，新產生 {written} 個壓縮檔）")
+        except OSError as e:
+            app_logger.warning(f"靜態檔案預先壓縮失敗 {directory}: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    for directory in sys.argv[1:] or ["app/static"]:
+        scanned, written = precompress_directory(directory)
+        print(f"{directory}: {scanned} 個檔案，新產生 {written} 個壓縮檔")
@@ -0,0 +1,191 @@
+"""
+條件式回應（ETag / Last-Modified）
+
+- not_modified()：供路由在序列化前以快取或欄位計算的驗證器提前回應 304；
+  商品、文章、廣告、公開設定與運費級距的主要 GET 端點都以此方式處理
+- query_etag()：以一次聚合查詢（列數、ID 總和、最新修改時間）產生列表的 ETag，
+  相符時不必載入或序列化資料列
+- ConditionalGetMiddleware：備援機制，為上述路徑中路由未自行設定 ETag 的 GET 回應
+  依序列化後的內容產生強 ETag（仍需完成查詢與序列化，只省下傳輸）
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+# 套用條件式回應的路徑前綴
+CONDITIONAL_PATHS = (
+    "/api/products",
+    "/api/posts",
+    "/api/banners",
+    "/api/settings/public",
+    "/api/shipping-tiers",
+)
+
+# 304 回應需保留的標頭
+PRESERVED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "last-modified", "vary")
+
+
+def make_etag(payload: bytes, weak: bool = False) -> str:
+    """依內容產生 ETag"""
+    digest = hashlib.sha256(payload).hexdigest()[:32]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    # If-None-Match 使用弱比較，忽略 W/ 前綴
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否與目前的 ETag 相符"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag.strip()) for tag in if_none_match.split(",")}
+
+
+def http_date(value: datetime) -> str:
+    """轉換為 HTTP 日期格式（GMT）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP 日期只精確到秒
+    return last_modified.replace(microsecond=0) <= since
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """產生回應需附帶的驗證器標頭"""
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    判斷用戶端的快取是否仍有效
+
+    有 If-None-Match 時只比較 ETag，否則才比較 If-Modified-Since（RFC 9110）。
+
+    Returns:
+        相符時回傳 304 回應，否則回傳 None
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        matched = etag_matches(if_none_match, etag)
+    elif last_modified is not None:
+        matched = _not_modified_since(request.headers.get("if-modified-since"), last_modified)
+    else:
+        matched = False
+
+    if not matched:
+        return None
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+
+def query_etag(query: Query, model, *aggregates, extra: str = "") -> str:
+    """
+    以一次聚合查詢產生列表回應的 ETag，不載入也不序列化資料列
+
+    query 需套用與回應相同的篩選條件（不含分頁），ETag 由符合條件的列數、ID 總和與
+    最新修改時間組成，新增、刪除與修改都會改變；aggregates 為影響回應內容的其他聚合值
+    （例如依目前時間計算的狀態），extra 為分頁、排序等查詢參數。
+    修改時間只精確到資料庫的時間解析度，因此使用弱 ETag。
+    """
+    modified = func.max(func.coalesce(model.updated_at, model.created_at))
+    row = query.with_entities(
+        func.count(model.id), func.sum(model.id), modified, *aggregates
+    ).order_by(None).one()
+    values = ":".join(str(value) for value in row)
+    return make_etag(f"{model.__tablename__}:{values}:{extra}".encode(), weak=True)
+
+
+class ConditionalGetMiddleware:
+    """
+    為 JSON GET 回應加上強 ETag 並處理 If-None-Match（備援）
+
+    只處理 CONDITIONAL_PATHS 之下、狀態 200 且尚未帶 ETag 的回應；
+    路由已自行設定 ETag（例如由快取或聚合查詢產生的驗證器）時直接放行。
+    相符時仍已完成查詢與序列化，新的端點應在路由中以 not_modified() 提前回應。
+    """
+
+    def __init__(self, app, paths: Iterable[str] = CONDITIONAL_PATHS):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message = None
+        body: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    message["status"] != 200
+                    or "etag" in headers
+                    or not headers.get("content-type", "").startswith("application/json")
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            body.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            await self._send_buffered(send, start_message, b"".join(body), if_none_match)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    async def _send_buffered(send, start_message: dict, payload: bytes, if_none_match: Optional[str]) -> None:
+        etag = make_etag(payload)
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        headers["ETag"] = etag
+
+        if etag_matches(if_none_match, etag):
+            raw: List[Tuple[bytes, bytes]] = [
+                (name, value) for name, value in headers.raw if name.decode("latin-1") in PRESERVED_HEADERS
+            ]
+            await send({"type": "http.response.start", "status": 304, "headers": raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({**start_message, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": payload})
@@ -0,0 +1,153 @@
+"""
+列表總數快取
+
+- 以「資料表版本 + 正規化後的篩選條件」為鍵快取 COUNT(*) 結果
+- 資料表有新增、刪除或篩選相關欄位異動時遞增版本，舊的快取自然失效
+- 版本號在啟用 Redis 時存於 Redis，讓多個 worker 共用失效訊號
+- 支援 total=exact|approx|none：approx 會使用資料表統計或有上限的計數
+"""
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.orm import Query, Session
+
+from app.utils.cache import LRUCache, get_redis_client
+from app.utils.logger import app_logger
+
+TOTAL_MODE_PATTERN = "^(exact|approx|none)$"
+
+# 只影響顯示、不影響列表篩選結果的欄位，異動時不需要讓總數失效
+IGNORED_COLUMNS = {"view_count", "updated_at", "stock_quantity"}
+
+
+class CountCache:
+    """依資料表版本失效的總數快取"""
+
+    def __init__(self, ttl: int = 300, approx_cap: int = 1000):
+        self.approx_cap = approx_cap
+        self._cache = LRUCache(maxsize=4096, ttl=ttl)
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _redis_key(table: str) -> str:
+        return f"count_version:{table}"
+
+    def version(self, table: str) -> int:
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                return int(redis_client.get(self._redis_key(table)) or 0)
+            except Exception as e:
+                app_logger.warning(f"讀取總數快取版本失敗: {e}")
+        return self._versions[table]
+
+    def invalidate(self, *tables: str) -> None:
+        """讓指定資料表的總數快取失效（批次更新等繞過 ORM 的寫入需自行呼叫）"""
+        redis_client = get_redis_client()
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+                if redis_client is not None:
+                    try:
+                        redis_client.incr(self._redis_key(table))
+                    except Exception as e:
+                        app_logger.warning(f"更新總數快取版本失敗: {e}")
+
+    @staticmethod
+    def _normalize(filters: Dict[str, Any]) -> Tuple:
+        return tuple(sorted(
+            (key, str(value).strip().lower())
+            for key, value in filters.items()
+            if value not in (None, "")
+        ))
+
+    def _estimate_rows(self, query: Query, table: str) -> Optional[int]:
+        # PostgreSQL 可直接讀取規劃器的資料列估計值
+        if query.session.get_bind().dialect.name != "postgresql":
+            return None
+        estimate = query.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+            {"table": table}
+        ).scalar()
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    def _capped_count(self, query: Query) -> Tuple[int, bool]:
+        subquery = query.order_by(None).limit(self.approx_cap + 1).subquery()
+        count = query.session.execute(select(func.count()).select_from(subquery)).scalar()
+        if count > self.approx_cap:
+            return self.approx_cap, True
+        return count, False
+
+    def count(self, query: Query, table: str, filters: Dict[str, Any],
+              mode: str = "exact") -> Tuple[Optional[int], bool]:
+        """
+        取得列表總數
+
+        Args:
+            query: 已套用篩選條件的查詢
+            table: 主要資料表名稱（用於失效）
+            filters: 產生此查詢的篩選條件
+            mode: exact（精確，會快取）、approx（估計）、none（不計算）
+
+        Returns:
+            (總數, 是否為估計值)
+        """
+        if mode == "none":
+            return None, False
+
+        key = (table, self.version(table), self._normalize(filters))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached, False
+
+        if mode == "approx":
+            if not self._normalize(filters):
+                estimate = self._estimate_rows(query, table)
+                if estimate is not None:
+                    return estimate, True
+            total, capped = self._capped_count(query)
+            if not capped:
+                self._cache.set(key, total)
+            return total, capped
+
+        total = query.order_by(None).count()
+        self._cache.set(key, total)
+        return total, False
+
+
+def _changed_tables(session: Session) -> Iterable[str]:
+    for obj in session.new:
+        yield obj.__table__.name
+    for obj in session.deleted:
+        yield obj.__table__.name
+    for obj in session.dirty:
+        state = inspect(obj)
+        for attr in state.mapper.column_attrs:
+            if attr.key not in IGNORED_COLUMNS and state.attrs[attr.key].history.has_changes():
+                yield obj.__table__.name
+                break
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session: Session, flush_context) -> None:
+    session.info.setdefault("count_cache_tables", set()).update(_changed_tables(session))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    # 於提交後才遞增版本，避免其他請求在提交前以新版本快取到舊的總數
+    tables = session.info.pop("count_cache_tables", None)
+    if tables:
+        count_cache.invalidate(*tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tables(session: Session) -> None:
+    session.info.pop("count_cache_tables", None)
+
+
+# 創建全局實例
+count_cache = CountCache()
@@ -0,0 +1,90 @@
+"""
+未知網址的快速 404
+
+前台的 catch-all 路由只為已知的前端路徑（例如 /orders/{id}、/payment/success）渲染頁面，
+其他路徑（掃描器與爬蟲的 /wp-login.php、/.env 等探測）直接回應預先渲染的 404 頁面，
+不查詢資料庫也不渲染完整模板。同一 IP 短時間內大量探測時改回空白的 429。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from jinja2 import Environment
+from starlette.responses import Response
+
+# 由 catch-all 路由渲染前端頁面的路徑（第一段）
+SPA_PREFIXES = frozenset({
+    "orders",   # /orders/{id} 訂單詳情
+    "payment",  # /payment/success、/payment/failed 等金流返回頁
+})
+
+NOT_FOUND_CACHE_CONTROL = "public, max-age=300"
+# 不存在的 API 路徑回應與 FastAPI 相同格式的 JSON
+API_NOT_FOUND_BODY = b'{"detail":"Not Found"}'
+
+
+class ProbeLimiter:
+    """
+    以固定時間窗計算每個 IP 的 404 次數
+
+    只保留最近的 max_clients 個 IP，記憶體用量有上限。
+    """
+
+    def __init__(self, limit: int, window: int = 60, max_clients: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_clients = max_clients
+        self._counts: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, client: str) -> bool:
+        """記錄一次探測，回傳是否已超過限制"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counts.get(client)
+            if entry is None or now - entry[0] >= self.window:
+                entry = [now, 0]
+                self._counts[client] = entry
+            self._counts.move_to_end(client)
+            entry[1] += 1
+            while len(self._counts) > self.max_clients:
+                self._counts.popitem(last=False)
+            return entry[1] > self.limit
+
+
+class NotFoundResponder:
+    """判斷路徑是否由前端頁面處理，並產生快取的 404 回應"""
+
+    def __init__(self, env: Environment, template_name: str, context: dict,
+                 known_prefixes: Iterable[str] = SPA_PREFIXES,
+                 probe_limit: int = 0, probe_window: int = 60):
+        self.env = env
+        self.template_name = template_name
+        self.context = context
+        self.known_prefixes = frozenset(known_prefixes)
+        self.limiter: Optional[ProbeLimiter] = ProbeLimiter(probe_limit, probe_window) if probe_limit > 0 else None
+        self._body: Optional[bytes] = None
+
+    def is_known(self, path: str) -> bool:
+        """路徑的第一段是否為前端頁面"""
+        return path.lstrip("/").split("/", 1)[0] in self.known_prefixes
+
+    @property
+    def body(self) -> bytes:
+        # 404 頁面不依賴資料庫設定，第一次使用時渲染後重複使用
+        if self._body is None:
+            self._body = self.env.get_template(self.template_name).render(**self.context).encode("utf-8")
+        return self._body
+
+    def response(self, path: str, client: Optional[str]) -> Response:
+        if self.limiter is not None and client and self.limiter.hit(client):
+            return Response(status_code=429, headers={"Retry-After": str(self.limiter.window)})
+        if path.lstrip("/").startswith("api/"):
+            return Response(API_NOT_FOUND_BODY, status_code=404, media_type="application/json")
+        return Response(
+            self.body,
+            status_code=404,
+            media_type="text/html",
+            headers={"Cache-Control": NOT_FOUND_CACHE_CONTROL},
+        )
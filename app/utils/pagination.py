@@ -0,0 +1,72 @@
+"""
+游標（keyset）分頁工具
+
+依 (created_at, id) 由新到舊排序，以不透明的游標記住上一頁最後一筆的位置，
+下一頁直接從該位置往後查詢，深頁數也只需讀取一頁的資料，且不計算總數。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import String, and_, literal, or_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """將排序鍵編碼為不透明的游標字串"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游標字串，格式錯誤時回傳 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="無效的分頁游標")
+
+
+def _bind_created_at(query: Query, value: datetime) -> Any:
+    # SQLite 以字串儲存時間，server_default 寫入的值不含微秒，
+    # 需用相同格式比較，避免同一秒內的資料被重複或遺漏
+    if query.session.get_bind().dialect.name == "sqlite":
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S"
+        return literal(value.strftime(fmt), String)
+    return value
+
+
+def keyset_paginate(query: Query, model: Any, cursor: str, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    以游標分頁查詢
+
+    Args:
+        query: 已套用篩選條件的查詢（原有排序會被取代）
+        model: 具有 created_at 與 id 欄位的模型
+        cursor: 上一頁回傳的游標，空字串表示第一頁
+        limit: 每頁筆數
+
+    Returns:
+        (本頁資料, 下一頁游標；沒有下一頁時為 None)
+    """
+    query = query.order_by(None).order_by(model.created_at.desc(), model.id.desc())
+
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        bound = _bind_created_at(query, created_at)
+        query = query.filter(or_(
+            model.created_at < bound,
+            and_(model.created_at == bound, model.id < last_id)
+        ))
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last.created_at, last.id)
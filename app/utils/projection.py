@@ -0,0 +1,68 @@
+"""
+列表欄位投影工具
+
+列表端點預設只讀取摘要 schema 需要的欄位（不載入內文等大型 Text 欄位），
+並支援 fields=a,b,c 只回傳指定的欄位。
+"""
+from typing import Any, Dict, List, Optional, Type
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+# 分頁與排序一定需要的欄位
+REQUIRED_COLUMNS = ("id", "created_at")
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """
+    解析 fields 參數
+
+    Args:
+        fields: 逗號分隔的欄位名稱，未指定時回傳 None（回傳完整摘要）
+        schema: 列表項目的摘要 schema，只允許其中的欄位
+
+    Returns:
+        欄位名稱列表（一定包含 id）
+    """
+    if not fields:
+        return None
+
+    requested = ["id"]
+    for name in (part.strip() for part in fields.split(",")):
+        if name and name not in requested:
+            requested.append(name)
+
+    unknown = [name for name in requested if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支援的欄位: {', '.join(unknown)}；可用欄位: {', '.join(schema.model_fields)}"
+        )
+    return requested
+
+
+def load_columns(model: Any, schema: Type[BaseModel], fields: Optional[List[str]] = None):
+    """產生只載入摘要（或指定）欄位的 load_only 選項"""
+    columns = inspect(model).column_attrs.keys()
+    names = set(fields or schema.model_fields) | set(REQUIRED_COLUMNS)
+    return load_only(*[getattr(model, name) for name in columns if name in names])
+
+
+def loaded_attributes(obj: Any) -> Dict[str, Any]:
+    """取得 ORM 物件已載入的欄位值（避免序列化時觸發延遲載入）"""
+    state = inspect(obj)
+    return {
+        key: getattr(obj, key)
+        for key in state.mapper.column_attrs.keys()
+        if key not in state.unloaded
+    }
+
+
+def sparse_response(payload: BaseModel, fields: List[str]) -> JSONResponse:
+    """只輸出列表項目中指定欄位的回應，分頁資訊維持不變"""
+    include = {name: True for name in payload.model_fields if name != "items"}
+    include["items"] = {"__all__": set(fields)}
+    return JSONResponse(payload.model_dump(mode="json", include=include))
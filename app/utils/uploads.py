@@ -0,0 +1,223 @@
+"""
+串流上傳
+
+直接解析請求的 multipart 內容，檔案資料邊接收邊寫入目的目錄下的暫存檔：
+
+- 依 settings.max_file_size 在接收過程中限制大小，超過時立即中止（413）
+- 同時以 SHA-256 計算內容雜湊，不需再讀取一次檔案
+- 處理完成後以 os.replace 原子地移動到正式路徑（暫存檔與目的地位於同一目錄）
+
+每個上傳只在記憶體中保留一個 chunk，與檔案大小及同時上傳數無關。
+"""
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+# multipart 邊界與其他欄位允許的額外大小
+MULTIPART_OVERHEAD = 64 * 1024
+TEMP_SUFFIX = ".tmp"
+
+# 供 openapi_extra 使用：路由直接讀取請求內容，需手動描述上傳欄位
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+
+def _size_label(size: int) -> str:
+    return f"{size / (1024 * 1024):g}MB"
+
+
+class StreamedUpload:
+    """已寫入暫存檔的上傳檔案"""
+
+    def __init__(self, path: str, filename: str, content_type: str, size: int, sha256: str):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+
+    def move_to(self, destination: str) -> None:
+        """原子地移動到正式路徑"""
+        os.replace(self.path, destination)
+
+    def discard(self) -> None:
+        """刪除暫存檔（已移動時不做任何事）"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _UploadReceiver:
+    """multipart 解析回呼：只保存指定欄位的第一個檔案，其餘欄位略過"""
+
+    def __init__(self, field_name: str, directory: str, max_size: int, allowed_types: Optional[set]):
+        self.field_name = field_name
+        self.directory = directory
+        self.max_size = max_size
+        self.allowed_types = allowed_types
+
+        self.upload: Optional[StreamedUpload] = None
+        self._file = None
+        self._digest = hashlib.sha256()
+        self._pending = []
+        self._receiving = False
+        self._header_name = b""
+        self._header_value = b""
+        self._headers = {}
+
+    # --- multipart 回呼 ---
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._receiving = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name != self.field_name or b"filename" not in options or self.upload is not None:
+            return
+
+        content_type = self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1").strip()
+        if self.allowed_types is not None and content_type not in self.allowed_types:
+            raise HTTPException(status_code=400, detail="不支援的檔案格式")
+
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix=".upload-", suffix=TEMP_SUFFIX)
+        self._file = os.fdopen(fd, "wb")
+        self.upload = StreamedUpload(
+            path=path,
+            filename=options[b"filename"].decode("utf-8", "replace"),
+            content_type=content_type,
+            size=0,
+            sha256="",
+        )
+        self._receiving = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._receiving:
+            return
+        chunk = data[start:end]
+        self.upload.size += len(chunk)
+        if self.upload.size > self.max_size:
+            raise HTTPException(status_code=413, detail=f"檔案大小不能超過{_size_label(self.max_size)}")
+        self._digest.update(chunk)
+        self._pending.append(chunk)
+
+    def on_part_end(self) -> None:
+        self._receiving = False
+
+    # --- 寫入 ---
+
+    def take_pending(self) -> bytes:
+        data = b"".join(self._pending)
+        self._pending.clear()
+        return data
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.upload is not None:
+            self.upload.sha256 = self._digest.hexdigest()
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.upload is not None:
+            self.upload.discard()
+
+
+async def receive_upload(
+    request: Request,
+    directory: str,
+    field_name: str = "file",
+    max_size: Optional[int] = None,
+    allowed_types: Optional[Iterable[str]] = None,
+) -> StreamedUpload:
+    """
+    以串流方式接收 multipart 上傳的檔案
+
+    Args:
+        directory: 暫存檔所在目錄，應與最終存放目錄相同以便原子地移動
+        field_name: 檔案欄位名稱
+        max_size: 檔案大小上限（bytes），預設為 settings.max_file_size
+        allowed_types: 允許的 Content-Type，None 表示不限制
+
+    Returns:
+        StreamedUpload；呼叫端處理完成後應呼叫 discard() 清除未移動的暫存檔
+    """
+    max_size = max_size or settings.max_file_size
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="請以 multipart/form-data 上傳檔案")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"檔案大小不能超過{_size_label(max_size)}")
+
+    os.makedirs(directory, exist_ok=True)
+    receiver = _UploadReceiver(field_name, directory, max_size, set(allowed_types) if allowed_types else None)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": receiver.on_part_begin,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            data = receiver.take_pending()
+            if data:
+                await run_in_threadpool(receiver.write, data)
+        parser.finalize()
+        receiver.finish()
+    except MultipartParseError:
+        receiver.abort()
+        raise HTTPException(status_code=400, detail="上傳內容格式錯誤")
+    except BaseException:
+        receiver.abort()
+        raise
+
+    if receiver.upload is None:
+        raise HTTPException(status_code=400, detail="缺少上傳檔案")
+    return receiver.upload
@@ -0,0 +1,103 @@
+"""
+Markdown 渲染效能測試
+
+比較舊的做法（每次建立 Markdown 實例、正規表示式後處理、另外解析一次目錄、
+正規表示式移除語法產生摘要）與 MarkdownService.render_artifacts 的單次解析。
+
+用法：
+    python -m benchmarks.bench_markdown [--repeat 200]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown
+
+from app.services.markdown_service import markdown_service
+
+SECTION = '''## 章節 {n}
+
+這是一段包含 **粗體**、*斜體*、`行內程式碼` 與 [外部連結](https://example.com/{n}) 的段落，
+也有 [站內連結](/blog/{n}) 與圖片 ![示意圖](/static/images/{n}.png)。
+
+| 欄位 | 說明 |
+|------|------|
+| name | 名稱 {n} |
+| sku  | 編號 {n} |
+
+```python
+def handler_{n}(request):
+    return {{"id": {n}}}
+```
+
+- 項目一
+- 項目二
+    - 子項目
+
+> 引用文字 {n}
+
+'''
+
+
+def build_document(sections: int) -> str:
+    return "# 文章標題\n\n" + "".join(SECTION.format(n=i) for i in range(sections))
+
+
+def legacy_artifacts(content: str) -> dict:
+    """重現舊版 MarkdownService 的 render + get_toc + extract_excerpt"""
+    md = markdown.Markdown(
+        extensions=markdown_service.extensions,
+        extension_configs=markdown_service.extension_configs,
+    )
+    html = md.convert(content)
+    html = re.sub(r'<img([^>]*)>', r'<img\1 class="img-responsive">', html)
+    html = re.sub(r'<table([^>]*)>', r'<div class="table-responsive"><table\1 class="table table-bordered">', html)
+    html = re.sub(r'</table>', r'</table></div>', html)
+    html = re.sub(
+        r'<a href="(https?://[^"]*)"([^>]*)>',
+        r'<a href="\1"\2 target="_blank" rel="noopener noreferrer">',
+        html
+    )
+
+    toc_md = markdown.Markdown(
+        extensions=['markdown.extensions.toc'],
+        extension_configs={'markdown.extensions.toc': {'permalink': True, 'baselevel': 2}},
+    )
+    toc_md.convert(content)
+
+    return {
+        "content_html": html,
+        "toc": toc_md.toc,
+        "excerpt": markdown_service.extract_excerpt(content),
+    }
+
+
+def measure(func, content: str, repeat: int) -> float:
+    func(content)  # 暖身（建立執行緒實例、載入擴展）
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Markdown 渲染效能測試")
+    parser.add_argument("--repeat", type=int, default=200, help="每種大小的重複次數")
+    args = parser.parse_args()
+
+    print(f"{'段落數':>6} {'大小(KB)':>9} {'舊版(ms)':>10} {'新版(ms)':>10} {'加速':>6}")
+    for sections in (1, 5, 20, 100):
+        content = build_document(sections)
+        repeat = max(args.repeat // sections, 5)
+        legacy = measure(legacy_artifacts, content, repeat)
+        current = measure(markdown_service.render_artifacts, content, repeat)
+        size_kb = len(content.encode("utf-8")) / 1024
+        print(f"{sections:>6} {size_kb:>9.1f} {legacy:>10.2f} {current:>10.2f} {legacy / current:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()